@@ -0,0 +1,156 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+MHR格式转换脚本 - 将已有的.mhr.json文件转换为紧凑的二进制格式(.mhr.bin)
+
+使用方法:
+    python convert_mhr.py --input output/image.mhr.json
+    python convert_mhr.py --input output/video_name/     # 转换目录下所有帧
+    python convert_mhr.py --input output/video_name/video_name.mhrseq.partial
+                                                         # 恢复中断的序列文件
+    python convert_mhr.py --input output/video_name/video_name.mhrseq --compress
+                                                         # 压缩序列文件 (量化 + 时间差分)
+
+输出:
+    - 同目录下同名的 .mhr.bin 文件
+    - 目录中的 video_info.json 会更新为引用 .mhr.bin 帧文件
+    - --compress 时为同目录下同名的 .mhrz 文件，并打印压缩率和最大重建误差
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from tqdm import tqdm
+
+from tools.mhr_codec import (
+    available_compressions,
+    compress_sequence,
+    compression_report,
+    is_sequence_path,
+)
+from tools.mhr_io import MHR_BINARY_SUFFIX, MHR_JSON_SUFFIX, convert_mhr_to_binary
+from tools.mhr_sequence import PARTIAL_SUFFIX, recover_sequence
+
+
+def convert_folder(folder: Path, delete_json: bool = False):
+    """转换目录下的所有.mhr.json文件并更新video_info.json"""
+    json_files = sorted(folder.glob(f"*{MHR_JSON_SUFFIX}"))
+    json_size, bin_size = 0, 0
+    for json_path in tqdm(json_files, desc="转换MHR文件"):
+        bin_path = convert_mhr_to_binary(json_path)
+        json_size += json_path.stat().st_size
+        bin_size += bin_path.stat().st_size
+        if delete_json:
+            json_path.unlink()
+
+    info_path = folder / "video_info.json"
+    if info_path.exists():
+        with open(info_path, 'r') as f:
+            video_info = json.load(f)
+        for frame in video_info.get("processed_frames", []):
+            if frame["file"].endswith(MHR_JSON_SUFFIX):
+                frame["file"] = frame["file"][: -len(MHR_JSON_SUFFIX)] + MHR_BINARY_SUFFIX
+        with open(info_path, 'w') as f:
+            json.dump(video_info, f, indent=2)
+
+    return len(json_files), json_size, bin_size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="将.mhr.json文件转换为二进制格式(.mhr.bin)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+    python convert_mhr.py --input output/image.mhr.json
+    python convert_mhr.py --input output/video_name/ --delete_json
+        """,
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        type=str,
+        help="输入的.mhr.json文件、包含MHR文件的目录，或中断后留下的.mhrseq.partial文件",
+    )
+    parser.add_argument(
+        "--delete_json",
+        action="store_true",
+        default=False,
+        help="转换后删除原.mhr.json文件",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        default=False,
+        help="将序列文件 (.mhrseq) 压缩为 .mhrz (顶点和3D关键点量化为16位 + 关键帧差分编码)",
+    )
+    parser.add_argument(
+        "--keyframe_interval",
+        default=30,
+        type=int,
+        help="--compress 的关键帧间隔 (默认: 30)",
+    )
+    parser.add_argument(
+        "--compression",
+        default=None,
+        choices=["zstd", "lz4", "zlib", "none"],
+        help=f"--compress 的熵编码方式 (默认: {available_compressions()[0]}，"
+        "zstd / lz4 需要安装 zstandard / lz4)",
+    )
+    parser.add_argument(
+        "--delta",
+        default="keyframe",
+        choices=["keyframe", "previous"],
+        help="--compress 的差分参考帧: keyframe (所在组的关键帧) 或 previous (前一帧) (默认: keyframe)",
+    )
+
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if args.compress:
+        if not (input_path.is_file() and is_sequence_path(input_path)):
+            raise ValueError(f"--compress 需要序列文件 (.mhrseq): {input_path}")
+        output_path = compress_sequence(
+            input_path,
+            keyframe_interval=args.keyframe_interval,
+            compression=args.compression,
+            delta=args.delta,
+        )
+        report = compression_report(input_path, output_path)
+        print(f"\n压缩完成: {output_path} ({report['frames']} 帧, {report['records']} 条记录)")
+        print(
+            f"大小: {report['sequence_bytes'] / 1024 / 1024:.1f} MB -> "
+            f"{report['compressed_bytes'] / 1024 / 1024:.1f} MB ({report['ratio']:.1f}x)"
+        )
+        for name, field in report["fields"].items():
+            print(
+                f"  {name}: {field['ratio']:.1f}x, 最大误差 {field['max_error'] * 1000:.3f} mm, "
+                f"解码 {field['decode_fps']:.0f} 帧/秒"
+            )
+        return
+
+    if input_path.is_file() and input_path.name.endswith(PARTIAL_SUFFIX):
+        sequence_path = recover_sequence(input_path)
+        print(f"\n序列文件已恢复: {sequence_path}")
+        return
+
+    if input_path.is_dir():
+        count, json_size, bin_size = convert_folder(input_path, args.delete_json)
+    elif input_path.is_file():
+        bin_path = convert_mhr_to_binary(input_path)
+        count, json_size, bin_size = 1, input_path.stat().st_size, bin_path.stat().st_size
+        if args.delete_json:
+            input_path.unlink()
+    else:
+        raise ValueError(f"输入不存在: {input_path}")
+
+    print(f"\n转换完成: {count} 个文件")
+    if count:
+        print(
+            f"大小: {json_size / 1024 / 1024:.1f} MB -> {bin_size / 1024 / 1024:.1f} MB "
+            f"({json_size / max(bin_size, 1):.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1877,21 +1877,16 @@ def process_single_image(filepath, est):
 
 def process_video_file(filepath, frame_skip, est):
     """处理视频"""
-    import cv2
     import json
-    from tools.mhr_io import save_mhr, numpy_to_list
+    from tools.mhr_io import dump_json, save_mhr, save_mhr_without_faces
+    from sam_3d_body.data.utils.frame_context import FrameContext
+    from tools.output_writer import AsyncOutputWriter
+    from tools.video_reader import PrefetchVideoReader, probe_video
     
     processing_status['message'] = '正在分析视频...'
     processing_status['is_video'] = True
     
-    cap = cv2.VideoCapture(filepath)
-    if not cap.isOpened():
-        raise ValueError("无法打开视频")
-    
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps, total_frames, width, height = probe_video(filepath)
     
     frames_to_process = list(range(0, total_frames, frame_skip + 1))
     num_frames = len(frames_to_process)
@@ -1915,91 +1910,66 @@ def process_video_file(filepath, frame_skip, est):
     
     faces_saved = False
     frame_times = []
+    # 解码在后台线程中顺序预读，保存MHR文件在后台线程中进行，推理不等待解码和磁盘
+    # 保留解码得到的BGR帧，检测器直接使用，RGB只转换一次 (见 FrameContext)
+    reader = PrefetchVideoReader(filepath, frames_to_process, rgb=False)
+    writer = AsyncOutputWriter(max_pending=8)
+    frame_start = time.time()
     
-    for i, frame_idx in enumerate(frames_to_process):
-        frame_start = time.time()
-        
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        ret, frame = cap.read()
-        if not ret:
-            continue
-        
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        try:
-            outputs = est.process_one_image(frame_rgb, bbox_thr=0.8, use_mask=False)
-        except:
-            continue
+    # 出错时 (例如磁盘已满，保存错误在submit中重新抛出) 也停止解码线程、释放视频并关闭保存线程
+    with reader, writer:
+        for i, (frame_idx, frame_bgr) in enumerate(reader):
+            try:
+                outputs = est.process_one_image(
+                    FrameContext(frame_bgr, "bgr"), bbox_thr=0.8, use_mask=False
+                )
+            except:
+                continue
         
-        frame_time = time.time() - frame_start
-        frame_times.append(frame_time)
+            frame_time = time.time() - frame_start
+            frame_times.append(frame_time)
+            frame_start = time.time()
         
-        # 更新进度
-        progress = 10 + int(90 * (i + 1) / num_frames)
-        avg_time = sum(frame_times) / len(frame_times)
-        remaining = (num_frames - i - 1) * avg_time
+            # 更新进度
+            progress = 10 + int(90 * (i + 1) / num_frames)
+            avg_time = sum(frame_times) / len(frame_times)
+            remaining = (num_frames - i - 1) * avg_time
         
-        processing_status['progress'] = progress
-        processing_status['current_frame'] = i + 1
-        processing_status['message'] = f'处理中... {i+1}/{num_frames}'
+            processing_status['progress'] = progress
+            processing_status['current_frame'] = i + 1
+            processing_status['message'] = f'处理中... {i+1}/{num_frames}'
         
-        if remaining < 60:
-            processing_status['eta'] = f"{remaining:.0f}秒"
-        else:
-            processing_status['eta'] = f"{remaining/60:.1f}分钟"
-        
-        if not outputs:
-            continue
+            if remaining < 60:
+                processing_status['eta'] = f"{remaining:.0f}秒"
+            else:
+                processing_status['eta'] = f"{remaining/60:.1f}分钟"
         
-        frame_name = f"frame_{frame_idx:06d}"
-        mhr_path = video_output / f"{frame_name}.mhr.json"
+            if not outputs:
+                continue
         
-        if not faces_saved:
-            save_mhr(mhr_path, outputs, est.faces, image_path=f"frame_{frame_idx}", image_size=(width, height))
-            faces_saved = True
-            with open(video_output / "faces.json", 'w') as f:
-                json.dump(est.faces.tolist(), f)
-        else:
-            # 不保存faces的版本
-            mhr_data = {
-                "version": "1.0",
-                "image_path": f"frame_{frame_idx}",
-                "image_size": [width, height],
+            frame_name = f"frame_{frame_idx:06d}"
+            mhr_path = video_output / f"{frame_name}.mhr.json"
+            record = {
+                "frame_idx": frame_idx,
+                "file": f"{frame_name}.mhr.json",
                 "num_people": len(outputs),
-                "faces": None,
-                "people": []
             }
-            for j, person in enumerate(outputs):
-                person_data = {
-                    "id": j,
-                    "bbox": numpy_to_list(person.get("bbox")),
-                    "focal_length": float(person.get("focal_length", 500.0)),
-                    "camera": {"translation": numpy_to_list(person.get("pred_cam_t"))},
-                    "mesh": {
-                        "vertices": numpy_to_list(person.get("pred_vertices")),
-                        "keypoints_3d": numpy_to_list(person.get("pred_keypoints_3d")),
-                        "keypoints_2d": numpy_to_list(person.get("pred_keypoints_2d")),
-                    },
-                    "params": {
-                        "global_rot": numpy_to_list(person.get("global_rot")),
-                        "body_pose": numpy_to_list(person.get("body_pose_params")),
-                        "shape": numpy_to_list(person.get("shape_params")),
-                        "scale": numpy_to_list(person.get("scale_params")),
-                        "hand": numpy_to_list(person.get("hand_pose_params")),
-                        "expression": numpy_to_list(person.get("expr_params")),
-                    }
-                }
-                mhr_data["people"].append(person_data)
-            with open(mhr_path, 'w') as f:
-                json.dump(mhr_data, f)
         
-        video_info["processed_frames"].append({
-            "frame_idx": frame_idx,
-            "file": f"{frame_name}.mhr.json",
-            "num_people": len(outputs),
-        })
-    
-    cap.release()
+            if not faces_saved:
+                writer.submit(
+                    save_mhr, mhr_path, outputs, est.faces,
+                    image_path=f"frame_{frame_idx}", image_size=(width, height), record=record,
+                )
+                faces_saved = True
+                writer.submit(dump_json, video_output / "faces.json", est.faces)
+            else:
+                # 不保存faces的版本
+                writer.submit(
+                    save_mhr_without_faces, mhr_path, outputs,
+                    image_path=f"frame_{frame_idx}", image_size=(width, height), record=record,
+                )
+
+    video_info["processed_frames"] = writer.records
     
     with open(video_output / "video_info.json", 'w') as f:
         json.dump(video_info, f, indent=2)
@@ -0,0 +1,102 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+推理包导出脚本 - 将模型权重、配置和MHR模型打包为单个文件
+
+使用方法:
+    python export_bundle.py --checkpoint_path ./checkpoints/sam-3d-body-dinov3/model.ckpt
+
+输出:
+    - checkpoints/sam-3d-body-dinov3/model.bundle.safetensors
+      (推理精度的权重 + 解析后的配置 + MHR缓冲区 + 可选的MHR计算图)
+
+之后可直接将推理包作为 --checkpoint_path 传给 process_image.py / process_video.py，
+无需 model_config.yaml 和 assets/mhr_model.pt。
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+import pyrootutils
+
+root = pyrootutils.setup_root(
+    search_from=__file__,
+    indicator=[".git", "pyproject.toml", ".sl"],
+    pythonpath=True,
+    dotenv=True,
+)
+
+from sam_3d_body import export_bundle, load_sam_3d_body
+from sam_3d_body.build_models import BUNDLE_SUFFIX
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="导出SAM 3D Body单文件推理包",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+    python export_bundle.py --checkpoint_path ./checkpoints/sam-3d-body-dinov3/model.ckpt
+    python export_bundle.py --checkpoint_path ./model.ckpt --output ./model.bundle.safetensors --freeze_mhr
+        """,
+    )
+    parser.add_argument(
+        "--checkpoint_path",
+        default="./checkpoints/sam-3d-body-dinov3/model.ckpt",
+        type=str,
+        help="SAM 3D Body模型检查点路径",
+    )
+    parser.add_argument(
+        "--mhr_path",
+        default="./checkpoints/sam-3d-body-dinov3/assets/mhr_model.pt",
+        type=str,
+        help="MHR资源路径",
+    )
+    parser.add_argument(
+        "--output",
+        default="",
+        type=str,
+        help=f"输出路径 (默认: 检查点同目录下的 <名称>{BUNDLE_SUFFIX})",
+    )
+    parser.add_argument(
+        "--no_mhr_graph",
+        action="store_true",
+        default=False,
+        help="不嵌入MHR计算图 (加载时需要提供 --mhr_path)",
+    )
+    parser.add_argument(
+        "--freeze_mhr",
+        action="store_true",
+        default=False,
+        help="嵌入经 torch.jit.freeze 冻结的MHR计算图",
+    )
+
+    args = parser.parse_args()
+
+    mhr_path = args.mhr_path or os.environ.get("SAM3D_MHR_PATH", "")
+    output = args.output
+    if not output:
+        checkpoint_path = Path(args.checkpoint_path)
+        output = str(checkpoint_path.with_name(checkpoint_path.stem + BUNDLE_SUFFIX))
+
+    # 在CPU上加载，权重以推理时的精度导出
+    model, model_cfg = load_sam_3d_body(
+        args.checkpoint_path, device="cpu", mhr_path=mhr_path
+    )
+    export_bundle(
+        model,
+        model_cfg,
+        output,
+        mhr_path=mhr_path,
+        include_mhr_graph=not args.no_mhr_graph,
+        freeze_mhr_graph=args.freeze_mhr,
+    )
+
+    size_mb = os.path.getsize(output) / 1024 / 1024
+    print(f"\n推理包已保存到: {output} ({size_mb:.1f} MB)")
+    print(f"使用方法:")
+    print(f"  python process_video.py --video your_video.mp4 --checkpoint_path {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+网格导出脚本 - 将处理好的视频 (或单个MHR文件) 逐帧导出为OBJ / PLY网格，
+或整段导出为一个带动画的GLB文件
+
+使用方法:
+    python export_meshes.py --input output/video_name/
+    python export_meshes.py --input output/video_name/video_name.mhrseq --format obj
+    python export_meshes.py --input output/video_name/ --format glb   # 一个文件，可导入Blender / Maya
+    python export_meshes.py --input output/video_name/ --checkpoint_path ./checkpoints/sam-3d-body-dinov3/model.ckpt
+                                                         # 仅参数模式的输出 (重建网格后导出)
+
+输出:
+    - <输出目录>/frame_XXXXXX_person<i>.ply (或 .obj)，默认输出目录为 <输入目录>/meshes
+    - --format glb 时为 <输出目录>/<视频名>.glb，默认输出目录为输入目录
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from tqdm import tqdm
+
+from tools.gltf_export import GLB_SUFFIX, export_glb
+from tools.mesh_export import MeshSource, export_meshes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="将MHR输出逐帧导出为OBJ / PLY网格 (多进程并行) 或带动画的GLB",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+    python export_meshes.py --input output/video_name/
+    python export_meshes.py --input output/video_name/ --format obj --start_frame 100 --end_frame 200
+    python export_meshes.py --input output/image.mhr.json --output_folder ./meshes
+        """,
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        type=str,
+        help="视频输出目录、序列文件 (.mhrseq / .mhrz) 或单个 .mhr.json / .mhr.bin 文件",
+    )
+    parser.add_argument(
+        "--output_folder",
+        default="",
+        type=str,
+        help="网格输出目录 (默认: <输入目录>/meshes，glb时为输入目录)",
+    )
+    parser.add_argument(
+        "--format",
+        default="ply",
+        choices=["ply", "obj", "glb"],
+        help="网格格式: ply (二进制，体积小、导出快)、obj (文本) "
+        "或 glb (整段一个带动画的glTF文件，共享面片) (默认: ply)",
+    )
+    parser.add_argument(
+        "--glb_mode",
+        default="nodes",
+        choices=["nodes", "morph"],
+        help="GLB动画方式: nodes (每帧一个网格节点) 或 morph (每段每人一个网格，段内每帧一个变形目标，"
+        "适合three.js播放) (默认: nodes)",
+    )
+    parser.add_argument(
+        "--glb_clip_frames",
+        default=300,
+        type=int,
+        help="morph方式每段的帧数，权重数据随其线性增长 (默认: 300)",
+    )
+    parser.add_argument(
+        "--no_translation",
+        action="store_true",
+        default=False,
+        help="GLB中不加相机平移 (人固定在原点)",
+    )
+    parser.add_argument(
+        "--workers",
+        default=0,
+        type=int,
+        help="工作进程数 (默认: 0 表示CPU核数，1表示不使用多进程)",
+    )
+    parser.add_argument(
+        "--start_frame",
+        default=0,
+        type=int,
+        help="起始帧 (默认: 0)",
+    )
+    parser.add_argument(
+        "--end_frame",
+        default=-1,
+        type=int,
+        help="结束帧 (不包含，默认: -1 表示到最后)",
+    )
+    parser.add_argument(
+        "--checkpoint_path",
+        default="",
+        type=str,
+        help="SAM 3D Body检查点或推理包，仅参数模式的输出需要用它重建网格",
+    )
+    parser.add_argument(
+        "--mhr_path",
+        default="",
+        type=str,
+        help="MHR模型路径 (检查点所需)",
+    )
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    source = MeshSource(input_path)
+    frame_indices = [
+        i for i in source.frame_indices
+        if i >= args.start_frame and (args.end_frame < 0 or i < args.end_frame)
+    ]
+    if not frame_indices:
+        print(f"错误: 没有可导出的帧: {input_path}")
+        return
+
+    input_folder = input_path if input_path.is_dir() else input_path.parent
+    if args.output_folder:
+        output_folder = Path(args.output_folder)
+    elif args.format == "glb":
+        output_folder = input_folder
+    else:
+        output_folder = input_folder / "meshes"
+
+    reconstructor = None
+    if args.checkpoint_path:
+        from tools.mhr_reconstruct import MeshReconstructor
+
+        print(f"加载MHR模型用于网格重建: {args.checkpoint_path}")
+        reconstructor = MeshReconstructor.from_checkpoint(
+            args.checkpoint_path, mhr_path=args.mhr_path, cache_size=0
+        )
+
+    start = time.time()
+    if args.format == "glb":
+        with tqdm(total=len(frame_indices), desc="导出GLB") as pbar:
+            result = export_glb(
+                source,
+                output_folder / f"{source.name}{GLB_SUFFIX}",
+                mode=args.glb_mode,
+                clip_frames=args.glb_clip_frames,
+                frame_indices=frame_indices,
+                with_translation=not args.no_translation,
+                reconstructor=reconstructor,
+                progress=lambda n: pbar.update(n - pbar.n),
+            )
+        print(f"\n导出完成: {result['frames']} 帧, {result['people']} 人, 用时 {time.time() - start:.1f}秒")
+        print(f"输出文件: {result['output_path']}")
+        return
+
+    with tqdm(total=len(frame_indices), desc="导出网格") as pbar:
+        result = export_meshes(
+            source,
+            output_folder,
+            mesh_format=args.format,
+            frame_indices=frame_indices,
+            num_workers=args.workers or None,
+            reconstructor=reconstructor,
+            progress=lambda n: pbar.update(n - pbar.n),
+        )
+    elapsed = time.time() - start
+
+    print(f"\n导出完成: {result['frames']} 帧, {result['meshes']} 个网格, 用时 {elapsed:.1f}秒")
+    print(f"输出目录: {result['output_folder']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+插值脚本 - 由跳帧处理 (--frame_skip / --adaptive) 的输出插值补全跳过的帧，得到全帧率的动作
+
+使用方法:
+    python interpolate_video.py --input output/video_name/ --checkpoint_path ./checkpoints/sam-3d-body-dinov3/model.ckpt
+    python interpolate_video.py --input output/video_name/video_name.mhrseq   # 仅参数模式的输出不需要检查点
+
+输出:
+    插值帧写回原输出 (帧文件或序列文件)，video_info.json 中对应记录带 "interpolated": true
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from tqdm import tqdm
+
+from tools.interpolate import interpolate_video
+from tools.mesh_export import MeshSource
+from tools.mhr_codec import COMPRESSED_SUFFIX
+from tools.mhr_sequence import SEQUENCE_SUFFIX
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="由处理过的帧插值补全跳过的帧 (全局旋转球面插值，其余参数线性插值，批量重建网格)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+    python interpolate_video.py --input output/video_name/ --checkpoint_path ./checkpoints/sam-3d-body-dinov3/model.ckpt
+    python interpolate_video.py --input output/video_name/ --max_gap 10
+        """,
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        type=str,
+        help="process_video.py 的输出目录或 .mhrseq 序列文件",
+    )
+    parser.add_argument(
+        "--checkpoint_path",
+        default="",
+        type=str,
+        help="SAM 3D Body检查点或推理包，保存了网格的输出需要用它重建插值帧的网格",
+    )
+    parser.add_argument(
+        "--mhr_path",
+        default="",
+        type=str,
+        help="MHR模型路径 (检查点所需)",
+    )
+    parser.add_argument(
+        "--max_gap",
+        default=30,
+        type=int,
+        help="相邻两个处理帧最多相隔多少帧时才插值 (默认: 30)",
+    )
+    parser.add_argument(
+        "--min_iou",
+        default=0.3,
+        type=float,
+        help="相邻处理帧中两个检测框被认为是同一个人的最小IoU (默认: 0.3)",
+    )
+    args = parser.parse_args()
+
+    reconstructor = None
+    if not MeshSource(args.input, prefer_raw=True).params_only:
+        if not args.checkpoint_path:
+            print("错误: 输出中保存了网格，请用 --checkpoint_path 指定检查点以重建插值帧的网格")
+            return
+        from tools.mhr_reconstruct import MeshReconstructor
+
+        print(f"加载MHR模型用于网格重建: {args.checkpoint_path}")
+        reconstructor = MeshReconstructor.from_checkpoint(
+            args.checkpoint_path, mhr_path=args.mhr_path, cache_size=0
+        )
+
+    start = time.time()
+    with tqdm(desc="插值跳过的帧") as pbar:
+        result = interpolate_video(
+            args.input,
+            reconstructor,
+            max_gap=args.max_gap,
+            min_iou=args.min_iou,
+            progress=lambda n: pbar.update(n - pbar.n),
+        )
+    print(
+        f"\n插值完成: 由 {result['keyframes']} 个关键帧补全 {result['interpolated']} 帧, "
+        f"用时 {time.time() - start:.1f}秒"
+    )
+    print(f"输出: {result['output']}")
+    output = Path(result["output"])
+    if output.name.endswith(SEQUENCE_SUFFIX):
+        compressed = output.with_name(output.name[: -len(SEQUENCE_SUFFIX)] + COMPRESSED_SUFFIX)
+        if compressed.exists():
+            print(f"注意: 压缩序列 {compressed.name} 不包含插值帧，请重新压缩: "
+                  f"python convert_mhr.py --input {output} --compress")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,518 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+批处理脚本 - 模型只加载一次，依次处理一批视频和图片
+
+每个工作进程加载一次SAM 3D Body、检测器、分割器和FOV估计器，然后从任务队列中
+取文件处理 (视频按文件大小从大到小优先调度，减少最后只剩一个长视频在跑的情况)。
+已完成的输出默认跳过，处理到一半的视频从中断处继续 (与 process_video.py --resume 相同)。
+
+使用方法:
+    python process_batch.py --input ./clips/
+    python process_batch.py --input "./clips/*.mp4" ./photos/ --workers 2
+    python process_batch.py --input list.txt    # 每行一个文件路径 (#开头为注释)
+
+输出:
+    - output/<视频名>/...            # 与 process_video.py 相同
+    - output/<图片名>.mhr.json       # 与 process_image.py 相同
+    - output/batch_report.json       # 每个文件的状态、用时和错误信息
+    不同目录中文件名 (不含扩展名) 相同的视频或图片输出到以相对目录命名的子目录中，
+    例如 a/clip.mp4 和 b/clip.mp4 分别输出到 output/a/clip/ 和 output/b/clip/
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+
+import pyrootutils
+
+root = pyrootutils.setup_root(
+    search_from=__file__,
+    indicator=[".git", "pyproject.toml", ".sl"],
+    pythonpath=True,
+    dotenv=True,
+)
+
+import torch
+from tqdm import tqdm
+
+from process_image import build_parser as build_image_parser, process_image
+from process_video import build_parser as build_video_parser, process_video
+from tools.build_estimator import build_estimator
+from tools.manifest import frame_file_valid
+from tools.mhr_io import MHR_BINARY_SUFFIX, MHR_JSON_SUFFIX, atomic_write
+
+# webdataset格式的tar分片与视频一样由 process_video.py 处理 (见 tools/frame_sources.py)
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".tar"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+LIST_EXTENSIONS = {".txt", ".lst"}
+
+# 批处理参数中传给每个文件的参数 (其余使用 process_video.py / process_image.py 的默认值)
+_SHARED_ARGS = (
+    "output_folder", "checkpoint_path", "detector_name", "segmentor_name", "fov_name",
+    "detector_path", "segmentor_path", "fov_path", "mhr_path", "local_moge_path",
+    "bbox_thresh", "use_mask", "save_vis", "output_format", "params_only", "frame_skip",
+)
+
+# 某个文件在这么多次工作进程崩溃时都正在处理，就认为是它导致了崩溃
+# (崩溃时只有一个文件在处理则立即确定)
+MAX_CRASHES = 2
+
+# 工作进程中已加载的估计器 (每个进程加载一次)
+_estimator = None
+_load_seconds = 0.0
+# 共享数组: 每个工作进程正在处理的任务序号 (-1为空闲)，进程池崩溃后据此找出出错的文件
+_running = None
+_worker_id = 0
+
+
+def file_kind(path):
+    """文件类型: "video"、"image" 或 None"""
+    suffix = Path(path).suffix.lower()
+    if suffix in VIDEO_EXTENSIONS:
+        return "video"
+    if suffix in IMAGE_EXTENSIONS:
+        return "image"
+    return None
+
+
+def collect_inputs(inputs, recursive=False):
+    """
+    由目录、通配符、文件列表 (.txt，每行一个路径) 或单个文件收集要处理的视频和图片
+
+    Returns:
+        去重后的 [(路径, 类型, 输出子目录)]，按输入顺序。
+        同类型的文件名 (不含扩展名) 重复时输出会互相覆盖，这些文件的输出子目录为
+        相对于它们共同上级目录的路径 (同一目录中只有扩展名不同时再加上扩展名)，其余为 "."
+    """
+    paths = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            pattern = "**/*" if recursive else "*"
+            paths.extend(sorted(p for p in path.glob(pattern) if p.is_file()))
+        elif path.suffix.lower() in LIST_EXTENSIONS and path.is_file():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        # 相对路径相对于列表文件所在目录
+                        paths.append(path.parent / line)
+        elif glob.has_magic(item):
+            paths.extend(Path(p) for p in sorted(glob.glob(item, recursive=recursive)))
+        else:
+            paths.append(path)
+
+    jobs, seen = [], set()
+    for path in paths:
+        kind = file_kind(path)
+        key = str(path.resolve())
+        if kind is None or key in seen:
+            continue
+        seen.add(key)
+        jobs.append((path, kind))
+    subdirs = _output_subdirs(jobs)
+    return [(path, kind, subdirs[i]) for i, (path, kind) in enumerate(jobs)]
+
+
+def _output_subdirs(jobs):
+    """每个任务的输出子目录 (见 collect_inputs)"""
+    groups = {}
+    for i, (path, kind) in enumerate(jobs):
+        # 不区分大小写 (Windows、macOS的文件系统)
+        groups.setdefault((kind, path.stem.lower()), []).append(i)
+    subdirs = [Path(".")] * len(jobs)
+    for indices in groups.values():
+        if len(indices) < 2:
+            continue
+        parents = [jobs[i][0].resolve().parent for i in indices]
+        common = Path(os.path.commonpath(parents))
+        for i, parent in zip(indices, parents):
+            subdirs[i] = parent.relative_to(common)
+        relative = [str(subdirs[i]).lower() for i in indices]
+        for i in indices:
+            if relative.count(str(subdirs[i]).lower()) > 1:
+                subdirs[i] = subdirs[i] / jobs[i][0].suffix.lower().lstrip(".")
+    return subdirs
+
+
+def job_output_folder(subdir, args):
+    """某个任务的输出目录"""
+    return Path(args.output_folder) / subdir
+
+
+def image_output_path(path, subdir, args):
+    """图片的MHR输出路径"""
+    suffix = MHR_BINARY_SUFFIX if args.output_format == "bin" else MHR_JSON_SUFFIX
+    return job_output_folder(subdir, args) / f"{Path(path).stem}{suffix}"
+
+
+def is_completed(path, kind, subdir, args):
+    """输出是否已经完整 (视频: video_info.json已写入；图片: MHR文件完整)"""
+    if kind == "video":
+        return (job_output_folder(subdir, args) / Path(path).stem / "video_info.json").exists()
+    output = image_output_path(path, subdir, args)
+    return frame_file_valid(output.parent, {"file": output.name, "num_people": 1})
+
+
+def file_args(path, kind, subdir, args):
+    """某个文件的处理参数: 对应脚本的默认参数 + 批处理的共享参数"""
+    if kind == "video":
+        parsed = build_video_parser().parse_args(["--video", str(path)])
+        # 批处理中不再分片并行，处理到一半的视频从中断处继续
+        parsed.workers = 1
+        parsed.resume = not args.force
+    else:
+        parsed = build_image_parser().parse_args(["--image", str(path)])
+    for key in _SHARED_ARGS:
+        if hasattr(parsed, key):
+            setattr(parsed, key, getattr(args, key))
+    parsed.output_folder = str(job_output_folder(subdir, args))
+    if kind == "image" and parsed.output_format == "seq":
+        # 图片没有序列格式
+        parsed.output_format = "json"
+    return parsed
+
+
+def _init_worker(args, counter, running=None):
+    """工作进程初始化: 加载一次模型"""
+    global _estimator, _load_seconds, _running, _worker_id
+    with counter.get_lock():
+        worker_id = counter.value
+        counter.value += 1
+    _running, _worker_id = running, worker_id
+    device = None
+    if torch.cuda.is_available():
+        # 有多个GPU时各工作进程轮流使用
+        device = torch.device("cuda", worker_id % torch.cuda.device_count())
+    if args.workers > 1:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // args.workers))
+    start = time.time()
+    _estimator = build_estimator(args, device)
+    _load_seconds = time.time() - start
+
+
+def run_job(path, kind, subdir, args, job_id=-1):
+    """用已加载的估计器处理一个文件，返回报告条目 (异常记录在条目中，不抛出)"""
+    entry = {"path": str(path), "type": kind, "worker": os.getpid()}
+    start = time.time()
+    if _running is not None:
+        _running[_worker_id % len(_running)] = job_id
+    try:
+        if kind == "video":
+            result = process_video(file_args(path, kind, subdir, args), _estimator)
+            entry.update(
+                status="done",
+                output=result["output_folder"],
+                frames=result["frames"],
+                processed=result["processed"],
+                resumed=result["completed"],
+            )
+        else:
+            result = process_image(file_args(path, kind, subdir, args), _estimator)
+            entry.update(
+                status="done" if result["output"] else "no_person",
+                output=result["output"],
+                num_people=result["num_people"],
+            )
+    except Exception as e:
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    finally:
+        if _running is not None:
+            _running[_worker_id % len(_running)] = -1
+    entry["seconds"] = round(time.time() - start, 3)
+    entry["model_load_seconds"] = round(_load_seconds, 3)
+    return entry
+
+
+def _failed_entry(path, kind, error):
+    return {"path": str(path), "type": kind, "status": "failed", "error": error, "seconds": None}
+
+
+def run_parallel(pending, args, finish):
+    """
+    在多个工作进程中处理文件，每个处理完的文件调用 finish(报告条目)
+
+    某个工作进程崩溃 (例如显存不足被终止) 会使整个进程池损坏，所有未完成的任务都得到
+    BrokenProcessPool。此时只把崩溃时正在处理的文件记为失败 (同时处理多个文件时，
+    它们要在 MAX_CRASHES 次崩溃中都在处理才记为失败)，然后重建进程池 (重新加载模型)，
+    继续处理其余的文件。
+    """
+    context = multiprocessing.get_context("spawn")
+    jobs = dict(enumerate(pending))  # 任务序号 -> (路径, 类型, 输出子目录)，按调度顺序
+    crashes = {}
+    with tqdm(total=len(jobs), desc="批处理") as pbar:
+        while jobs:
+            running = context.Array("i", [-1] * args.workers)
+            broken = None
+            # 每个工作进程加载一次模型，文件按顺序分配给空闲的进程
+            with ProcessPoolExecutor(
+                max_workers=args.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(args, context.Value("i", 0), running),
+            ) as executor:
+                futures = {
+                    executor.submit(run_job, path, kind, subdir, args, job_id): job_id
+                    for job_id, (path, kind, subdir) in jobs.items()
+                }
+                for future in as_completed(futures):
+                    job_id = futures[future]
+                    path, kind, _ = jobs[job_id]
+                    try:
+                        entry = future.result()
+                    except BrokenProcessPool as e:
+                        # 之后重新提交
+                        broken = e
+                        continue
+                    except Exception as e:
+                        entry = _failed_entry(path, kind, f"{type(e).__name__}: {e}")
+                    del jobs[job_id]
+                    finish(entry)
+                    pbar.update(1)
+            if broken is None:
+                break
+
+            suspects = [job_id for job_id in set(running[:]) if job_id in jobs]
+            if not suspects:
+                # 没有文件在处理时崩溃 (例如加载模型时)，重建进程池也无济于事
+                for job_id, (path, kind, _) in jobs.items():
+                    finish(_failed_entry(path, kind, f"工作进程崩溃: {broken}"))
+                    pbar.update(1)
+                break
+            for job_id in suspects:
+                crashes[job_id] = crashes.get(job_id, 0) + 1
+                if len(suspects) == 1 or crashes[job_id] >= MAX_CRASHES:
+                    path, kind, _ = jobs.pop(job_id)
+                    finish(_failed_entry(path, kind, f"处理时工作进程崩溃 (例如显存或内存不足): {broken}"))
+                    pbar.update(1)
+            if jobs:
+                print(f"\n警告: 工作进程崩溃，重建进程池继续处理剩余的 {len(jobs)} 个文件")
+
+
+def write_report(report_path, report):
+    """原子写入批处理报告"""
+    counts = {}
+    for entry in report["files"]:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    report["totals"] = counts
+    with atomic_write(report_path, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def process_batch(args):
+    """处理一批视频和图片，返回报告"""
+    output_folder = Path(args.output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    report_path = Path(args.report) if args.report else output_folder / "batch_report.json"
+
+    jobs = collect_inputs(args.input, recursive=args.recursive)
+    if not jobs:
+        raise ValueError(f"没有找到视频或图片: {args.input}")
+
+    entries = {}
+    pending = []
+    for path, kind, subdir in jobs:
+        if not args.force and is_completed(path, kind, subdir, args):
+            entries[str(path)] = {"path": str(path), "type": kind, "status": "skipped", "seconds": 0.0}
+        else:
+            pending.append((path, kind, subdir))
+    videos = sum(kind == "video" for _, kind, _ in jobs)
+    renamed = sum(subdir != Path(".") for _, _, subdir in jobs)
+    if renamed:
+        print(f"{renamed} 个文件与其他文件同名，输出到以相对目录命名的子目录中")
+    print(f"共 {len(jobs)} 个文件 ({videos} 个视频, {len(jobs) - videos} 张图片)，"
+          f"跳过已完成的 {len(jobs) - len(pending)} 个")
+
+    # 视频按大小从大到小优先调度，图片最后
+    pending.sort(key=lambda job: (job[1] != "video", -job[0].stat().st_size if job[0].exists() else 0))
+
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "workers": args.workers,
+        "files": [],
+    }
+    start = time.time()
+
+    def finish(entry):
+        entries[entry["path"]] = entry
+        report["files"] = [entries[str(path)] for path, _, _ in jobs if str(path) in entries]
+        report["elapsed_seconds"] = round(time.time() - start, 3)
+        write_report(report_path, report)
+        if entry["status"] == "failed":
+            print(f"警告: 处理失败 {entry['path']}: {entry['error']}")
+
+    if pending and args.workers <= 1:
+        _init_worker(args, multiprocessing.Value("i", 0))
+        for path, kind, subdir in tqdm(pending, desc="批处理"):
+            finish(run_job(path, kind, subdir, args))
+    elif pending:
+        run_parallel(pending, args, finish)
+    else:
+        report["elapsed_seconds"] = 0.0
+        report["files"] = [entries[str(path)] for path, _, _ in jobs]
+        write_report(report_path, report)
+
+    print(f"\n批处理完成! 用时 {report['elapsed_seconds']:.1f}秒")
+    for status, count in sorted(report["totals"].items()):
+        print(f"  {status}: {count}")
+    failed = [e for e in report["files"] if e["status"] == "failed"]
+    for entry in failed:
+        print(f"  失败: {entry['path']} - {entry['error']}")
+    print(f"报告: {report_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="批量处理视频和图片 (模型只加载一次)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+    python process_batch.py --input ./clips/
+    python process_batch.py --input "./clips/**/*.mp4" --recursive --workers 2
+    python process_batch.py --input list.txt --output_format seq --params_only
+    python process_batch.py --input ./clips/ --force   # 重新处理所有文件
+        """,
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        nargs="+",
+        type=str,
+        help="输入: 目录、通配符 (需加引号)、文件列表 (.txt，每行一个路径) 或单个视频/图片，可指定多个",
+    )
+    parser.add_argument(
+        "--output_folder",
+        default="./output",
+        type=str,
+        help="输出目录 (默认: ./output)",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="工作进程数，每个进程加载一份模型 (默认: 1，在当前进程中处理)",
+    )
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        default=False,
+        help="递归搜索子目录 (通配符中可使用 **)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        default=False,
+        help="重新处理已完成的文件 (默认跳过已完成的文件，处理到一半的视频从中断处继续)",
+    )
+    parser.add_argument(
+        "--report",
+        default="",
+        type=str,
+        help="报告文件路径 (默认: <输出目录>/batch_report.json)",
+    )
+    parser.add_argument(
+        "--checkpoint_path",
+        default="./checkpoints/sam-3d-body-dinov3/model.ckpt",
+        type=str,
+        help="SAM 3D Body模型检查点路径 (也可以是 .bundle.safetensors 推理包)",
+    )
+    parser.add_argument(
+        "--detector_name",
+        default="vitdet",
+        type=str,
+        help="人体检测模型名称 (默认: vitdet)",
+    )
+    parser.add_argument(
+        "--segmentor_name",
+        default="sam2",
+        type=str,
+        help="人体分割模型名称 (默认: sam2)",
+    )
+    parser.add_argument(
+        "--fov_name",
+        default="moge2",
+        type=str,
+        help="FOV估计模型名称 (默认: moge2)",
+    )
+    parser.add_argument(
+        "--detector_path",
+        default="",
+        type=str,
+        help="人体检测模型路径",
+    )
+    parser.add_argument(
+        "--segmentor_path",
+        default="",
+        type=str,
+        help="人体分割模型路径",
+    )
+    parser.add_argument(
+        "--fov_path",
+        default="",
+        type=str,
+        help="FOV估计模型路径",
+    )
+    parser.add_argument(
+        "--mhr_path",
+        default="./checkpoints/sam-3d-body-dinov3/assets/mhr_model.pt",
+        type=str,
+        help="MHR资源路径",
+    )
+    parser.add_argument(
+        "--local_moge_path",
+        default="./checkpoints/moge-2-vitl-normal/model.pt",
+        type=str,
+        help="本地MoGe模型文件路径",
+    )
+    parser.add_argument(
+        "--bbox_thresh",
+        default=0.8,
+        type=float,
+        help="检测框阈值 (默认: 0.8)",
+    )
+    parser.add_argument(
+        "--use_mask",
+        action="store_true",
+        default=False,
+        help="使用掩膜条件预测",
+    )
+    parser.add_argument(
+        "--frame_skip",
+        default=0,
+        type=int,
+        help="视频跳帧数 (默认: 0)",
+    )
+    parser.add_argument(
+        "--save_vis",
+        action="store_true",
+        default=False,
+        help="保存可视化结果",
+    )
+    parser.add_argument(
+        "--output_format",
+        default="json",
+        choices=["json", "bin", "seq"],
+        help="MHR输出格式: json、bin 或 seq (仅视频，图片使用json) (默认: json)",
+    )
+    parser.add_argument(
+        "--params_only",
+        action="store_true",
+        default=False,
+        help="只保存MHR参数 (查看时用 viewer.py --checkpoint_path 重建网格)",
+    )
+
+    args = parser.parse_args()
+    process_batch(args)
+
+
+if __name__ == "__main__":
+    main()
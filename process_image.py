@@ -7,12 +7,13 @@
 
 输出:
     - output/<image_name>.mhr.json  # MHR数据文件，可用于网页查看器
+                                    # (--output_format bin 时为 .mhr.bin，
+                                    #  --params_only 时只保存MHR参数)
     - output/<image_name>.obj       # OBJ格式3D模型 (可选)
     - output/<image_name>_vis.jpg   # 可视化结果 (可选)
 """
 
 import argparse
-import os
 from pathlib import Path
 
 import pyrootutils
@@ -26,67 +27,31 @@ root = pyrootutils.setup_root(
 
 import cv2
 import numpy as np
-import torch
-from sam_3d_body import load_sam_3d_body, SAM3DBodyEstimator
-from tools.mhr_io import save_mhr, export_obj
+from sam_3d_body.data.utils.frame_context import FrameContext
+from tools.build_estimator import build_estimator
+from tools.mhr_io import MHR_BINARY_SUFFIX, MHR_JSON_SUFFIX, save_mhr, export_obj
 from tools.vis_utils import visualize_sample_together
 
 
-def process_image(args):
-    """处理单张图片并生成MHR文件"""
+def process_image(args, estimator=None):
+    """
+    处理单张图片并生成MHR文件
+
+    Args:
+        args: 命令行参数 (见 build_parser)
+        estimator: 已加载的估计器 (批处理时复用，不重新加载模型)
+
+    Returns:
+        {"num_people": 人数, "output": MHR文件路径 (未检测到人体时为None)}
+    """
 
     # 设置输出目录
     output_folder = Path(args.output_folder)
     output_folder.mkdir(parents=True, exist_ok=True)
 
-    # 获取模型路径
-    mhr_path = args.mhr_path or os.environ.get("SAM3D_MHR_PATH", "")
-    detector_path = args.detector_path or os.environ.get("SAM3D_DETECTOR_PATH", "")
-    segmentor_path = args.segmentor_path or os.environ.get("SAM3D_SEGMENTOR_PATH", "")
-    fov_path = args.fov_path or os.environ.get("SAM3D_FOV_PATH", "")
-
-    # 初始化设备
-    device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
-    print(f"使用设备: {device}")
-
-    # 加载SAM 3D Body模型
-    print("正在加载SAM 3D Body模型...")
-    model, model_cfg = load_sam_3d_body(
-        args.checkpoint_path, device=device, mhr_path=mhr_path
-    )
-
-    # 加载可选模块
-    human_detector, human_segmentor, fov_estimator = None, None, None
-
-    if args.detector_name:
-        from tools.build_detector import HumanDetector
-        print(f"正在加载人体检测器: {args.detector_name}")
-        human_detector = HumanDetector(
-            name=args.detector_name, device=device, path=detector_path
-        )
-
-    if len(segmentor_path):
-        from tools.build_sam import HumanSegmentor
-        print(f"正在加载人体分割器: {args.segmentor_name}")
-        human_segmentor = HumanSegmentor(
-            name=args.segmentor_name, device=device, path=segmentor_path
-        )
-
-    if args.fov_name:
-        from tools.build_fov_estimator import FOVEstimator
-        print(f"正在加载FOV估计器: {args.fov_name}")
-        # 优先使用local_moge_path，否则使用fov_path
-        moge_path = args.local_moge_path if args.local_moge_path else fov_path
-        fov_estimator = FOVEstimator(name=args.fov_name, device=device, path=moge_path)
-
-    # 创建估计器
-    estimator = SAM3DBodyEstimator(
-        sam_3d_body_model=model,
-        model_cfg=model_cfg,
-        human_detector=human_detector,
-        human_segmentor=human_segmentor,
-        fov_estimator=fov_estimator,
-    )
+    # 加载模型 (批处理时传入已加载的估计器)
+    if estimator is None:
+        estimator = build_estimator(args)
 
     # 处理图片
     image_path = Path(args.image)
@@ -98,16 +63,29 @@ def process_image(args):
         raise ValueError(f"无法读取图片: {image_path}")
     image_size = (img.shape[1], img.shape[0])  # (width, height)
 
-    # 运行推理
-    outputs = estimator.process_one_image(
-        str(image_path),
-        bbox_thr=args.bbox_thresh,
-        use_mask=args.use_mask,
-    )
+    # 运行推理 (直接使用已读取的BGR图像，不重复解码)
+    def run():
+        return estimator.process_one_image(
+            FrameContext(img, "bgr"),
+            bbox_thr=args.bbox_thresh,
+            use_mask=args.use_mask,
+        )
+
+    if args.profile:
+        # 先预热运行一次 (不计入)，再用torch.profiler记录一次
+        profile_dir = Path(args.profile_dir or output_folder / f"{image_path.stem}_profile")
+        with estimator.profile(profile_dir, num_frames=1, warmup=1, memory=args.profile_memory) as prof:
+            for _ in range(2):
+                outputs = run()
+                prof.step()
+        print(f"\n各阶段 (torch.profiler):\n{prof.format_stages()}")
+        print(f"性能分析结果 (Chrome trace、算子耗时表) 已保存到: {profile_dir}")
+    else:
+        outputs = run()
 
     if not outputs:
         print("未检测到人体!")
-        return
+        return {"num_people": 0, "output": None}
 
     print(f"检测到 {len(outputs)} 个人体")
 
@@ -115,13 +93,15 @@ def process_image(args):
     base_name = image_path.stem
 
     # 保存MHR文件
-    mhr_path_out = output_folder / f"{base_name}.mhr.json"
+    mhr_suffix = MHR_BINARY_SUFFIX if args.output_format == "bin" else MHR_JSON_SUFFIX
+    mhr_path_out = output_folder / f"{base_name}{mhr_suffix}"
     save_mhr(
         mhr_path_out,
         outputs,
         estimator.faces,
         image_path=str(image_path),
         image_size=image_size,
+        params_only=args.params_only,
     )
 
     # 可选：导出OBJ文件
@@ -140,15 +120,18 @@ def process_image(args):
     print(f"\n处理完成! MHR文件: {mhr_path_out}")
     print(f"使用以下命令启动网页查看器:")
     print(f"  python viewer.py --mhr {mhr_path_out}")
+    return {"num_people": len(outputs), "output": str(mhr_path_out)}
 
 
-def main():
+def build_parser():
+    """命令行参数 (process_batch.py 也用它取得各参数的默认值)"""
     parser = argparse.ArgumentParser(
         description="处理图片并生成MHR文件",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 示例:
     python process_image.py --image ./test.jpg --checkpoint_path ./checkpoints/model.ckpt
+    python process_image.py --image ./test.jpg --profile  # 记录torch.profiler trace
 
 环境变量:
     SAM3D_MHR_PATH: MHR资源路径
@@ -174,7 +157,7 @@ def main():
         "--checkpoint_path",
         default="./checkpoints/sam-3d-body-dinov3/model.ckpt",
         type=str,
-        help="SAM 3D Body模型检查点路径",
+        help="SAM 3D Body模型检查点路径 (也可以是 .bundle.safetensors 推理包)",
     )
     parser.add_argument(
         "--detector_name",
@@ -248,8 +231,43 @@ def main():
         default=True,
         help="保存可视化结果图片",
     )
+    parser.add_argument(
+        "--output_format",
+        default="json",
+        choices=["json", "bin"],
+        help="MHR输出格式: json (.mhr.json) 或 bin (紧凑二进制 .mhr.bin) (默认: json)",
+    )
+    parser.add_argument(
+        "--params_only",
+        action="store_true",
+        default=False,
+        help="只保存MHR参数 (不保存顶点、关键点和faces，体积约为1/100)，"
+        "查看时用 viewer.py --checkpoint_path 重建网格",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="用torch.profiler记录一次推理 (先预热一次)，导出Chrome trace、算子耗时表和各阶段耗时",
+    )
+    parser.add_argument(
+        "--profile_dir",
+        default="",
+        type=str,
+        help="性能分析结果目录 (默认: <输出目录>/<图片名>_profile)",
+    )
+    parser.add_argument(
+        "--profile_memory",
+        action="store_true",
+        default=False,
+        help="性能分析时同时记录各算子和各阶段的显存/内存分配",
+    )
+
+    return parser
 
-    args = parser.parse_args()
+
+def main():
+    args = build_parser().parse_args()
     process_image(args)
 
 
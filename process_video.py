@@ -4,15 +4,22 @@
 
 使用方法:
     python process_video.py --video path/to/video.mp4
+    python process_video.py --video path/to/frames/        # 图像序列目录
+    python process_video.py --video path/to/shards/        # webdataset格式的tar分片 (或单个 .tar)
 
 输出:
     - output/<video_name>/frame_0000.mhr.json
     - output/<video_name>/frame_0001.mhr.json
     - ...
     - output/<video_name>/video_info.json  # 视频元信息
+    - output/<video_name>/manifest.jsonl   # 逐帧处理清单 (中断后用 --resume 继续)
+    (--output_format bin 时帧文件为 frame_XXXXXX.mhr.bin，
+     --output_format seq 时所有帧保存在 <video_name>.mhrseq 中，
+     --params_only 时只保存MHR参数，网格由 tools/mhr_reconstruct.py 按需重建)
 """
 
 import argparse
+import contextlib
 import os
 import json
 from pathlib import Path
@@ -29,36 +36,280 @@ root = pyrootutils.setup_root(
 import cv2
 import numpy as np
 import torch
-from sam_3d_body import load_sam_3d_body, SAM3DBodyEstimator
-from tools.mhr_io import save_mhr
+from sam_3d_body.data.utils.frame_context import FrameContext
+from sam_3d_body.utils.timing import StageTimer
+from tools.build_estimator import build_estimator
+from tools.frame_sampler import SAMPLING_METHODS, MotionSampler
+from tools.manifest import MANIFEST_NAME, FrameManifest, frame_file_valid
+from tools.mhr_io import (
+    MHR_BINARY_SUFFIX,
+    MHR_JSON_SUFFIX,
+    atomic_write,
+    dump_json,
+    save_mhr,
+    save_mhr_without_faces,
+)
+from tools.mhr_sequence import MHRSequenceWriter, SEQUENCE_SUFFIX, sequence_frame_file
+from tools.output_writer import AsyncOutputWriter
+from tools.pipeline import build_estimator_pipeline
+from tools.frame_sources import frame_source_type, list_frame_names, open_frames, probe_frames
+from tools.video_shards import (
+    merge_shards,
+    remove_shard_files,
+    run_shards,
+    shard_manifest_path,
+    shard_sequence_path,
+    split_frames,
+)
 from tools.vis_utils import visualize_sample_together
 from tqdm import tqdm
 
 
-def process_video(args):
-    """处理视频并生成MHR文件序列"""
+def save_visualization(vis_path, frame_bgr, outputs, faces):
+    """渲染并保存一帧的可视化结果"""
+    rend_img = visualize_sample_together(frame_bgr, outputs, faces)
+    cv2.imwrite(str(vis_path), rend_img.astype(np.uint8))
+
+
+def build_sampler(args):
+    """--adaptive 时的运动自适应选帧器 (否则为None，处理所有候选帧)"""
+    if not args.adaptive:
+        return None
+    return MotionSampler(
+        threshold=args.motion_threshold,
+        min_gap=args.min_gap,
+        max_gap=args.max_gap,
+        method=args.motion_method,
+    )
+
+
+def process_frames(
+    estimator,
+    args,
+    video_info,
+    output_folder,
+    frames,
+    manifest,
+    sequence_writer=None,
+    sequence_name=None,
+    save_faces=True,
+    desc="处理视频帧",
+    position=0,
+):
+    """
+    处理指定的帧并保存结果 (单进程处理和每个分片进程共用)
+
+    Args:
+        frames: 要处理的帧号 (升序)
+        manifest: 每帧完成后追加记录的处理清单
+        sequence_writer: 序列格式时追加写入的序列文件
+        sequence_name: 清单记录中引用的序列文件名 (分片时为合并后的文件名)
+        save_faces: 第一帧保存faces并单独保存faces.json (json / bin格式)
+        desc: 进度条标题
+        position: 进度条位置 (分片并行时每个分片一行)
+
+    Returns:
+        (成功保存的记录, 无法读取的帧, 流水线统计表)
+        各阶段耗时记录在 estimator.timer 中 (开始时清空)
+    """
+    width, height = video_info["width"], video_info["height"]
+    mhr_suffix = MHR_BINARY_SUFFIX if args.output_format == "bin" else MHR_JSON_SUFFIX
+    faces_saved = not save_faces
+
+    # 处理帧 (解码在后台线程中顺序预读，保存和可视化在后台线程中进行，推理不等待磁盘和渲染)
+    # --adaptive 时解码线程按运动量选帧，只有选中的帧进入模型
+    sampler = build_sampler(args)
+    timer = estimator.timer
+    timer.reset()
+    # 图像序列和tar分片的图片在线程池中并行解码 (见 tools/frame_sources.py)
+    reader = open_frames(
+        video_info["video_path"], frames, queue_size=args.prefetch, rgb=False,
+        sampler=sampler, timer=timer, decode_workers=args.decode_workers, fps=video_info["fps"],
+    )
+    pipeline = build_estimator_pipeline(
+        estimator,
+        bbox_thr=args.bbox_thresh,
+        use_mask=args.use_mask,
+        prepare_workers=args.prepare_workers,
+        queue_size=args.stage_queue,
+        # 检测完成后立即更新选帧用的人体框 (之后的候选帧在框内计算运动分数)
+        on_detect=None if sampler is None else lambda _, boxes: sampler.update_box(boxes),
+    )
+
+    # --profile: 用torch.profiler记录前几帧。profiler只记录启动它的线程中的算子，
+    # 所以此时各阶段不分线程并行，逐帧在主线程中运行
+    profiler = contextlib.nullcontext()
+    if args.profile:
+        profiler = estimator.profile(
+            args.profile_dir or output_folder / "profile",
+            num_frames=args.profile_frames,
+            memory=args.profile_memory,
+        )
+
+    with reader, manifest, profiler, AsyncOutputWriter(
+        max_pending=args.write_queue, on_record=manifest.append
+    ) as writer:
+        # 检测、预处理、推理、后处理分阶段并行 (见 tools/pipeline.py)
+        # 解码得到的BGR帧包装为FrameContext: 检测器直接用BGR，RGB只转换一次，各阶段共用
+        frames_iter = ((i, FrameContext(frame, "bgr")) for i, frame in reader)
+        results = pipeline.run_inline(frames_iter) if args.profile else pipeline.run(frames_iter)
+        total = len(reader) if sampler is None else None
+        for result in tqdm(results, total=total, desc=desc, position=position):
+            frame_idx, frame = result.item
+            if args.profile:
+                profiler.step()
+            if result.error is not None:
+                print(f"警告: 帧 {frame_idx} 处理失败 ({result.stage}): {result.error}")
+                continue
+            outputs = None if result.skipped else result.value
+            sample_info = {}
+            if sampler is not None:
+                sample_info = sampler.info(frame_idx)
+
+            if not outputs:
+                print(f"警告: 帧 {frame_idx} 未检测到人体")
+                # 记入清单，恢复时不再重复处理
+                manifest.append({"frame_idx": frame_idx, "num_people": 0, **sample_info})
+                continue
+
+            # 保存MHR文件
+            frame_name = f"frame_{frame_idx:06d}"
+            mhr_path_out = output_folder / f"{frame_name}{mhr_suffix}"
+            frame_file = mhr_path_out.name
+            record = {
+                "frame_idx": frame_idx,
+                "file": frame_file,
+                "num_people": len(outputs),
+                **sample_info,
+            }
+            frame_kwargs = dict(image_path=f"frame_{frame_idx}", image_size=(width, height))
+
+            if sequence_writer is not None:
+                # 追加到序列文件 (faces保存在序列文件头部)，单个工作线程保证追加顺序
+                record["file"] = sequence_frame_file(
+                    sequence_name or sequence_writer.path.name, frame_idx
+                )
+                writer.submit(
+                    timer.wrap("serialize", sequence_writer.append), frame_idx, outputs,
+                    record=record,
+                )
+            elif args.params_only:
+                # 仅保存参数 (不保存faces.json)，查看器通过 --checkpoint_path 重建网格
+                writer.submit(
+                    timer.wrap("serialize", save_mhr), mhr_path_out, outputs, None,
+                    params_only=True, record=record, **frame_kwargs,
+                )
+            # 第一帧保存faces，后续帧不重复保存以节省空间
+            elif not faces_saved:
+                writer.submit(
+                    timer.wrap("serialize", save_mhr), mhr_path_out, outputs, estimator.faces,
+                    record=record, **frame_kwargs,
+                )
+                faces_saved = True
+                # 单独保存faces文件供后续使用
+                writer.submit(dump_json, output_folder / "faces.json", estimator.faces)
+            elif args.output_format == "bin":
+                # 后续帧不保存faces
+                writer.submit(
+                    timer.wrap("serialize", save_mhr), mhr_path_out, outputs, None,
+                    record=record, **frame_kwargs,
+                )
+            else:
+                # 后续帧不保存faces
+                writer.submit(
+                    timer.wrap("serialize", save_mhr_without_faces), mhr_path_out, outputs,
+                    record=record, **frame_kwargs,
+                )
+
+            # 可选：保存可视化
+            if args.save_vis:
+                vis_path = output_folder / f"{frame_name}_vis.jpg"
+                writer.submit(
+                    timer.wrap("visualize", save_visualization),
+                    vis_path, frame.bgr, outputs, estimator.faces,
+                )
+
+    if args.profile:
+        print(f"\n各阶段 (torch.profiler):\n{profiler.format_stages()}")
+        print(f"性能分析结果 (Chrome trace、算子耗时表) 已保存到: {profiler.output_dir}")
+    return writer.records, reader.missing, pipeline.format_stats()
+
+
+def process_shard(shard, frames, args, video_info, output_folder, save_faces):
+    """
+    分片进程: 加载自己的估计器，处理一段连续的帧
+
+    结果写入分片自己的处理清单 (和序列文件)，由主进程合并 (见 tools/video_shards.py)。
+    每个分片都在自己的第一帧保存faces (faces.json原子写入，内容相同)，
+    这样即使某些分片没有检测到人体也不会缺少faces。
+    """
+    output_folder = Path(output_folder)
+    # --profile 只在第一个分片中记录
+    args.profile = args.profile and shard == 0
+    # 每个进程只使用一部分CPU线程，避免N个进程争抢所有核心
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // args.workers))
+    device = None
+    if torch.cuda.is_available():
+        # 有多个GPU时各分片轮流使用
+        device = torch.device("cuda", shard % torch.cuda.device_count())
+    estimator = build_estimator(args, device)
+
+    sequence_writer, sequence_name = None, None
+    if args.output_format == "seq":
+        sequence_name = video_info["sequence"]
+        sequence_writer = MHRSequenceWriter(
+            shard_sequence_path(output_folder / sequence_name, shard),
+            faces=estimator.faces,
+            metadata={k: v for k, v in video_info.items() if k != "processed_frames"},
+            params_only=args.params_only,
+        )
+    manifest = FrameManifest(shard_manifest_path(output_folder, shard))
+    manifest.reset()
+
+    try:
+        records, missing, stats = process_frames(
+            estimator, args, video_info, output_folder, frames, manifest,
+            sequence_writer=sequence_writer,
+            sequence_name=sequence_name,
+            save_faces=save_faces,
+            desc=f"分片{shard}",
+            position=shard,
+        )
+    finally:
+        if sequence_writer is not None:
+            sequence_writer.finalize()
+    return {"shard": shard, "frames": len(frames), "processed": len(records),
+            "missing": missing, "stats": stats, "timing": estimator.timer.samples()}
+
+
+def process_video(args, estimator=None):
+    """
+    处理视频并生成MHR文件序列
+
+    Args:
+        args: 命令行参数 (见 build_parser)
+        estimator: 已加载的估计器 (批处理时复用，不重新加载模型；此时不使用分片并行)
+
+    Returns:
+        {"frames": 要处理的帧数, "processed": 本次处理的帧数, "completed": 之前已完成的帧数,
+         "output_folder": 输出目录}
+    """
 
     video_path = Path(args.video)
     if not video_path.exists():
-        raise ValueError(f"视频文件不存在: {video_path}")
+        raise ValueError(f"输入不存在: {video_path}")
+    source = frame_source_type(video_path)
 
-    # 设置输出目录
-    video_name = video_path.stem
+    # 设置输出目录 (图像序列和tar分片目录以目录名命名)
+    video_name = video_path.stem if video_path.is_file() else video_path.name
     output_folder = Path(args.output_folder) / video_name
     output_folder.mkdir(parents=True, exist_ok=True)
 
-    # 打开视频
-    cap = cv2.VideoCapture(str(video_path))
-    if not cap.isOpened():
-        raise ValueError(f"无法打开视频: {video_path}")
-
     # 获取视频信息
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps, total_frames, width, height = probe_frames(video_path, fps=args.fps)
 
-    print(f"视频信息: {width}x{height}, {fps:.2f}fps, {total_frames}帧")
+    source_label = {"video": "视频", "images": "图像序列", "tar": "tar分片"}[source]
+    print(f"{source_label}信息: {width}x{height}, {fps:.2f}fps, {total_frames}帧")
 
     # 计算实际处理的帧
     frame_skip = args.frame_skip
@@ -66,59 +317,22 @@ def process_video(args):
     end_frame = args.end_frame if args.end_frame > 0 else total_frames
 
     frames_to_process = list(range(start_frame, min(end_frame, total_frames), frame_skip + 1))
-    print(f"将处理 {len(frames_to_process)} 帧 (跳帧: {frame_skip})")
-
-    # 获取模型路径
-    mhr_path = args.mhr_path or os.environ.get("SAM3D_MHR_PATH", "")
-    detector_path = args.detector_path or os.environ.get("SAM3D_DETECTOR_PATH", "")
-    segmentor_path = args.segmentor_path or os.environ.get("SAM3D_SEGMENTOR_PATH", "")
-
-    # 初始化设备
-    device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
-    print(f"使用设备: {device}")
-
-    # 加载模型
-    print("正在加载SAM 3D Body模型...")
-    model, model_cfg = load_sam_3d_body(
-        args.checkpoint_path, device=device, mhr_path=mhr_path
-    )
+    num_candidates = len(frames_to_process)
+    if args.adaptive:
+        print(f"候选 {num_candidates} 帧 (跳帧: {frame_skip})，按运动量自适应选帧")
+    else:
+        print(f"将处理 {num_candidates} 帧 (跳帧: {frame_skip})")
 
-    # 加载可选模块
-    human_detector, human_segmentor, fov_estimator = None, None, None
-
-    if args.detector_name:
-        from tools.build_detector import HumanDetector
-        print(f"正在加载人体检测器: {args.detector_name}")
-        human_detector = HumanDetector(
-            name=args.detector_name, device=device, path=detector_path
-        )
-
-    if len(segmentor_path):
-        from tools.build_sam import HumanSegmentor
-        print(f"正在加载人体分割器: {args.segmentor_name}")
-        human_segmentor = HumanSegmentor(
-            name=args.segmentor_name, device=device, path=segmentor_path
-        )
-
-    if args.fov_name:
-        from tools.build_fov_estimator import FOVEstimator
-        print(f"正在加载FOV估计器: {args.fov_name}")
-        moge_path = args.local_moge_path if args.local_moge_path else ""
-        fov_estimator = FOVEstimator(name=args.fov_name, device=device, path=moge_path)
-
-    # 创建估计器
-    estimator = SAM3DBodyEstimator(
-        sam_3d_body_model=model,
-        model_cfg=model_cfg,
-        human_detector=human_detector,
-        human_segmentor=human_segmentor,
-        fov_estimator=fov_estimator,
-    )
+    # 分片并行时每个分片进程加载自己的估计器，主进程不加载模型
+    sharded = estimator is None and args.workers > 1
+    if estimator is None and not sharded:
+        estimator = build_estimator(args)
 
     # 保存视频元信息
     video_info = {
         "video_path": str(video_path),
         "video_name": video_name,
+        "source": source,
         "fps": fps,
         "total_frames": total_frames,
         "width": width,
@@ -128,134 +342,169 @@ def process_video(args):
         "end_frame": end_frame,
         "processed_frames": [],
     }
-
-    # 处理帧
-    processed_count = 0
-    faces_saved = False
-
-    for frame_idx in tqdm(frames_to_process, desc="处理视频帧"):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        ret, frame = cap.read()
-
-        if not ret:
-            print(f"警告: 无法读取帧 {frame_idx}")
-            continue
-
-        # 转换颜色空间
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # 运行推理
-        try:
-            outputs = estimator.process_one_image(
-                frame_rgb,
-                bbox_thr=args.bbox_thresh,
-                use_mask=args.use_mask,
-            )
-        except Exception as e:
-            print(f"警告: 帧 {frame_idx} 处理失败: {e}")
-            continue
-
-        if not outputs:
-            print(f"警告: 帧 {frame_idx} 未检测到人体")
-            continue
-
-        # 保存MHR文件
-        frame_name = f"frame_{frame_idx:06d}"
-        mhr_path_out = output_folder / f"{frame_name}.mhr.json"
-
-        # 第一帧保存faces，后续帧不重复保存以节省空间
-        if not faces_saved:
-            save_mhr(
-                mhr_path_out,
-                outputs,
-                estimator.faces,
-                image_path=f"frame_{frame_idx}",
-                image_size=(width, height),
-            )
-            faces_saved = True
-            # 单独保存faces文件供后续使用
-            faces_path = output_folder / "faces.json"
-            with open(faces_path, 'w') as f:
-                json.dump(estimator.faces.tolist(), f)
+    if args.params_only:
+        video_info["params_only"] = True
+    if source != "video":
+        # 帧号对应的图片文件名 (图像序列) 或样本键 (tar分片)
+        video_info["frame_names"] = list_frame_names(video_path)
+
+    # 序列格式: 所有帧追加写入单个文件 (恢复时在已有文件末尾继续追加)
+    sequence_writer = None
+    sequence_path = None
+    if args.output_format == "seq":
+        sequence_path = output_folder / f"{video_name}{SEQUENCE_SUFFIX}"
+        open_writer = MHRSequenceWriter.resume if args.resume else MHRSequenceWriter
+        sequence_writer = open_writer(
+            sequence_path,
+            # 分片并行时faces取自第一个合并的分片
+            faces=estimator.faces if estimator is not None else None,
+            metadata={k: v for k, v in video_info.items() if k != "processed_frames"},
+            params_only=args.params_only,
+        )
+        video_info["sequence"] = sequence_path.name
+
+    # 各阶段耗时 (分片并行时合并所有分片的记录)
+    timer = StageTimer()
+
+    # 逐帧处理清单: 每帧文件写入磁盘后追加一条记录
+    manifest = FrameManifest(output_folder / MANIFEST_NAME)
+    completed = {}  # 帧号 -> 记录 (恢复时已完成的帧)
+    try:
+        if args.resume:
+            # 先合并上一次分片并行处理中断后留下的分片文件
+            merge_shards(output_folder, manifest, sequence_writer)
+            sequence_frames = sequence_writer.frames if sequence_writer is not None else None
+            for record in manifest.load():
+                if frame_file_valid(output_folder, record, sequence_frames):
+                    completed[record["frame_idx"]] = record
+            if sequence_writer is not None:
+                # 已追加到序列、但中断前未来得及记入清单的帧
+                for frame_idx, num_people in sequence_frames.items():
+                    if frame_idx not in completed:
+                        record = {
+                            "frame_idx": frame_idx,
+                            "file": sequence_frame_file(sequence_path.name, frame_idx),
+                            "num_people": num_people,
+                        }
+                        completed[frame_idx] = record
+                        manifest.append(record)
+            frames_to_process = [i for i in frames_to_process if i not in completed]
+            print(f"恢复: {len(completed)} 帧已完成，剩余 {len(frames_to_process)} 帧")
+        else:
+            manifest.reset()
+            remove_shard_files(output_folder, sequence_path)
+        save_faces = not (args.resume and (output_folder / "faces.json").exists())
+
+        if sharded:
+            # 帧范围切成连续的分片，每个分片一个进程 (自己的估计器和解码器)
+            shards = split_frames(frames_to_process, args.workers)
+            print(f"分片并行: {len(shards)} 个进程")
+            shard_results = run_shards(
+                process_shard, shards, args, video_info, str(output_folder), save_faces
+            ) if shards else []
+            merged = merge_shards(output_folder, manifest, sequence_writer)
+            records = [r for r in merged if r.get("file")]
+            missing = [i for r in shard_results for i in r.get("missing", [])]
+            for r in shard_results:
+                timer.merge(r.get("timing", {}))
+            stats = []
+            for r in shard_results:
+                if "error" in r:
+                    print(f"警告: 分片 {r['shard']} ({r['frames']}帧) 失败: {r['error']}")
+                else:
+                    stats.append(f"分片 {r['shard']}:\n{r['stats']}")
+            stats = "\n\n".join(stats)
         else:
-            # 后续帧不保存faces
-            save_mhr_without_faces(
-                mhr_path_out,
-                outputs,
-                image_path=f"frame_{frame_idx}",
-                image_size=(width, height),
+            records, missing, stats = process_frames(
+                estimator, args, video_info, output_folder, frames_to_process, manifest,
+                sequence_writer=sequence_writer, save_faces=save_faces,
             )
-
-        video_info["processed_frames"].append({
-            "frame_idx": frame_idx,
-            "file": f"{frame_name}.mhr.json",
-            "num_people": len(outputs),
-        })
-
-        # 可选：保存可视化
-        if args.save_vis:
-            vis_path = output_folder / f"{frame_name}_vis.jpg"
-            rend_img = visualize_sample_together(frame, outputs, estimator.faces)
-            cv2.imwrite(str(vis_path), rend_img.astype(np.uint8))
-
-        processed_count += 1
-
-    cap.release()
+            timer.merge(estimator.timer.samples())
+    finally:
+        if sequence_writer is not None:
+            sequence_writer.finalize()
+
+    if missing:
+        print(f"警告: {len(missing)} 帧无法读取: {missing[:10]}")
+    if stats:
+        print("\n各阶段统计:")
+        print(stats)
+    timing = timer.summary()
+    if timing:
+        print("\n各阶段耗时 (每次调用):")
+        print(timer.format())
+
+    processed_count = len(records)
+    records = [r for r in completed.values() if r.get("file")] + records
+    video_info["processed_frames"] = sorted(records, key=lambda r: r["frame_idx"])
+    if timing:
+        video_info["timing"] = timing
+    if args.adaptive:
+        # 所有选中的帧 (包括没有检测到人体的帧) 及其运动分数，取自处理清单
+        video_info["sampling"] = dict(
+            build_sampler(args).config(),
+            candidates=num_candidates,
+            selected=[
+                {key: r[key] for key in ("frame_idx", "motion_score", "sample_reason")}
+                for r in manifest.load()
+                if "sample_reason" in r
+            ],
+        )
+        print(f"自适应选帧: {len(video_info['sampling']['selected'])}/{num_candidates} 帧")
 
     # 保存视频信息
     video_info_path = output_folder / "video_info.json"
-    with open(video_info_path, 'w') as f:
+    with atomic_write(video_info_path, "w") as f:
         json.dump(video_info, f, indent=2)
 
+    if args.interpolate:
+        interpolate_output(args, output_folder, estimator)
+
     print(f"\n处理完成!")
     print(f"成功处理 {processed_count}/{len(frames_to_process)} 帧")
+    if completed:
+        print(f"(另有 {len(completed)} 帧在之前的运行中已完成)")
     print(f"输出目录: {output_folder}")
     print(f"\n使用以下命令播放:")
-    print(f"  python viewer.py --mhr_folder {output_folder}")
-
-
-def save_mhr_without_faces(filepath, outputs, image_path=None, image_size=None):
-    """保存MHR数据但不包含faces（节省空间）"""
-    from tools.mhr_io import numpy_to_list
-
-    mhr_data = {
-        "version": "1.0",
-        "image_path": str(image_path) if image_path else None,
-        "image_size": list(image_size) if image_size else None,
-        "num_people": len(outputs),
-        "faces": None,  # 引用外部faces.json
-        "people": []
+    if args.params_only:
+        print(f"  python viewer.py --mhr_folder {output_folder} --checkpoint_path {args.checkpoint_path}")
+    else:
+        print(f"  python viewer.py --mhr_folder {output_folder}")
+    return {
+        "frames": len(frames_to_process),
+        "processed": processed_count,
+        "completed": len(completed),
+        "output_folder": str(output_folder),
     }
 
-    for i, person in enumerate(outputs):
-        person_data = {
-            "id": i,
-            "bbox": numpy_to_list(person.get("bbox")),
-            "focal_length": float(person.get("focal_length", 500.0)),
-            "camera": {
-                "translation": numpy_to_list(person.get("pred_cam_t")),
-            },
-            "mesh": {
-                "vertices": numpy_to_list(person.get("pred_vertices")),
-                "keypoints_3d": numpy_to_list(person.get("pred_keypoints_3d")),
-                "keypoints_2d": numpy_to_list(person.get("pred_keypoints_2d")),
-            },
-            "params": {
-                "global_rot": numpy_to_list(person.get("global_rot")),
-                "body_pose": numpy_to_list(person.get("body_pose_params")),
-                "shape": numpy_to_list(person.get("shape_params")),
-                "scale": numpy_to_list(person.get("scale_params")),
-                "hand": numpy_to_list(person.get("hand_pose_params")),
-                "expression": numpy_to_list(person.get("expr_params")),
-            }
-        }
-        mhr_data["people"].append(person_data)
 
-    with open(filepath, 'w') as f:
-        json.dump(mhr_data, f)
+def interpolate_output(args, output_folder, estimator=None):
+    """由处理过的帧插值补全跳过的帧 (见 tools/interpolate.py)"""
+    from tools.interpolate import interpolate_video
+    from tools.mhr_reconstruct import MeshReconstructor
+
+    reconstructor = None
+    if not args.params_only:
+        # 复用已加载模型的MHR头；分片并行时主进程没有模型，只加载MHR头
+        if estimator is not None:
+            reconstructor = MeshReconstructor(estimator.model.head_pose, cache_size=0)
+        else:
+            reconstructor = MeshReconstructor.from_checkpoint(
+                args.checkpoint_path, mhr_path=args.mhr_path, cache_size=0
+            )
+    with tqdm(desc="插值跳过的帧") as pbar:
+        result = interpolate_video(
+            output_folder,
+            reconstructor,
+            max_gap=args.interpolate_max_gap,
+            progress=lambda n: pbar.update(n - pbar.n),
+        )
+    print(f"插值: 由 {result['keyframes']} 个关键帧补全 {result['interpolated']} 帧")
+    return result
 
 
-def main():
+def build_parser():
+    """命令行参数 (process_batch.py 也用它取得各参数的默认值)"""
     parser = argparse.ArgumentParser(
         description="处理视频并生成MHR文件序列",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -263,7 +512,14 @@ def main():
 示例:
     python process_video.py --video ./test.mp4
     python process_video.py --video ./test.mp4 --frame_skip 2  # 每3帧处理1帧
+    python process_video.py --video ./test.mp4 --adaptive      # 运动快时多处理、静止时少处理
+    python process_video.py --video ./test.mp4 --frame_skip 3 --interpolate  # 跳过的帧由参数插值补全
     python process_video.py --video ./test.mp4 --start_frame 100 --end_frame 200
+    python process_video.py --video ./test.mp4 --resume  # 中断后继续，跳过已完成的帧
+    python process_video.py --video ./test.mp4 --workers 8  # 8个进程分片并行处理长视频
+    python process_video.py --video ./test.mp4 --profile --profile_frames 20  # torch.profiler trace
+    python process_video.py --video ./frames/ --fps 25    # 图像序列目录 (帧按文件名自然排序)
+    python process_video.py --video ./shards/ --decode_workers 8  # webdataset格式的tar分片
         """,
     )
 
@@ -271,7 +527,7 @@ def main():
         "--video",
         required=True,
         type=str,
-        help="输入视频路径",
+        help="输入: 视频文件、图像序列目录 (JPEG/PNG等)、webdataset格式的 .tar 分片或只包含tar分片的目录",
     )
     parser.add_argument(
         "--output_folder",
@@ -283,7 +539,7 @@ def main():
         "--checkpoint_path",
         default="./checkpoints/sam-3d-body-dinov3/model.ckpt",
         type=str,
-        help="SAM 3D Body模型检查点路径",
+        help="SAM 3D Body模型检查点路径 (也可以是 .bundle.safetensors 推理包)",
     )
     parser.add_argument(
         "--detector_name",
@@ -345,6 +601,50 @@ def main():
         type=int,
         help="跳帧数 (0=不跳帧, 1=隔1帧处理, 2=隔2帧处理, 默认: 0)",
     )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        default=False,
+        help="运动自适应选帧: 只在与上一个处理帧相比运动足够大时处理 "
+        "(在 --frame_skip 的候选帧中选择)",
+    )
+    parser.add_argument(
+        "--motion_method",
+        default="diff",
+        choices=list(SAMPLING_METHODS),
+        help="运动分数: diff (缩小后的帧差，最快) 或 flow (光流位移) (默认: diff)",
+    )
+    parser.add_argument(
+        "--motion_threshold",
+        default=None,
+        type=float,
+        help="运动分数阈值 (默认: diff为0.03，flow为0.01)",
+    )
+    parser.add_argument(
+        "--min_gap",
+        default=1,
+        type=int,
+        help="自适应选帧时两个处理帧最少相隔的帧数 (默认: 1)",
+    )
+    parser.add_argument(
+        "--max_gap",
+        default=15,
+        type=int,
+        help="自适应选帧时两个处理帧最多相隔的帧数 (默认: 15)",
+    )
+    parser.add_argument(
+        "--interpolate",
+        action="store_true",
+        default=False,
+        help="处理完成后由处理过的帧插值补全跳过的帧 (全局旋转球面插值，其余参数线性插值)，"
+        "得到全帧率的动作",
+    )
+    parser.add_argument(
+        "--interpolate_max_gap",
+        default=30,
+        type=int,
+        help="相邻两个处理帧最多相隔多少帧时才插值 (默认: 30)",
+    )
     parser.add_argument(
         "--start_frame",
         default=0,
@@ -363,8 +663,102 @@ def main():
         default=False,
         help="保存每帧的可视化结果",
     )
+    parser.add_argument(
+        "--output_format",
+        default="json",
+        choices=["json", "bin", "seq"],
+        help="MHR输出格式: json (.mhr.json)、bin (紧凑二进制 .mhr.bin) "
+        "或 seq (整段视频一个序列文件 .mhrseq) (默认: json)",
+    )
+    parser.add_argument(
+        "--params_only",
+        action="store_true",
+        default=False,
+        help="只保存MHR参数 (不保存顶点、关键点和faces，体积约为1/100)，"
+        "查看时用 viewer.py --checkpoint_path 重建网格",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="继续之前中断的处理: 跳过清单 (manifest.jsonl) 中已完成且文件完整的帧 "
+        "(默认重新处理所有帧)",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="分片并行的进程数: 帧范围切成N段，每段一个进程 (各自加载模型)，"
+        "结束后按帧顺序合并 (默认: 1)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="用torch.profiler记录前几帧 (预热1帧)，导出Chrome trace、算子耗时表和各阶段耗时。"
+        "此时各阶段不再分线程并行，逐帧在主线程中运行 "
+        "(分片并行时只记录第一个分片)",
+    )
+    parser.add_argument(
+        "--profile_frames",
+        default=10,
+        type=int,
+        help="--profile 记录的帧数 (默认: 10)",
+    )
+    parser.add_argument(
+        "--profile_dir",
+        default="",
+        type=str,
+        help="性能分析结果目录 (默认: <输出目录>/profile)",
+    )
+    parser.add_argument(
+        "--profile_memory",
+        action="store_true",
+        default=False,
+        help="性能分析时同时记录各算子和各阶段的显存/内存分配",
+    )
+    parser.add_argument(
+        "--prefetch",
+        default=8,
+        type=int,
+        help="后台解码的预读帧数 (默认: 8)",
+    )
+    parser.add_argument(
+        "--decode_workers",
+        default=4,
+        type=int,
+        help="图像序列/tar分片的图片解码线程数 (视频只能顺序解码，不使用) (默认: 4)",
+    )
+    parser.add_argument(
+        "--fps",
+        default=30.0,
+        type=float,
+        help="图像序列/tar分片的帧率 (视频使用文件中的帧率) (默认: 30)",
+    )
+    parser.add_argument(
+        "--prepare_workers",
+        default=2,
+        type=int,
+        help="裁剪预处理阶段的线程数 (默认: 2)",
+    )
+    parser.add_argument(
+        "--stage_queue",
+        default=2,
+        type=int,
+        help="流水线各阶段之间的队列长度 (默认: 2)",
+    )
+    parser.add_argument(
+        "--write_queue",
+        default=8,
+        type=int,
+        help="后台保存/可视化队列长度，队列满时推理等待 (0=在推理循环中同步保存，默认: 8)",
+    )
 
-    args = parser.parse_args()
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
     process_video(args)
 
 
@@ -1,12 +1,38 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 __version__ = "1.0.0"
 
-from .sam_3d_body_estimator import SAM3DBodyEstimator
-from .build_models import load_sam_3d_body, load_sam_3d_body_hf
+# The public API is imported on first access (PEP 562), so that importing a
+# light submodule (e.g. for I/O or visualization) does not build up the full
+# model stack.
+_LAZY_ATTRS = {
+    "SAM3DBodyEstimator": ".sam_3d_body_estimator",
+    "load_sam_3d_body": ".build_models",
+    "load_sam_3d_body_hf": ".build_models",
+    "load_mhr_head": ".build_models",
+    "load_sam_3d_body_bundle": ".bundle",
+    "export_bundle": ".bundle",
+}
 
 __all__ = [
     "__version__",
     "load_sam_3d_body",
     "load_sam_3d_body_hf",
+    "load_mhr_head",
+    "load_sam_3d_body_bundle",
+    "export_bundle",
     "SAM3DBodyEstimator",
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        import importlib
+
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,15 +1,98 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 import os
 import torch
+import torch.nn as nn
 
+from .models.heads import build_head
+from .models.heads.mhr_registry import (
+    missing_mhr_parameters,
+    prepare_mhr_state_dict,
+    relocate_mhr_models,
+    share_mhr_buffers,
+)
 from .models.meta_arch import SAM3DBody
 from .utils.config import get_config
-from .utils.checkpoint import load_state_dict
+from .utils.checkpoint import (
+    init_empty_weights,
+    load_state_dict,
+    materialize_meta_parameters,
+)
+from .utils.logging import get_pylogger
 
+log = get_pylogger(__name__)
 
-def load_sam_3d_body(checkpoint_path: str = "", device: str = "cuda", mhr_path: str = ""):
-    print("Loading SAM 3D Body model...")
-    
+# Single-file inference bundles written by ``export_bundle``
+BUNDLE_SUFFIX = ".bundle.safetensors"
+
+
+def load_checkpoint_state_dict(checkpoint_path: str):
+    """
+    Load the state dict of a checkpoint without reading it into memory up-front.
+
+    ``.safetensors`` files are memory-mapped by safetensors itself; regular
+    PyTorch checkpoints are opened with ``torch.load(mmap=True)`` and fall back
+    to a plain load for files written in the legacy (non-zip) format.
+    """
+    if checkpoint_path.endswith(".safetensors"):
+        from safetensors.torch import load_file
+
+        return load_file(checkpoint_path, device="cpu")
+
+    try:
+        checkpoint = torch.load(
+            checkpoint_path, map_location="cpu", weights_only=False, mmap=True
+        )
+    except RuntimeError:
+        checkpoint = torch.load(
+            checkpoint_path, map_location="cpu", weights_only=False
+        )
+    if "state_dict" in checkpoint:
+        return checkpoint["state_dict"]
+    return checkpoint
+
+
+def _cast_state_dict(model, state_dict, device):
+    """Move checkpoint tensors to the dtype and device of the matching model entry."""
+    expected = model.state_dict(keep_vars=True)
+    casted = {}
+    for key, value in state_dict.items():
+        if key in expected and isinstance(value, torch.Tensor):
+            target = expected[key]
+            # TorchScript submodules are copied into, so they keep their own device
+            device_ = device if target.is_meta else target.device
+            value = value.to(device=device_, dtype=target.dtype)
+        casted[key] = value
+    return casted
+
+
+def assign_state_dict(model, state_dict, device):
+    """Assign checkpoint tensors to a model built under ``init_empty_weights``."""
+    state_dict = prepare_mhr_state_dict(model, dict(state_dict))
+    state_dict = _cast_state_dict(model, state_dict, device)
+    load_state_dict(model, state_dict, strict=False, assign=True)
+    del state_dict
+
+    # Zero-filled MHR assets would silently produce wrong meshes
+    missing = missing_mhr_parameters(model)
+    if missing:
+        raise RuntimeError(
+            "MHR parameters were neither loaded from the checkpoint nor from the "
+            f"MHR model files: {', '.join(missing)}"
+        )
+
+    materialized = materialize_meta_parameters(model, device)
+    if materialized:
+        log.warning(
+            "Parameters missing from the checkpoint were zero-initialized: "
+            f"{', '.join(materialized)}"
+        )
+
+    freed = share_mhr_buffers(model)
+    if freed:
+        log.info(f"Shared MHR buffers, saved {freed / 1024 / 1024:.1f} MB")
+
+
+def _load_model_config(checkpoint_path: str, mhr_path: str):
     # Check the current directory, and if not present check the parent dir.
     model_cfg = os.path.join(os.path.dirname(checkpoint_path), "model_config.yaml")
     if not os.path.exists(model_cfg):
@@ -24,22 +107,70 @@ def load_sam_3d_body(checkpoint_path: str = "", device: str = "cuda", mhr_path:
     model_cfg.defrost()
     model_cfg.MODEL.MHR_HEAD.MHR_MODEL_PATH = mhr_path
     model_cfg.freeze()
+    return model_cfg
 
-    # Initialze the model
-    model = SAM3DBody(model_cfg)
 
-    checkpoint = torch.load(checkpoint_path, map_location="cpu", weights_only=False)
-    if "state_dict" in checkpoint:
-        state_dict = checkpoint["state_dict"]
-    else:
-        state_dict = checkpoint
-    load_state_dict(model, state_dict, strict=False)
+def load_sam_3d_body(checkpoint_path: str = "", device: str = "cuda", mhr_path: str = ""):
+    if checkpoint_path.endswith(BUNDLE_SUFFIX):
+        from .bundle import load_sam_3d_body_bundle
+
+        return load_sam_3d_body_bundle(checkpoint_path, device=device, mhr_path=mhr_path)
+
+    print("Loading SAM 3D Body model...")
+
+    model_cfg = _load_model_config(checkpoint_path, mhr_path)
+
+    # Initialze the model with its parameters on the meta device; they are
+    # assigned straight from the (memory-mapped) checkpoint below.
+    with init_empty_weights():
+        model = SAM3DBody(model_cfg)
+
+    assign_state_dict(model, load_checkpoint_state_dict(checkpoint_path), device)
 
+    relocate_mhr_models(model, device)
     model = model.to(device)
     model.eval()
     return model, model_cfg
 
 
+def load_mhr_head(checkpoint_path: str = "", device: str = "cuda", mhr_path: str = ""):
+    """
+    Load only the body MHR head (``head_pose``) of a checkpoint or bundle.
+
+    This is all that is needed to turn stored MHR parameters back into
+    vertices and keypoints with ``MHRHead.mhr_forward``; the backbone and
+    decoder weights are never read.
+
+    Returns:
+        Tuple of the MHR head and the model config.
+    """
+    prefix = "head_pose."
+    if checkpoint_path.endswith(BUNDLE_SUFFIX):
+        from .bundle import read_bundle
+
+        model_cfg, state_dict = read_bundle(checkpoint_path, mhr_path)
+    else:
+        model_cfg = _load_model_config(checkpoint_path, mhr_path)
+        state_dict = load_checkpoint_state_dict(checkpoint_path)
+    state_dict = {
+        k[len(prefix):]: v for k, v in state_dict.items() if k.startswith(prefix)
+    }
+
+    with init_empty_weights():
+        head = build_head(model_cfg, model_cfg.MODEL.PERSON_HEAD.POSE_TYPE)
+        # Registered by SAM3DBody, see SAM3DBody.__init__
+        head.hand_pose_comps_ori = nn.Parameter(
+            torch.zeros_like(head.hand_pose_comps), requires_grad=False
+        )
+    assign_state_dict(head, state_dict, device)
+    del state_dict
+
+    relocate_mhr_models(head, device)
+    head = head.to(device)
+    head.eval()
+    return head, model_cfg
+
+
 def _hf_download(repo_id):
     from huggingface_hub import snapshot_download
     local_dir = snapshot_download(repo_id=repo_id)
@@ -48,4 +179,4 @@ def _hf_download(repo_id):
 
 def load_sam_3d_body_hf(repo_id, **kwargs):
     ckpt_path, mhr_path = _hf_download(repo_id)
-    return load_sam_3d_body(checkpoint_path=ckpt_path, mhr_path=mhr_path)
+    return load_sam_3d_body(checkpoint_path=ckpt_path, mhr_path=mhr_path, **kwargs)
@@ -0,0 +1,199 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+
+"""Single-file, versioned inference bundles for SAM 3D Body.
+
+A bundle is one safetensors file holding everything ``load_sam_3d_body`` needs:
+
+- the model weights, in the dtype each module runs in at inference time
+  (e.g. the fp16/bf16 backbone), including the MHR buffers of both heads
+  (faces, keypoint mapping, joint rotations, scale/hand PCA, ...);
+- the resolved model config, stored in the safetensors metadata;
+- optionally the serialized (or frozen) TorchScript MHR graph, stored as a
+  ``uint8`` tensor so that no ``assets/mhr_model.pt`` is needed at load time.
+"""
+
+import io
+import os
+from typing import Optional
+
+import torch
+from yacs.config import CfgNode as CN
+
+from . import __version__
+from .build_models import assign_state_dict, BUNDLE_SUFFIX
+from .models.heads.mhr_registry import register_mhr_model, relocate_mhr_models
+from .models.meta_arch import SAM3DBody
+from .utils.checkpoint import init_empty_weights
+
+BUNDLE_FORMAT = "sam_3d_body.bundle"
+BUNDLE_VERSION = 1
+
+_MHR_GRAPH_KEY = "__mhr_graph__"
+
+
+def _script_module_prefixes(model):
+    """Names of the outermost TorchScript submodules (the MHR models)."""
+    prefixes = []
+    # The heads share one MHR model, which must be listed under each name
+    for name, module in model.named_modules(remove_duplicate=False):
+        if isinstance(module, torch.jit.ScriptModule) and not any(
+            name.startswith(prefix + ".") for prefix in prefixes
+        ):
+            prefixes.append(name)
+    return prefixes
+
+
+def _serialize_mhr_graph(mhr_path: str, freeze: bool = False) -> torch.Tensor:
+    if freeze:
+        mhr_model = torch.jit.freeze(torch.jit.load(mhr_path, map_location="cpu").eval())
+        buffer = io.BytesIO()
+        torch.jit.save(mhr_model, buffer)
+        data = buffer.getvalue()
+    else:
+        with open(mhr_path, "rb") as f:
+            data = f.read()
+    return torch.frombuffer(bytearray(data), dtype=torch.uint8)
+
+
+def export_bundle(
+    model,
+    model_cfg: CN,
+    output_path: str,
+    mhr_path: str = "",
+    include_mhr_graph: bool = True,
+    freeze_mhr_graph: bool = False,
+) -> str:
+    """
+    Write a loaded SAM 3D Body model to a single-file inference bundle.
+
+    Args:
+        model: SAM3DBody model, e.g. as returned by ``load_sam_3d_body``.
+        model_cfg: The resolved config the model was built with.
+        output_path: Output file, should end with ``.bundle.safetensors``.
+        mhr_path: Path of the TorchScript MHR model (``assets/mhr_model.pt``).
+            Defaults to ``MODEL.MHR_HEAD.MHR_MODEL_PATH`` of the config.
+        include_mhr_graph: Embed the MHR graph so the bundle loads offline.
+        freeze_mhr_graph: Embed a ``torch.jit.freeze``-d MHR graph instead of
+            the original serialized module.
+    Returns:
+        str: The output path.
+    """
+    from safetensors.torch import save_file
+
+    if not output_path.endswith(BUNDLE_SUFFIX):
+        raise ValueError(f"Bundle path must end with {BUNDLE_SUFFIX}: {output_path}")
+    mhr_path = mhr_path or model_cfg.MODEL.MHR_HEAD.MHR_MODEL_PATH
+
+    # The MHR model parameters are part of its TorchScript file, not the bundle weights
+    skip_prefixes = tuple(prefix + "." for prefix in _script_module_prefixes(model))
+    tensors = {
+        k: v.detach().cpu().contiguous().clone()
+        for k, v in model.state_dict().items()
+        if not k.startswith(skip_prefixes)
+    }
+    if include_mhr_graph:
+        tensors[_MHR_GRAPH_KEY] = _serialize_mhr_graph(mhr_path, freeze_mhr_graph)
+
+    bundle_cfg = model_cfg.clone()
+    bundle_cfg.defrost()
+    bundle_cfg.MODEL.MHR_HEAD.MHR_MODEL_PATH = ""
+    metadata = {
+        "format": BUNDLE_FORMAT,
+        "format_version": str(BUNDLE_VERSION),
+        "sam_3d_body_version": __version__,
+        "config": bundle_cfg.dump(),
+        "mhr_graph": (
+            ("frozen" if freeze_mhr_graph else "torchscript")
+            if include_mhr_graph
+            else "none"
+        ),
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    save_file(tensors, output_path, metadata=metadata)
+    return output_path
+
+
+def read_bundle(bundle_path: str, mhr_path: Optional[str] = ""):
+    """
+    Read the config and weights of a bundle written by ``export_bundle``.
+
+    An embedded MHR graph is registered so that ``MHR_MODEL_PATH`` of the
+    returned config resolves to it.
+
+    Args:
+        bundle_path: Path of the ``.bundle.safetensors`` file.
+        mhr_path: MHR model to use if the bundle has no embedded MHR graph.
+    Returns:
+        Tuple of the config and the (memory-mapped) state dict.
+    """
+    from safetensors import safe_open
+    from safetensors.torch import load_file
+
+    with safe_open(bundle_path, framework="pt") as f:
+        metadata = f.metadata() or {}
+    if metadata.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Not a SAM 3D Body bundle: {bundle_path}")
+    if int(metadata["format_version"]) > BUNDLE_VERSION:
+        raise ValueError(
+            f"Bundle format version {metadata['format_version']} is newer than "
+            f"the supported version {BUNDLE_VERSION}: {bundle_path}"
+        )
+
+    state_dict = load_file(bundle_path, device="cpu")
+
+    model_cfg = CN.load_cfg(metadata["config"])
+    model_cfg.defrost()
+    if _MHR_GRAPH_KEY in state_dict:
+        mhr_graph = state_dict.pop(_MHR_GRAPH_KEY)
+        mhr_path = "bundle://" + os.path.abspath(bundle_path)
+        register_mhr_model(
+            mhr_path,
+            torch.jit.load(
+                io.BytesIO(mhr_graph.numpy().tobytes()),
+                map_location=("cuda" if torch.cuda.is_available() else "cpu"),
+            ),
+        )
+        del mhr_graph
+    elif not mhr_path:
+        raise ValueError(
+            f"Bundle has no embedded MHR graph, please provide mhr_path: {bundle_path}"
+        )
+    model_cfg.MODEL.MHR_HEAD.MHR_MODEL_PATH = mhr_path
+    model_cfg.freeze()
+    return model_cfg, state_dict
+
+
+def load_sam_3d_body_bundle(
+    bundle_path: str, device: str = "cuda", mhr_path: Optional[str] = ""
+):
+    """
+    Load a SAM 3D Body model from a bundle written by ``export_bundle``.
+
+    The weights are memory-mapped and assigned to a model constructed on the
+    meta device, so no separate config, checkpoint or MHR asset is read.
+
+    Args:
+        bundle_path: Path of the ``.bundle.safetensors`` file.
+        device: Target device of the model.
+        mhr_path: MHR model to use if the bundle has no embedded MHR graph.
+    Returns:
+        Tuple of the model and its config, like ``load_sam_3d_body``.
+    """
+    print("Loading SAM 3D Body bundle...")
+
+    model_cfg, state_dict = read_bundle(bundle_path, mhr_path)
+
+    with init_empty_weights():
+        model = SAM3DBody(model_cfg)
+    # The MHR models come with their own weights, which the bundle leaves out
+    for prefix in _script_module_prefixes(model):
+        mhr_state_dict = model.get_submodule(prefix).state_dict()
+        state_dict.update({f"{prefix}.{k}": v for k, v in mhr_state_dict.items()})
+    assign_state_dict(model, state_dict, device)
+    del state_dict
+
+    relocate_mhr_models(model, device)
+    model = model.to(device)
+    model.eval()
+    return model, model_cfg
@@ -5,7 +5,6 @@ from typing import Callable, Dict, List, Optional, Tuple, Union
 import cv2
 import numpy as np
 import torch.nn as nn
-import torchvision.transforms.functional as F
 from PIL import Image, ImageOps
 from sam_3d_body.models.modules import to_2tuple
 
@@ -151,6 +150,8 @@ class GetBBoxCenterScale(nn.Module):
 
 class SquarePad:
     def __call__(self, results: Dict) -> Optional[dict]:
+        import torchvision.transforms.functional as F
+
         assert isinstance(results["img"], Image.Image)
         w, h = results["img"].size
 
@@ -0,0 +1,82 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+
+import threading
+from typing import Callable, Hashable, Union
+
+import cv2
+import numpy as np
+import torch
+
+
+class FrameContext:
+    """
+    One decoded frame and the image representations derived from it.
+
+    The consumers of a frame each want it in a different form: the detector
+    BGR at a 1024 short edge, the FOV estimator a float RGB tensor on the
+    device, the body crops the full-resolution RGB array and the left-hand
+    crops its mirror image. Each representation is built on first use and
+    cached here, so it is converted (or uploaded) once per frame however
+    many stages and people ask for it.
+
+    Cached arrays are shared between consumers and must not be modified.
+    """
+
+    def __init__(self, img: np.ndarray, image_format: str = "rgb"):
+        if image_format not in ("rgb", "bgr"):
+            raise ValueError(f"Unsupported image format: {image_format}")
+        self.shape = img.shape
+        self._cache = {image_format: img}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def wrap(
+        cls, img: Union[np.ndarray, "FrameContext"], image_format: str = "rgb"
+    ) -> "FrameContext":
+        """Return img itself if it is already a FrameContext."""
+        return img if isinstance(img, cls) else cls(img, image_format)
+
+    def get(self, key: Hashable, build: Callable):
+        """The cached representation `key`, built with build() on first use."""
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = build()
+            return self._cache[key]
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self.get("rgb", lambda: cv2.cvtColor(self._cache["bgr"], cv2.COLOR_BGR2RGB))
+
+    @property
+    def bgr(self) -> np.ndarray:
+        return self.get("bgr", lambda: cv2.cvtColor(self._cache["rgb"], cv2.COLOR_RGB2BGR))
+
+    @property
+    def empty_mask(self) -> np.ndarray:
+        """All-zero [H, W, 1] mask used for people without a segmentation mask."""
+
+        def build():
+            mask = np.zeros((*self.shape[:2], 1), dtype=np.uint8)
+            mask.setflags(write=False)
+            return mask
+
+        return self.get("empty_mask", build)
+
+    @property
+    def flipped(self) -> "FrameContext":
+        """The horizontally mirrored frame (contiguous, for the left-hand crops)."""
+
+        def build():
+            flipped = FrameContext(np.ascontiguousarray(self.rgb[:, ::-1]), "rgb")
+            flipped._cache["empty_mask"] = self.empty_mask
+            return flipped
+
+        return self.get("flipped", build)
+
+    def tensor(self, device: Union[str, torch.device], image_format: str = "rgb") -> torch.Tensor:
+        """The frame as a uint8 [3, H, W] tensor on `device` (uploaded once)."""
+        img = self.rgb if image_format == "rgb" else self.bgr
+        return self.get(
+            ("tensor", image_format, str(device)),
+            lambda: torch.from_numpy(img).to(device).permute(2, 0, 1).contiguous(),
+        )
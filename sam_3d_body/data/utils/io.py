@@ -4,7 +4,6 @@ import os
 import time
 from typing import Any, List
 
-import braceexpand
 import cv2
 import numpy as np
 
@@ -18,6 +17,8 @@ def expand(s):
 def expand_urls(urls: str | List[str]):
     if isinstance(urls, str):
         urls = [urls]
+    import braceexpand
+
     urls = [u for url in urls for u in braceexpand.braceexpand(expand(url))]
     return urls
 
@@ -4,6 +4,8 @@ import numpy as np
 import torch
 from torch.utils.data import default_collate
 
+from .frame_context import FrameContext
+
 
 class NoCollate:
     def __init__(self, data):
@@ -18,7 +20,14 @@ def prepare_batch(
     masks_score=None,
     cam_int=None,
 ):
-    """A helper function to prepare data batch for SAM 3D Body model inference."""
+    """
+    A helper function to prepare data batch for SAM 3D Body model inference.
+
+    img is an RGB image or a FrameContext; with a FrameContext, people without
+    a mask share the frame's cached empty mask instead of allocating one each.
+    """
+    frame = FrameContext.wrap(img)
+    img = frame.rgb
     height, width = img.shape[:2]
 
     # construct batch data samples
@@ -35,7 +44,7 @@ def prepare_batch(
             else:
                 data_info["mask_score"] = np.array(1.0, dtype=np.float32)
         else:
-            data_info["mask"] = np.zeros((height, width, 1), dtype=np.uint8)
+            data_info["mask"] = frame.empty_mask
             data_info["mask_score"] = np.array(0.0, dtype=np.float32)
 
         data_list.append(transform(data_info))
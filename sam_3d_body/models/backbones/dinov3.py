@@ -1,8 +1,62 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 
+import os
+
 import torch
 from torch import nn
 
+DINOV3_HUB_REPO = "facebookresearch/dinov3"
+
+
+def _local_dinov3_repo():
+    """Local DINOv3 checkout: ``$SAM3D_DINOV3_REPO`` or the torch hub cache."""
+    hub_dir = torch.hub.get_dir()
+    candidates = [
+        os.environ.get("SAM3D_DINOV3_REPO", ""),
+        os.path.join(hub_dir, "facebookresearch_dinov3_main"),
+        os.path.join(hub_dir, "facebookresearch_dinov3_master"),
+    ]
+    for repo_dir in candidates:
+        if repo_dir and os.path.isfile(os.path.join(repo_dir, "hubconf.py")):
+            return repo_dir
+    return None
+
+
+def build_dinov3_encoder(name, **kwargs):
+    """
+    Construct a DINOv3 ViT without touching the network.
+
+    The model definition is resolved from, in order:
+    1. the installed ``dinov3`` package (``pip install -e <dinov3 checkout>``);
+    2. a local checkout of the DINOv3 repo, given by ``$SAM3D_DINOV3_REPO`` or
+       found in the torch hub cache, loaded with ``source="local"``;
+    3. ``torch.hub`` from GitHub, only if ``$SAM3D_DINOV3_DOWNLOAD=1``.
+
+    Raises:
+        RuntimeError: If no local definition is available and downloading is
+            not enabled.
+    """
+    try:
+        from dinov3.hub import backbones
+    except ImportError:
+        backbones = None
+    if backbones is not None and hasattr(backbones, name):
+        return getattr(backbones, name)(**kwargs)
+
+    repo_dir = _local_dinov3_repo()
+    if repo_dir is not None:
+        return torch.hub.load(repo_dir, name, source="local", **kwargs)
+
+    if os.environ.get("SAM3D_DINOV3_DOWNLOAD", "") == "1":
+        return torch.hub.load(DINOV3_HUB_REPO, name, source="github", **kwargs)
+
+    raise RuntimeError(
+        f"No local DINOv3 model definition found for {name}. Install the dinov3 "
+        "package (pip install -e <dinov3 checkout> --no-deps), set "
+        "SAM3D_DINOV3_REPO to a DINOv3 checkout, or set SAM3D_DINOV3_DOWNLOAD=1 "
+        f"to fetch {DINOV3_HUB_REPO} from GitHub through torch.hub."
+    )
+
 
 class Dinov3Backbone(nn.Module):
     def __init__(
@@ -12,10 +66,8 @@ class Dinov3Backbone(nn.Module):
         self.name = name
         self.cfg = cfg
 
-        self.encoder = torch.hub.load(
-            "facebookresearch/dinov3",
+        self.encoder = build_dinov3_encoder(
             self.name,
-            source="github",
             pretrained=False,
             drop_path=self.cfg.MODEL.BACKBONE.DROP_PATH_RATE,
         )
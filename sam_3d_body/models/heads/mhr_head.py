@@ -1,7 +1,7 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 
 import os
-import warnings
+from functools import lru_cache
 from typing import Optional
 
 import roma
@@ -17,20 +17,32 @@ from ..modules.mhr_utils import (
 )
 
 from ..modules.transformer import FFN
+from .mhr_registry import faces_numpy, load_mhr_model
 
-MOMENTUM_ENABLED = os.environ.get("MOMENTUM_ENABLED") is None
-try:
-    if MOMENTUM_ENABLED:
-        from mhr.mhr import MHR
+from sam_3d_body.utils.checkpoint import init_real_weights
+from sam_3d_body.utils.logging import get_pylogger
+
+logger = get_pylogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def momentum_enabled() -> bool:
+    """Whether the Momentum MHR package is used instead of the TorchScript MHR model.
+
+    Probed on first use rather than at import time; set ``MOMENTUM_ENABLED``
+    in the environment to disable it.
+    """
+    if os.environ.get("MOMENTUM_ENABLED") is not None:
+        logger.info("Momentum is not enabled")
+        return False
+    try:
+        import mhr.mhr  # noqa: F401
+    except Exception:
+        logger.info("Momentum is not enabled")
+        return False
+    logger.info("Momentum is enabled")
+    return True
 
-        MOMENTUM_ENABLED = True
-        warnings.warn("Momentum is enabled")
-    else:
-        warnings.warn("Momentum is not enabled")
-        raise ImportError
-except:
-    MOMENTUM_ENABLED = False
-    warnings.warn("Momentum is not enabled")
 
 
 class MHRHead(nn.Module):
@@ -104,17 +116,21 @@ class MHRHead(nn.Module):
             torch.zeros(145).long(), requires_grad=False
         )
 
-        # Load MHR itself
-        if MOMENTUM_ENABLED:
-            self.mhr = MHR.from_files(
-                device=torch.device("cuda" if torch.cuda.is_available() else "cpu"),
-                lod=1,
-            )
-        else:
-            self.mhr = torch.jit.load(
-                mhr_model_path,
-                map_location=("cuda" if torch.cuda.is_available() else "cpu"),
-            )
+        # Load MHR itself. Its weights come from its own files, so they are
+        # allocated even when the head is built under init_empty_weights.
+        with init_real_weights():
+            if momentum_enabled():
+                from mhr.mhr import MHR
+
+                self.mhr = MHR.from_files(
+                    device=torch.device("cuda" if torch.cuda.is_available() else "cpu"),
+                    lod=1,
+                )
+            else:
+                self.mhr = load_mhr_model(
+                    mhr_model_path,
+                    map_location=("cuda" if torch.cuda.is_available() else "cpu"),
+                )
 
         for param in self.mhr.parameters():
             param.requires_grad = False
@@ -361,7 +377,7 @@ class MHRHead(nn.Module):
             "pred_joint_coords": (
                 jcoords.reshape(batch_size, -1, 3) if jcoords is not None else None
             ),
-            "faces": self.faces.cpu().numpy(),
+            "faces": faces_numpy(self.faces),
             "joint_global_rots": joint_global_rots,
             "mhr_model_params": mhr_model_params,
         }
@@ -0,0 +1,275 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+
+"""Process-wide registry of read-only MHR assets.
+
+Both MHR heads of a ``SAM3DBody`` (``head_pose`` and ``head_pose_hand``), and
+every model loaded in the same process, use the same MHR assets:
+
+- the TorchScript MHR model is loaded once per (path, device, dtype) and
+  shared by all heads that request it;
+- the constant MHR buffers of the heads (faces, keypoint mapping, joint
+  rotations, scale/hand PCA, ...) are deduplicated by content once the
+  checkpoint has been loaded, see :func:`share_mhr_buffers`;
+- ``Module.to`` converts parameters and submodules in place, which would
+  convert the shared objects for every replica using them. Before a model is
+  moved or converted, its heads are pointed at the shared MHR model and
+  buffers of the target device and dtype, see :func:`relocate_mhr_models`;
+- the mesh faces are exposed as a single read-only numpy array, see
+  :func:`faces_numpy`.
+"""
+
+import copy
+import threading
+import weakref
+from typing import Dict, List
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from sam_3d_body.utils.logging import get_pylogger
+
+log = get_pylogger(__name__)
+
+# Constant MHRHead parameters that are filled from the checkpoint and never trained
+MHR_ASSET_BUFFERS = (
+    "joint_rotation",
+    "scale_mean",
+    "scale_comps",
+    "faces",
+    "hand_pose_mean",
+    "hand_pose_comps",
+    "hand_pose_comps_ori",
+    "hand_joint_idxs_left",
+    "hand_joint_idxs_right",
+    "keypoint_mapping",
+    "right_wrist_coords",
+    "root_coords",
+    "local_to_world_wrist",
+    "nonhand_param_idxs",
+)
+
+_lock = threading.Lock()
+# (MHR_MODEL_PATH or registered key, device, dtype or None) -> TorchScript MHR model
+_MHR_MODELS: Dict[tuple, nn.Module] = {}
+# id(shared MHR model) -> MHR_MODEL_PATH or registered key
+_MHR_PATHS: Dict[int, str] = {}
+# Models registered in-process (e.g. unpacked from an inference bundle)
+_REGISTERED_MHR_MODELS: Dict[str, nn.Module] = {}
+# (name, shape, dtype, device) -> weak references to canonical buffers
+_BUFFERS: Dict[tuple, List[weakref.ref]] = {}
+# id(faces) -> (weak reference, (data_ptr, version), read-only array)
+_FACES_NUMPY: Dict[int, tuple] = {}
+
+
+def register_mhr_model(key: str, mhr_model: nn.Module) -> None:
+    """Make an already loaded MHR model available under ``key``."""
+    with _lock:
+        _REGISTERED_MHR_MODELS[key] = mhr_model
+        # Models loaded under this key before are stale now
+        for cached in [k for k in _MHR_MODELS if k[0] == key]:
+            _MHR_PATHS.pop(id(_MHR_MODELS.pop(cached)), None)
+
+
+def _device_key(device) -> str:
+    if device is None:
+        return "None"
+    device = torch.device(device)
+    if device.type == "cuda" and device.index is None and torch.cuda.is_available():
+        device = torch.device("cuda", torch.cuda.current_device())
+    return str(device)
+
+
+def _module_device(module: nn.Module):
+    for tensor in module.parameters():
+        return tensor.device
+    for tensor in module.buffers():
+        return tensor.device
+    return None
+
+
+def _module_dtype(module: nn.Module):
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        if tensor.is_floating_point():
+            return tensor.dtype
+    return None
+
+
+def _load_mhr_model(mhr_model_path: str, map_location=None, dtype=None) -> nn.Module:
+    key = (mhr_model_path, _device_key(map_location), None if dtype is None else str(dtype))
+    if key not in _MHR_MODELS:
+        if dtype is not None:
+            mhr_model = _load_mhr_model(mhr_model_path, map_location)
+            if _module_dtype(mhr_model) not in (None, dtype):
+                mhr_model = copy.deepcopy(mhr_model).to(dtype)
+        elif mhr_model_path in _REGISTERED_MHR_MODELS:
+            mhr_model = _REGISTERED_MHR_MODELS[mhr_model_path]
+            if map_location is not None and _module_device(mhr_model) not in (
+                None,
+                torch.device(key[1]),
+            ):
+                mhr_model = copy.deepcopy(mhr_model).to(key[1])
+        else:
+            mhr_model = torch.jit.load(mhr_model_path, map_location=map_location)
+        _MHR_MODELS[key] = mhr_model
+        _MHR_PATHS[id(mhr_model)] = mhr_model_path
+    return _MHR_MODELS[key]
+
+
+def load_mhr_model(mhr_model_path: str, map_location=None) -> nn.Module:
+    """
+    Return the shared MHR model for ``mhr_model_path`` on ``map_location``.
+
+    Files are ``torch.jit.load``-ed once per device and reused by every later
+    call; registered models are used as is on their own device and copied
+    once to any other device.
+    """
+    with _lock:
+        return _load_mhr_model(mhr_model_path, map_location)
+
+
+def relocate_mhr_models(model: nn.Module, device=None, dtype=None) -> None:
+    """
+    Point the heads of ``model`` at the shared MHR models and MHR buffers on
+    ``device`` with floating point ``dtype`` (``None`` keeps the current one).
+
+    Call before ``model.to(device, dtype)``: ``Module.to`` moves and converts
+    submodules and parameters in place, so a shared MHR model or buffer
+    converted by one replica would otherwise be converted for every other
+    replica (and head) using it as well. Private copies (see
+    :func:`prepare_mhr_state_dict`) are left to ``model.to``.
+    """
+    with _lock:
+        for module in model.modules():
+            mhr_model = getattr(module, "mhr", None)
+            if mhr_model is None:
+                continue
+            path = _MHR_PATHS.get(id(mhr_model))
+            if path is not None:
+                module.mhr = _load_mhr_model(
+                    path,
+                    _module_device(mhr_model) if device is None else device,
+                    _module_dtype(mhr_model) if dtype is None else dtype,
+                )
+            for name in MHR_ASSET_BUFFERS:
+                param = module._parameters.get(name)
+                if param is None or param.is_meta:
+                    continue
+                # Module.to only converts floating point tensors
+                target_dtype = dtype if dtype is not None and param.is_floating_point() else param.dtype
+                target_device = param.device if device is None else torch.device(_device_key(device))
+                if param.device == target_device and param.dtype == target_dtype:
+                    continue
+                converted = nn.Parameter(
+                    param.detach().to(target_device, target_dtype), requires_grad=False
+                )
+                module._parameters[name] = _canonical_buffer(name, converted)
+
+
+def _shared_mhr_models():
+    with _lock:
+        return {
+            id(m): m
+            for m in list(_MHR_MODELS.values()) + list(_REGISTERED_MHR_MODELS.values())
+        }
+
+
+def prepare_mhr_state_dict(model: nn.Module, state_dict: dict) -> dict:
+    """
+    Keep checkpoint loading from writing into a shared MHR model.
+
+    Checkpoint entries of a shared MHR model are normally identical to the
+    model's own weights; they are replaced by those weights so that loading
+    is a no-op for them. A head whose checkpoint entries differ gets a
+    private copy of the MHR model, which the checkpoint is then loaded into.
+    """
+    shared = _shared_mhr_models()
+    for name, module in list(model.named_modules()):
+        mhr_model = getattr(module, "mhr", None)
+        if mhr_model is None or id(mhr_model) not in shared:
+            continue
+        prefix = f"{name}.mhr." if name else "mhr."
+        own_state_dict = mhr_model.state_dict()
+        identical = all(
+            torch.equal(
+                state_dict[prefix + k].to(device=v.device, dtype=v.dtype), v
+            )
+            for k, v in own_state_dict.items()
+            if prefix + k in state_dict
+        )
+        if identical:
+            state_dict.update({prefix + k: v for k, v in own_state_dict.items()})
+        else:
+            log.warning(
+                f"Checkpoint MHR weights of {name or 'model'} differ from the "
+                "shared MHR model, using a private copy"
+            )
+            module.mhr = copy.deepcopy(mhr_model)
+    return state_dict
+
+
+def missing_mhr_parameters(model: nn.Module) -> List[str]:
+    """Names of MHR model weights and MHR asset buffers still on the meta device."""
+    missing = []
+    for module_name, module in model.named_modules():
+        if getattr(module, "mhr", None) is None:
+            continue
+        prefix = f"{module_name}." if module_name else ""
+        for name, param in module.named_parameters():
+            if param.is_meta and (name.startswith("mhr.") or name in MHR_ASSET_BUFFERS):
+                missing.append(prefix + name)
+    return missing
+
+
+def _canonical_buffer(name: str, param: torch.Tensor) -> torch.Tensor:
+    key = (name, tuple(param.shape), param.dtype, str(param.device))
+    refs = _BUFFERS.setdefault(key, [])
+    refs[:] = [ref for ref in refs if ref() is not None]
+    for ref in refs:
+        candidate = ref()
+        if candidate is param or torch.equal(candidate, param):
+            return candidate
+    refs.append(weakref.ref(param))
+    return param
+
+
+def share_mhr_buffers(model: nn.Module) -> int:
+    """
+    Deduplicate the constant MHR buffers of all MHR heads by content.
+
+    Buffers with identical content (across the heads of ``model`` and any
+    model processed earlier in this process) are replaced by one shared
+    parameter. Buffers that differ, such as the hand PCA of the hand head,
+    are left alone.
+
+    Returns:
+        int: Number of bytes freed.
+    """
+    freed = 0
+    with _lock:
+        for module in model.modules():
+            if getattr(module, "mhr", None) is None:
+                continue
+            for name in MHR_ASSET_BUFFERS:
+                param = module._parameters.get(name)
+                if param is None or param.is_meta:
+                    continue
+                canonical = _canonical_buffer(name, param)
+                if canonical is not param:
+                    module._parameters[name] = canonical
+                    freed += param.numel() * param.element_size()
+    return freed
+
+
+def faces_numpy(faces: torch.Tensor) -> np.ndarray:
+    """Read-only numpy copy of the mesh faces, converted once per faces tensor."""
+    key = id(faces)
+    stamp = (faces.data_ptr(), faces._version)
+    with _lock:
+        entry = _FACES_NUMPY.get(key)
+        if entry is not None and entry[0]() is faces and entry[1] == stamp:
+            return entry[2]
+        array = faces.detach().cpu().numpy().copy()
+        array.setflags(write=False)
+        _FACES_NUMPY[key] = (weakref.ref(faces), stamp, array)
+        return array
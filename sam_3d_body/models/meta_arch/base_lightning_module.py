@@ -2,11 +2,12 @@
 
 import numpy as np
 import pytorch_lightning as pl
-from pytorch_lightning.loggers import TensorBoardLogger, WandbLogger
 
 
 class BaseLightningModule(pl.LightningModule):
     def _log_metric(self, name, value, step=None):
+        from pytorch_lightning.loggers import TensorBoardLogger, WandbLogger
+
         for logger in self.trainer.loggers:
             if isinstance(logger, WandbLogger):
                 if step is not None:
@@ -21,6 +22,8 @@ class BaseLightningModule(pl.LightningModule):
     def _log_image(self, name, img_tensor, dataformats="CHW", step_count=None):
         """Log image tensor to both W&B and TensorBoard."""
         step = step_count if step_count is not None else self.global_step
+        from pytorch_lightning.loggers import TensorBoardLogger, WandbLogger
+
         for logger in self.trainer.loggers:
             if isinstance(logger, WandbLogger):
                 import wandb
@@ -38,6 +41,8 @@ class BaseLightningModule(pl.LightningModule):
                 raise ValueError(f"Unsupported logger: {logger}")
 
     def _log_hist(self, name, array, step_count=None):
+        from pytorch_lightning.loggers import TensorBoardLogger, WandbLogger
+
         for logger in self.trainer.loggers:
             if isinstance(logger, WandbLogger):
                 import wandb
@@ -8,6 +8,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+from sam_3d_body.data.utils.frame_context import FrameContext
 from sam_3d_body.data.utils.prepare_batch import prepare_batch
 from sam_3d_body.models.decoders.prompt_encoder import PositionEmbeddingRandom
 from sam_3d_body.models.modules.mhr_utils import (
@@ -16,6 +17,7 @@ from sam_3d_body.models.modules.mhr_utils import (
 )
 from sam_3d_body.utils import recursive_to
 from sam_3d_body.utils.logging import get_pylogger
+from sam_3d_body.utils.timing import StageTimer
 
 from ..backbones import create_backbone
 from ..decoders import build_decoder, build_keypoint_sampler, PromptEncoder
@@ -42,6 +44,8 @@ KEY_RIGHT_HAND = list(range(21, 42))
 
 class SAM3DBody(BaseModel):
     pelvis_idx = [9, 10]  # left_hip, right_hip
+    # Inference stage timer; SAM3DBodyEstimator replaces it with its own enabled one
+    timer = StageTimer(enabled=False)
 
     def _initialze_model(self):
         self.register_buffer(
@@ -1094,9 +1098,11 @@ class SAM3DBody(BaseModel):
             batch["ray_cond_hand"] = ray_cond[self.hand_batch_idx].clone()
         ray_cond = None
 
-        image_embeddings = self.backbone(
-            x.type(self.backbone_dtype), extra_embed=ray_cond
-        )  # (B, C, H, W)
+        branch = "body" if len(self.body_batch_idx) else "hand"
+        with self.timer.stage(f"{branch}_backbone", x.device):
+            image_embeddings = self.backbone(
+                x.type(self.backbone_dtype), extra_embed=ray_cond
+            )  # (B, C, H, W)
 
         if isinstance(image_embeddings, tuple):
             image_embeddings = image_embeddings[-1]
@@ -1121,24 +1127,26 @@ class SAM3DBody(BaseModel):
         # Forward promptable decoder to get updated pose tokens and regression output
         pose_output, pose_output_hand = None, None
         if len(self.body_batch_idx):
-            tokens_output, pose_output = self.forward_decoder(
-                image_embeddings[self.body_batch_idx],
-                init_estimate=None,
-                keypoints=keypoints_prompt[self.body_batch_idx],
-                prev_estimate=None,
-                condition_info=condition_info[self.body_batch_idx],
-                batch=batch,
-            )
+            with self.timer.stage("body_decoder", x.device):
+                tokens_output, pose_output = self.forward_decoder(
+                    image_embeddings[self.body_batch_idx],
+                    init_estimate=None,
+                    keypoints=keypoints_prompt[self.body_batch_idx],
+                    prev_estimate=None,
+                    condition_info=condition_info[self.body_batch_idx],
+                    batch=batch,
+                )
             pose_output = pose_output[-1]
         if len(self.hand_batch_idx):
-            tokens_output_hand, pose_output_hand = self.forward_decoder_hand(
-                image_embeddings[self.hand_batch_idx],
-                init_estimate=None,
-                keypoints=keypoints_prompt[self.hand_batch_idx],
-                prev_estimate=None,
-                condition_info=condition_info[self.hand_batch_idx],
-                batch=batch,
-            )
+            with self.timer.stage("hand_decoder", x.device):
+                tokens_output_hand, pose_output_hand = self.forward_decoder_hand(
+                    image_embeddings[self.hand_batch_idx],
+                    init_estimate=None,
+                    keypoints=keypoints_prompt[self.hand_batch_idx],
+                    prev_estimate=None,
+                    condition_info=condition_info[self.hand_batch_idx],
+                    batch=batch,
+                )
             pose_output_hand = pose_output_hand[-1]
 
         output = {
@@ -1209,9 +1217,13 @@ class SAM3DBody(BaseModel):
             - full: full-body inference with both body and hand decoders
             - body: inference with body decoder only (still full-body output)
             - hand: inference with hand decoder only (only hand output)
+
+        img is an RGB image or a FrameContext (which also caches the flipped
+        frame used for the left-hand crops).
         """
 
-        height, width = img.shape[:2]
+        frame = FrameContext.wrap(img)
+        height, width = frame.shape[:2]
         cam_int = batch["cam_int"].clone()
 
         if inference_type == "body":
@@ -1224,7 +1236,8 @@ class SAM3DBody(BaseModel):
             ValueError("Invalid inference type: ", inference_type)
 
         # Step 1. For full-body inference, we first inference with the body decoder.
-        pose_output = self.forward_step(batch, decoder_type="body")
+        with self.timer.stage("body_pass", cam_int.device):
+            pose_output = self.forward_step(batch, decoder_type="body")
         left_xyxy, right_xyxy = self._get_hand_box(pose_output, batch)
         ori_local_wrist_rotmat = roma.euler_to_rotmat(
             "XZY",
@@ -1235,16 +1248,18 @@ class SAM3DBody(BaseModel):
 
         # Step 2. Re-run with each hand
         ## Left... Flip image & box
-        flipped_img = img[:, ::-1]
+        flipped_img = frame.flipped
         tmp = left_xyxy.copy()
         left_xyxy[:, 0] = width - tmp[:, 2] - 1
         left_xyxy[:, 2] = width - tmp[:, 0] - 1
 
-        batch_lhand = prepare_batch(
-            flipped_img, transform_hand, left_xyxy, cam_int=cam_int.clone()
-        )
-        batch_lhand = recursive_to(batch_lhand, "cuda")
-        lhand_output = self.forward_step(batch_lhand, decoder_type="hand")
+        with self.timer.stage("left_hand", cam_int.device):
+            with self.timer.stage("hand_crop"):
+                batch_lhand = prepare_batch(
+                    flipped_img, transform_hand, left_xyxy, cam_int=cam_int.clone()
+                )
+                batch_lhand = recursive_to(batch_lhand, "cuda")
+            lhand_output = self.forward_step(batch_lhand, decoder_type="hand")
 
         # Unflip output
         ## Flip scale
@@ -1276,11 +1291,13 @@ class SAM3DBody(BaseModel):
         )
 
         ## Right...
-        batch_rhand = prepare_batch(
-            img, transform_hand, right_xyxy, cam_int=cam_int.clone()
-        )
-        batch_rhand = recursive_to(batch_rhand, "cuda")
-        rhand_output = self.forward_step(batch_rhand, decoder_type="hand")
+        with self.timer.stage("right_hand", cam_int.device):
+            with self.timer.stage("hand_crop"):
+                batch_rhand = prepare_batch(
+                    frame, transform_hand, right_xyxy, cam_int=cam_int.clone()
+                )
+                batch_rhand = recursive_to(batch_rhand, "cuda")
+            rhand_output = self.forward_step(batch_rhand, decoder_type="hand")
 
         # Step 3. replace hand pose estimation from the body decoder.
         ## CRITERIA 1: LOCAL WRIST POSE DIFFERENCE
@@ -1461,9 +1478,10 @@ class SAM3DBody(BaseModel):
             )  # [-0.5, 0.5] --> [0, 1]
 
         if keypoint_prompt.numel() != 0:
-            pose_output, _ = self.run_keypoint_prompt(
-                batch, pose_output, keypoint_prompt
-            )
+            with self.timer.stage("keypoint_prompt", keypoint_prompt.device):
+                pose_output, _ = self.run_keypoint_prompt(
+                    batch, pose_output, keypoint_prompt
+                )
 
         ##############################################################################
 
@@ -1493,16 +1511,17 @@ class SAM3DBody(BaseModel):
         ############################ Doing IK ############################
 
         # First, forward just FK
-        joint_rotations = self.head_pose.mhr_forward(
-            global_trans=pose_output["mhr"]["global_rot"] * 0,
-            global_rot=pose_output["mhr"]["global_rot"],
-            body_pose_params=pose_output["mhr"]["body_pose"],
-            hand_pose_params=updated_hand_pose,
-            scale_params=updated_scale,
-            shape_params=updated_shape,
-            expr_params=pose_output["mhr"]["face"],
-            return_joint_rotations=True,
-        )[1]
+        with self.timer.stage("mhr_fk", updated_hand_pose.device):
+            joint_rotations = self.head_pose.mhr_forward(
+                global_trans=pose_output["mhr"]["global_rot"] * 0,
+                global_rot=pose_output["mhr"]["global_rot"],
+                body_pose_params=pose_output["mhr"]["body_pose"],
+                hand_pose_params=updated_hand_pose,
+                scale_params=updated_scale,
+                shape_params=updated_shape,
+                expr_params=pose_output["mhr"]["face"],
+                return_joint_rotations=True,
+            )[1]
 
         # Get lowarm
         lowarm_joint_idxs = torch.LongTensor([76, 40]).cuda()  # left, right
@@ -1595,7 +1614,7 @@ class SAM3DBody(BaseModel):
         ########################################################
 
         # Re-run forward
-        with torch.no_grad():
+        with torch.no_grad(), self.timer.stage("mhr_skinning", updated_hand_pose.device):
             verts, j3d, jcoords, mhr_model_params, joint_global_rots = (
                 self.head_pose.mhr_forward(
                     global_trans=pose_output["mhr"]["global_rot"] * 0,
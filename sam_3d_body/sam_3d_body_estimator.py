@@ -1,8 +1,6 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 from typing import Optional, Union
 
-import cv2
-
 import numpy as np
 import torch
 
@@ -13,10 +11,11 @@ from sam_3d_body.data.transforms import (
     VisionTransformWrapper,
 )
 
+from sam_3d_body.data.utils.frame_context import FrameContext
 from sam_3d_body.data.utils.io import load_image
 from sam_3d_body.data.utils.prepare_batch import prepare_batch
 from sam_3d_body.utils import recursive_to
-from torchvision.transforms import ToTensor
+from sam_3d_body.utils.timing import StageTimer
 
 
 class SAM3DBodyEstimator:
@@ -27,6 +26,7 @@ class SAM3DBodyEstimator:
         human_detector=None,
         human_segmentor=None,
         fov_estimator=None,
+        timing: bool = True,
     ):
         self.device = sam_3d_body_model.device
         self.model, self.cfg = sam_3d_body_model, model_cfg
@@ -35,8 +35,15 @@ class SAM3DBodyEstimator:
         self.fov_estimator = fov_estimator
         self.thresh_wrist_angle = 1.4
 
-        # For mesh visualization
-        self.faces = self.model.head_pose.faces.cpu().numpy()
+        # Per-stage wall time of every call (see timing_summary()), shared with
+        # the model so its inference sub-stages are recorded in the same place
+        self.timer = StageTimer(enabled=timing)
+        self.model.timer = self.timer
+
+        # For mesh visualization (read-only, shared with the MHR heads)
+        from sam_3d_body.models.heads.mhr_registry import faces_numpy
+
+        self.faces = faces_numpy(self.model.head_pose.faces)
 
         if self.detector is None:
             print("No human detector is used...")
@@ -45,6 +52,8 @@ class SAM3DBodyEstimator:
         if self.fov_estimator is None:
             print("No FOV estimator... Using the default FOV!")
 
+        from torchvision.transforms import ToTensor
+
         self.transform = Compose(
             [
                 GetBBoxCenterScale(),
@@ -63,7 +72,7 @@ class SAM3DBodyEstimator:
     @torch.no_grad()
     def process_one_image(
         self,
-        img: Union[str, np.ndarray],
+        img: Union[str, np.ndarray, FrameContext],
         bboxes: Optional[np.ndarray] = None,
         masks: Optional[np.ndarray] = None,
         cam_int: Optional[np.ndarray] = None,
@@ -77,7 +86,7 @@ class SAM3DBodyEstimator:
         Perform model prediction in top-down format: assuming input is a full image.
 
         Args:
-            img: Input image (path or numpy array)
+            img: Input image (path, RGB numpy array or FrameContext)
             bboxes: Optional pre-computed bounding boxes
             masks: Optional pre-computed masks (numpy array). If provided, SAM2 will be skipped.
             det_cat_id: Detection category ID
@@ -96,67 +105,139 @@ class SAM3DBodyEstimator:
         self.prev_prompt = []
         torch.cuda.empty_cache()
 
+        image_format = "rgb"
         if type(img) == str:
             img = load_image(img, backend="cv2", image_format="bgr")
             image_format = "bgr"
-        else:
+        elif not isinstance(img, FrameContext):
             print("####### Please make sure the input image is in RGB format")
-            image_format = "rgb"
-        height, width = img.shape[:2]
+
+        boxes, img = self.detect(
+            img,
+            image_format=image_format,
+            bboxes=bboxes,
+            det_cat_id=det_cat_id,
+            bbox_thr=bbox_thr,
+            nms_thr=nms_thr,
+        )
+
+        # If there are no detected humans, don't run prediction
+        if len(boxes) == 0:
+            return []
+
+        masks, masks_score = self.segment(
+            img, boxes, masks=masks, use_mask=use_mask, has_bboxes=bboxes is not None
+        )
+        batch = self.prepare(img, boxes, masks, masks_score)
+        batch, outputs = self.infer(img, batch, cam_int=cam_int, inference_type=inference_type)
+        return self.postprocess(batch, outputs, masks, inference_type=inference_type)
+
+    # The steps of process_one_image, usable as separate pipeline stages (see
+    # tools/pipeline.py). Only infer() touches the SAM 3D Body model, so the
+    # other stages can run concurrently with it on other threads. Every stage
+    # accepts either an RGB array or the FrameContext returned by detect(),
+    # which converts and uploads the frame once for all of them.
+
+    @torch.no_grad()
+    def detect(
+        self,
+        img: Union[np.ndarray, FrameContext],
+        image_format: str = "rgb",
+        bboxes: Optional[np.ndarray] = None,
+        det_cat_id: int = 0,
+        bbox_thr: float = 0.5,
+        nms_thr: float = 0.3,
+    ):
+        """
+        Find the person boxes of an image.
+
+        Returns:
+            Tuple of the boxes [N, 4] (xyxy) and the FrameContext of the image.
+        """
+        frame = FrameContext.wrap(img, image_format)
+        height, width = frame.shape[:2]
 
         if bboxes is not None:
             boxes = bboxes.reshape(-1, 4)
             self.is_crop = True
         elif self.detector is not None:
-            if image_format == "rgb":
-                img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-                image_format = "bgr"
             print("Running object detector...")
-            boxes = self.detector.run_human_detection(
-                img,
-                det_cat_id=det_cat_id,
-                bbox_thr=bbox_thr,
-                nms_thr=nms_thr,
-                default_to_full_image=False,
-            )
+            with self.timer.stage("detector", self.detector.device):
+                boxes = self.detector.run_human_detection(
+                    frame,
+                    det_cat_id=det_cat_id,
+                    bbox_thr=bbox_thr,
+                    nms_thr=nms_thr,
+                    default_to_full_image=False,
+                )
             print("Found boxes:", boxes)
             self.is_crop = True
         else:
             boxes = np.array([0, 0, width, height]).reshape(1, 4)
             self.is_crop = False
 
-        # If there are no detected humans, don't run prediction
-        if len(boxes) == 0:
-            return []
+        return boxes, frame
 
-        # The following models expect RGB images instead of BGR
-        if image_format == "bgr":
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    @torch.no_grad()
+    def segment(
+        self,
+        img: Union[np.ndarray, FrameContext],
+        boxes: np.ndarray,
+        masks: Optional[np.ndarray] = None,
+        use_mask: bool = False,
+        has_bboxes: bool = False,
+    ):
+        """
+        Get the person masks, either provided externally or generated via SAM2.
 
-        # Handle masks - either provided externally or generated via SAM2
-        masks_score = None
+        Returns:
+            Tuple of the masks [N, H, W, 1] and their scores, or (None, None).
+        """
+        frame = FrameContext.wrap(img)
+        height, width = frame.shape[:2]
         if masks is not None:
             # Use provided masks - ensure they match the number of detected boxes
             print(f"Using provided masks: {masks.shape}")
-            assert (
-                bboxes is not None
-            ), "Mask-conditioned inference requires bboxes input!"
+            assert has_bboxes, "Mask-conditioned inference requires bboxes input!"
             masks = masks.reshape(-1, height, width, 1).astype(np.uint8)
             masks_score = np.ones(
                 len(masks), dtype=np.float32
             )  # Set high confidence for provided masks
-            use_mask = True
-        elif use_mask and self.sam is not None:
+            return masks, masks_score
+        if use_mask and self.sam is not None:
             print("Running SAM to get mask from bbox...")
             # Generate masks using SAM2
-            masks, masks_score = self.sam.run_sam(img, boxes)
-        else:
-            masks, masks_score = None, None
+            with self.timer.stage("sam2", self.sam.device):
+                return self.sam.run_sam(frame.rgb, boxes)
+        return None, None
+
+    def prepare(
+        self,
+        img: Union[np.ndarray, FrameContext],
+        boxes: np.ndarray,
+        masks: Optional[np.ndarray] = None,
+        masks_score: Optional[np.ndarray] = None,
+    ):
+        """Crop and normalize the person boxes into a (CPU) model batch."""
+        with self.timer.stage("preprocess"):
+            return prepare_batch(img, self.transform, boxes, masks, masks_score)
+
+    @torch.no_grad()
+    def infer(
+        self,
+        img: Union[np.ndarray, FrameContext],
+        batch,
+        cam_int: Optional[torch.Tensor] = None,
+        inference_type: str = "full",
+    ):
+        """
+        Run the camera intrinsics estimation and the SAM 3D Body model on a batch.
 
-        #################### Construct batch data samples ####################
-        batch = prepare_batch(img, self.transform, boxes, masks, masks_score)
+        Not thread-safe: the model keeps per-batch state.
 
-        #################### Run model inference on an image ####################
+        Returns:
+            Tuple of the batch on the model device and the raw model outputs.
+        """
         batch = recursive_to(batch, "cuda")
         self.model._initialize_batch(batch)
 
@@ -168,29 +249,41 @@ class SAM3DBodyEstimator:
             batch["cam_int"] = cam_int.clone()
         elif self.fov_estimator is not None:
             print("Running FOV estimator ...")
-            input_image = batch["img_ori"][0].data
-            cam_int = self.fov_estimator.get_cam_intrinsics(input_image).to(
-                batch["img"]
-            )
+            with self.timer.stage("fov", self.fov_estimator.device):
+                cam_int = self.fov_estimator.get_cam_intrinsics(FrameContext.wrap(img)).to(
+                    batch["img"]
+                )
             batch["cam_int"] = cam_int.clone()
         else:
             cam_int = batch["cam_int"].clone()
 
-        outputs = self.model.run_inference(
-            img,
-            batch,
-            inference_type=inference_type,
-            transform_hand=self.transform_hand,
-            thresh_wrist_angle=self.thresh_wrist_angle,
-        )
+        with self.timer.stage("inference", self.device):
+            outputs = self.model.run_inference(
+                img,
+                batch,
+                inference_type=inference_type,
+                transform_hand=self.transform_hand,
+                thresh_wrist_angle=self.thresh_wrist_angle,
+            )
+        return batch, outputs
+
+    def postprocess(
+        self,
+        batch,
+        outputs,
+        masks: Optional[np.ndarray] = None,
+        inference_type: str = "full",
+    ):
+        """Convert the outputs of infer() into one dict of numpy arrays per person."""
         if inference_type == "full":
             pose_output, batch_lhand, batch_rhand, _, _ = outputs
         else:
             pose_output = outputs
 
-        out = pose_output["mhr"]
-        out = recursive_to(out, "cpu")
-        out = recursive_to(out, "numpy")
+        with self.timer.stage("postprocess"):
+            out = pose_output["mhr"]
+            out = recursive_to(out, "cpu")
+            out = recursive_to(out, "numpy")
         all_out = []
         for idx in range(batch["img"].shape[1]):
             all_out.append(
@@ -257,3 +350,36 @@ class SAM3DBodyEstimator:
                 )
 
         return all_out
+
+    def profile(
+        self,
+        output_dir,
+        num_frames: int = 10,
+        warmup: int = 1,
+        memory: bool = False,
+    ):
+        """
+        Context manager capturing `num_frames` images with torch.profiler
+        (after `warmup` images), with every stage labelled; call step() on it
+        after each image. Writes a Chrome trace, a top-ops table and the
+        per-stage time (and memory) to output_dir.
+        See sam_3d_body.utils.profiling.InferenceProfiler.
+        """
+        from sam_3d_body.utils.profiling import InferenceProfiler
+
+        return InferenceProfiler(
+            output_dir, self.timer, num_frames=num_frames, warmup=warmup, memory=memory
+        )
+
+    def timing_summary(self):
+        """
+        Per-stage timing of all calls since creation (or the last reset), as
+        {stage: {"count", "total_s", "mean_ms", "p50_ms", "p95_ms", "max_ms"}}.
+
+        Stages: detector, sam2, preprocess, fov, inference (the whole model
+        call) and postprocess. Inside inference: body_pass (body_backbone,
+        body_decoder), left_hand and right_hand (each hand_crop,
+        hand_backbone, hand_decoder, so two samples of those per image),
+        keypoint_prompt, mhr_fk and mhr_skinning.
+        """
+        return self.timer.summary()
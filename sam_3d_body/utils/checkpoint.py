@@ -1,21 +1,38 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 
 from collections import namedtuple
+from contextlib import contextmanager
 
-import pytorch_lightning as pl
 import torch
+import torch.nn as nn
 
 from .logging import get_pylogger
 
 log = get_pylogger(__name__)
 
 
-class CheckpointCallback(pl.callbacks.ModelCheckpoint):
-    """Disable model checkpoint after validation to avoid DDP job hanging after resume"""
+def _make_checkpoint_callback():
+    import pytorch_lightning as pl
 
-    def on_validation_end(self, trainer, pl_module):
-        # Override to do nothing
-        pass
+    class CheckpointCallback(pl.callbacks.ModelCheckpoint):
+        """Disable model checkpoint after validation to avoid DDP job hanging after resume"""
+
+        def on_validation_end(self, trainer, pl_module):
+            # Override to do nothing
+            pass
+
+    # Keep the callback state key of checkpoints written before this was lazy
+    CheckpointCallback.__module__ = __name__
+    CheckpointCallback.__qualname__ = "CheckpointCallback"
+    return CheckpointCallback
+
+
+def __getattr__(name):
+    # Training-only, so pytorch_lightning is imported on first use
+    if name == "CheckpointCallback":
+        globals()[name] = _make_checkpoint_callback()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class _IncompatibleKeys(
@@ -30,7 +47,68 @@ class _IncompatibleKeys(
     __str__ = __repr__
 
 
-def load_state_dict(module, state_dict, strict=False, logger=None):
+_register_parameter = nn.Module.register_parameter
+
+
+@contextmanager
+def init_real_weights():
+    """Allocate parameters normally, even inside :func:`init_empty_weights`.
+
+    For modules that load their own weights from files at construction time
+    (such as the MHR model) rather than from the checkpoint.
+    """
+    register_parameter = nn.Module.register_parameter
+    try:
+        nn.Module.register_parameter = _register_parameter
+        yield
+    finally:
+        nn.Module.register_parameter = register_parameter
+
+
+@contextmanager
+def init_empty_weights():
+    """Create module parameters on the meta device instead of allocating them.
+
+    Only parameters are affected: buffers (including non-persistent ones such as
+    normalization constants, which are never part of a checkpoint) are still
+    created normally. Parameters built inside this context must be filled in
+    afterwards, e.g. with ``load_state_dict(..., assign=True)``.
+    """
+    register_parameter = nn.Module.register_parameter
+
+    def register_empty_parameter(module, name, param):
+        register_parameter(module, name, param)
+        if param is not None and not param.is_meta:
+            module._parameters[name] = type(param)(
+                param.to("meta"), requires_grad=param.requires_grad
+            )
+
+    try:
+        nn.Module.register_parameter = register_empty_parameter
+        yield
+    finally:
+        nn.Module.register_parameter = register_parameter
+
+
+def materialize_meta_parameters(module, device):
+    """Replace parameters still on the meta device by zero tensors on ``device``.
+
+    Returns:
+        list[str]: Names of the parameters that had to be materialized.
+    """
+    materialized = []
+    for module_name, submodule in module.named_modules():
+        for name, param in submodule._parameters.items():
+            if param is not None and param.is_meta:
+                submodule._parameters[name] = type(param)(
+                    torch.zeros_like(param, device=device),
+                    requires_grad=param.requires_grad,
+                )
+                materialized.append(f"{module_name}.{name}" if module_name else name)
+    return materialized
+
+
+def load_state_dict(module, state_dict, strict=False, logger=None, assign=False):
     """Load state_dict to a module.
 
     This method is modified from :meth:`torch.nn.Module.load_state_dict`.
@@ -45,6 +123,10 @@ def load_state_dict(module, state_dict, strict=False, logger=None):
             :meth:`~torch.nn.Module.state_dict` function. Defaults to False.
         logger (:obj:`logging.Logger`, optional): Logger to log the error
             message. If not specified, print function will be used.
+        assign (bool): whether to assign the tensors of the state dict to the
+            module instead of copying them into the existing parameters, which
+            is required for modules created under :func:`init_empty_weights`.
+            TorchScript submodules are always copied into. Defaults to False.
     """
     unexpected_keys = []
     missing_keys = []
@@ -63,6 +145,8 @@ def load_state_dict(module, state_dict, strict=False, logger=None):
         if isinstance(module, torch.nn.parallel.DistributedDataParallel):
             module = module.module
         local_metadata = {} if metadata is None else metadata.get(prefix[:-1], {})
+        if assign and not isinstance(module, torch.jit.ScriptModule):
+            local_metadata = dict(local_metadata, assign_to_params_buffers=True)
         module._load_from_state_dict(
             local_state_dict,
             prefix,
@@ -1,7 +1,19 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 import logging
+import os
 
-from pytorch_lightning.utilities import rank_zero_only
+# The same decorator object Lightning uses (and whose rank the Trainer sets),
+# imported without pulling in pytorch_lightning itself.
+from lightning_utilities.core.rank_zero import rank_zero_only
+
+if getattr(rank_zero_only, "rank", None) is None:
+    # Same environment lookup as lightning_fabric.utilities.rank_zero
+    for _key in ("RANK", "LOCAL_RANK", "SLURM_PROCID", "JSM_NAMESPACE_RANK"):
+        if os.environ.get(_key) is not None:
+            rank_zero_only.rank = int(os.environ[_key])
+            break
+    else:
+        rank_zero_only.rank = 0
 
 
 def get_pylogger(name=__name__) -> logging.Logger:
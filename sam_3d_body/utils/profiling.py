@@ -0,0 +1,164 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+
+import json
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import torch
+
+from .timing import StageTimer
+
+
+def _event_value(event, *names, default=0):
+    # The attribute names changed across PyTorch versions (cuda_* -> device_*)
+    for name in names:
+        if hasattr(event, name):
+            return getattr(event, name)
+    return default
+
+
+class InferenceProfiler:
+    """
+    Capture a few frames of inference with torch.profiler.
+
+    While active, every stage of the given StageTimer (detector, body_pass,
+    left_hand, right_hand, keypoint_prompt, mhr_fk, mhr_skinning, ...) is
+    labelled with record_function, so the trace and the tables group the
+    operators by logical stage. Call step() once per frame: the first
+    `warmup` frames are run under the profiler but discarded, the next
+    `num_frames` are recorded, and the results are written to output_dir
+    as soon as they are complete:
+
+        trace.json      Chrome trace (chrome://tracing or https://ui.perfetto.dev)
+        top_ops.txt     operators sorted by device (or CPU) time
+        stages.json     time (and with memory=True, memory) per stage label
+
+    Usage:
+        with InferenceProfiler("output/profile", estimator.timer, num_frames=10) as prof:
+            for frame in frames:
+                estimator.process_one_image(frame)
+                prof.step()
+    """
+
+    def __init__(
+        self,
+        output_dir: Union[str, Path],
+        timer: Optional[StageTimer] = None,
+        num_frames: int = 10,
+        warmup: int = 1,
+        memory: bool = False,
+        row_limit: int = 40,
+    ):
+        """
+        Args:
+            output_dir: Directory for the trace and the tables.
+            timer: StageTimer whose stages are labelled while profiling.
+            num_frames: Number of frames (steps) to record.
+            warmup: Frames run before recording (cuDNN autotuning, allocator warm-up).
+            memory: Also record tensor allocations (memory per operator and stage).
+            row_limit: Rows of the top-ops table.
+        """
+        self.output_dir = Path(output_dir)
+        self.timer = timer
+        self.num_frames = max(num_frames, 1)
+        self.warmup = max(warmup, 0)
+        self.memory = memory
+        self.row_limit = row_limit
+        self.done = False
+        self._profiler = None
+        self._steps = 0
+
+    def __enter__(self) -> "InferenceProfiler":
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self._profiler = torch.profiler.profile(
+            activities=activities,
+            schedule=torch.profiler.schedule(
+                wait=0, warmup=self.warmup, active=self.num_frames, repeat=1
+            ),
+            on_trace_ready=self._export,
+            record_shapes=True,
+            profile_memory=self.memory,
+        )
+        if self.timer is not None:
+            self.timer.record_functions = True
+        self._profiler.__enter__()
+        return self
+
+    def step(self):
+        """Mark the end of one frame."""
+        if self.done:
+            return
+        self._steps += 1
+        self._profiler.step()
+        if self._steps >= self.warmup + self.num_frames:
+            self._stop()
+
+    def _stop(self):
+        if self._profiler is not None:
+            # Exiting before the schedule finished exports the frames recorded so far
+            self._profiler.__exit__(None, None, None)
+            self._profiler = None
+        if self.timer is not None:
+            self.timer.record_functions = False
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop()
+
+    def _export(self, prof):
+        self.done = True
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        prof.export_chrome_trace(str(self.output_dir / "trace.json"))
+
+        events = prof.key_averages()
+        sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+        tables = [events.table(sort_by=sort_by, row_limit=self.row_limit)]
+        if self.memory:
+            memory_sort = (
+                "self_cuda_memory_usage" if torch.cuda.is_available() else "self_cpu_memory_usage"
+            )
+            tables.append(events.table(sort_by=memory_sort, row_limit=self.row_limit))
+        (self.output_dir / "top_ops.txt").write_text("\n\n".join(tables))
+
+        labels = self.timer.labels if self.timer is not None else set()
+        stages: Dict[str, Dict] = {}
+        for event in events:
+            if event.key not in labels:
+                continue
+            stage = {
+                "count": event.count,
+                "cpu_ms": round(event.cpu_time_total / 1000, 3),
+                "device_ms": round(
+                    _event_value(event, "device_time_total", "cuda_time_total") / 1000, 3
+                ),
+            }
+            if self.memory:
+                stage["cpu_memory_mb"] = round(event.cpu_memory_usage / 2**20, 2)
+                stage["device_memory_mb"] = round(
+                    _event_value(event, "device_memory_usage", "cuda_memory_usage") / 2**20, 2
+                )
+            stages[event.key] = stage
+        with open(self.output_dir / "stages.json", "w") as f:
+            json.dump({"frames": self._steps - self.warmup, "stages": stages}, f, indent=2)
+
+    def format_stages(self) -> str:
+        """The recorded per-stage table (empty before the frames were recorded)."""
+        path = self.output_dir / "stages.json"
+        if not path.exists():
+            return ""
+        with open(path) as f:
+            stages = json.load(f)["stages"]
+        if not stages:
+            return ""
+        width = max(len("stage"), *(len(name) for name in stages))
+        header = f"{'stage':<{width}}  {'count':>6}  {'cpu_ms':>10}  {'device_ms':>10}"
+        if self.memory:
+            header += f"  {'device_mb':>10}"
+        lines = [header]
+        for name, s in stages.items():
+            line = f"{name:<{width}}  {s['count']:>6}  {s['cpu_ms']:>10.1f}  {s['device_ms']:>10.1f}"
+            if self.memory:
+                line += f"  {s['device_memory_mb']:>10.1f}"
+            lines.append(line)
+        return "\n".join(lines)
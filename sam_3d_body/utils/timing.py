@@ -0,0 +1,172 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+import torch
+
+
+class StageTimer:
+    """
+    Lightweight wall-clock timer for named processing stages.
+
+    Every `with timer.stage(name):` block adds one sample (seconds) to the
+    stage; summary() aggregates them into count / total / mean / p50 / p95.
+    Blocks given a CUDA device are timed with CUDA events recorded on the
+    current stream, so the asynchronous GPU work of the block is counted in
+    it rather than in whichever later call happens to wait for it. Nothing
+    is synchronized while recording: the events are read once they have
+    completed (at the latest in samples()), so stages running concurrently
+    on other threads are not serialized by the timer. Kernels that other
+    threads queue on the same stream between the two events are included.
+    Thread-safe: the stages of a pipeline may record from different threads.
+
+    A disabled timer records nothing and costs one attribute check per block.
+    While record_functions is set (see sam_3d_body.utils.profiling), every
+    block is also labelled with torch.profiler.record_function(name).
+    """
+
+    def __init__(self, enabled: bool = True, sync: bool = True):
+        """
+        Args:
+            enabled: Record samples (False turns every block into a no-op).
+            sync: Time the blocks that pass a CUDA device with CUDA events
+                (False: CPU wall-clock time only).
+        """
+        self.enabled = enabled
+        self.sync = sync
+        self.record_functions = False
+        self.labels = set()  # stage names labelled while record_functions was set
+        self._samples: Dict[str, List[float]] = defaultdict(list)
+        # (name, start event, end event) of CUDA blocks not read yet
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def _cuda_device(self, device) -> Optional[torch.device]:
+        if not self.sync or device is None:
+            return None
+        device = torch.device(device)
+        if device.type == "cuda" and torch.cuda.is_initialized():
+            return device
+        return None
+
+    def _collect(self, wait: bool = False):
+        """Turn completed CUDA event pairs into samples (wait=True: all of them)."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        waiting, done = [], []
+        for name, start, end in pending:
+            if wait:
+                end.synchronize()  # waits for this event only, not the whole device
+            elif not end.query():
+                waiting.append((name, start, end))
+                continue
+            done.append((name, start.elapsed_time(end) / 1000))
+        with self._lock:
+            self._pending[:0] = waiting
+            for name, seconds in done:
+                self._samples[name].append(seconds)
+
+    @contextmanager
+    def stage(self, name: str, device: Optional[Union[str, torch.device]] = None):
+        """Time the enclosed block as one sample of stage `name`."""
+        if self.record_functions:
+            self.labels.add(name)
+            with torch.profiler.record_function(name), self._timed(name, device):
+                yield
+        else:
+            with self._timed(name, device):
+                yield
+
+    @contextmanager
+    def _timed(self, name: str, device):
+        if not self.enabled:
+            yield
+            return
+        cuda_device = self._cuda_device(device)
+        if cuda_device is None:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.add(name, time.perf_counter() - start)
+            return
+
+        stream = torch.cuda.current_stream(cuda_device)
+        start = torch.cuda.Event(enable_timing=True)
+        end = torch.cuda.Event(enable_timing=True)
+        start.record(stream)
+        try:
+            yield
+        finally:
+            end.record(stream)
+            with self._lock:
+                self._pending.append((name, start, end))
+            self._collect()
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        """fn timed as stage `name` on every call (e.g. for work run on another thread)."""
+
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+
+        return timed
+
+    def add(self, name: str, seconds: float):
+        """Record one sample of stage `name`."""
+        with self._lock:
+            self._samples[name].append(seconds)
+
+    def samples(self) -> Dict[str, List[float]]:
+        """Copy of the raw samples (seconds) per stage, e.g. to merge across processes."""
+        self._collect(wait=True)
+        with self._lock:
+            return {name: list(values) for name, values in self._samples.items()}
+
+    def merge(self, samples: Dict[str, List[float]]):
+        """Add the raw samples of another timer."""
+        with self._lock:
+            for name, values in samples.items():
+                self._samples[name].extend(values)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._pending.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage count, total_s, mean_ms, p50_ms, p95_ms and max_ms (in recording order)."""
+        result = {}
+        for name, values in self.samples().items():
+            ms = np.asarray(values) * 1000
+            result[name] = {
+                "count": len(values),
+                "total_s": round(float(ms.sum()) / 1000, 4),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "max_ms": round(float(ms.max()), 3),
+            }
+        return result
+
+    def format(self) -> str:
+        """The summary as a text table."""
+        summary = self.summary()
+        if not summary:
+            return ""
+        width = max(len("stage"), *(len(name) for name in summary))
+        lines = [
+            f"{'stage':<{width}}  {'count':>6}  {'total_s':>8}  {'mean_ms':>8}  "
+            f"{'p50_ms':>8}  {'p95_ms':>8}"
+        ]
+        for name, s in summary.items():
+            lines.append(
+                f"{name:<{width}}  {s['count']:>6}  {s['total_s']:>8.2f}  {s['mean_ms']:>8.1f}  "
+                f"{s['p50_ms']:>8.1f}  {s['p95_ms']:>8.1f}"
+            )
+        return "\n".join(lines)
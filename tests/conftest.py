@@ -0,0 +1,7 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+
+import sys
+from pathlib import Path
+
+# Run from the repository root without installing the package
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,82 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Training-only dependencies that the inference import path must not load
+HEAVY_MODULES = ("pytorch_lightning", "roma", "torchvision")
+
+# Cold import time budgets in seconds (median of IMPORT_RUNS runs). A
+# workstation measures ~0.3 ms and ~2.3 s (almost all of it torch). The
+# estimator budget is ~3x that so slower CI machines pass; the package budget
+# only has to stay far below the cost of importing torch or doing real work
+# at import time.
+IMPORT_BUDGETS = {
+    "import sam_3d_body": 0.05,
+    "from sam_3d_body import SAM3DBodyEstimator": 7.0,
+}
+IMPORT_RUNS = 3
+
+
+def _import_profile(statement):
+    """
+    Run `statement` under -X importtime in a fresh interpreter.
+
+    Returns:
+        The top-level names of the imported modules and the cumulative import
+        time in seconds of everything imported from `sam_3d_body` on
+        (interpreter startup imports are excluded).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = set()
+    seconds, started = 0.0, False
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.add(name.strip().split(".")[0])
+        # Nested imports are indented; their time is in their parent's cumulative
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue
+        started = started or name.strip().startswith("sam_3d_body")
+        if started:
+            seconds += int(cumulative) / 1e6
+    return modules, seconds
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import sam_3d_body",
+        "from sam_3d_body import SAM3DBodyEstimator",
+    ],
+)
+def test_inference_import_is_lightweight(statement):
+    loaded = _import_profile(statement)[0] & set(HEAVY_MODULES)
+    assert not loaded, f"{statement!r} imports {sorted(loaded)}"
+
+
+@pytest.mark.parametrize("statement", sorted(IMPORT_BUDGETS))
+def test_cold_import_time_within_budget(statement):
+    seconds = statistics.median(
+        _import_profile(statement)[1] for _ in range(IMPORT_RUNS)
+    )
+    budget = IMPORT_BUDGETS[statement]
+    assert seconds <= budget, f"{statement!r} took {seconds:.3f}s (budget {budget}s)"
+
+
+def test_package_import_loads_nothing():
+    assert "torch" not in _import_profile("import sam_3d_body")[0]
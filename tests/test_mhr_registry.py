@@ -0,0 +1,120 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+
+import pytest
+import torch
+import torch.nn as nn
+
+from sam_3d_body.models.heads.mhr_registry import (
+    faces_numpy,
+    load_mhr_model,
+    relocate_mhr_models,
+    share_mhr_buffers,
+)
+
+
+class _TinyMHR(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.weight = nn.Parameter(torch.arange(6.0).view(2, 3), requires_grad=False)
+
+    def forward(self, x):
+        return x @ self.weight
+
+
+class _Head(nn.Module):
+    """Stand-in for MHRHead: an MHR model plus constant MHR buffers."""
+
+    def __init__(self, mhr_path, hand_pca):
+        super().__init__()
+        self.mhr = load_mhr_model(mhr_path, map_location="cpu")
+        self.faces = nn.Parameter(torch.arange(12).view(4, 3), requires_grad=False)
+        self.keypoint_mapping = nn.Parameter(torch.ones(5, 7), requires_grad=False)
+        self.hand_pose_comps = nn.Parameter(hand_pca, requires_grad=False)
+
+
+class _Model(nn.Module):
+    """Stand-in for SAM3DBody: a body head and a hand head."""
+
+    def __init__(self, mhr_path):
+        super().__init__()
+        self.head_pose = _Head(mhr_path, torch.eye(3))
+        self.head_pose_hand = _Head(mhr_path, 2 * torch.eye(3))
+
+
+@pytest.fixture
+def mhr_path(tmp_path):
+    path = tmp_path / "mhr_model.pt"
+    torch.jit.save(torch.jit.script(_TinyMHR()), str(path))
+    return str(path)
+
+
+def test_mhr_model_shared_across_heads_and_replicas(mhr_path):
+    first, second = _Model(mhr_path), _Model(mhr_path)
+    mhr = first.head_pose.mhr
+    assert first.head_pose_hand.mhr is mhr
+    assert second.head_pose.mhr is mhr
+    assert second.head_pose_hand.mhr is mhr
+
+
+def test_mhr_buffers_shared_across_heads_and_replicas(mhr_path):
+    first, second = _Model(mhr_path), _Model(mhr_path)
+    assert share_mhr_buffers(first) > 0
+    assert share_mhr_buffers(second) > 0
+
+    heads = [first.head_pose, first.head_pose_hand, second.head_pose, second.head_pose_hand]
+    for name in ("faces", "keypoint_mapping"):
+        assert all(getattr(head, name) is getattr(heads[0], name) for head in heads)
+    # Buffers that differ between the heads stay separate
+    assert first.head_pose.hand_pose_comps is not first.head_pose_hand.hand_pose_comps
+    assert first.head_pose_hand.hand_pose_comps is second.head_pose_hand.hand_pose_comps
+
+    faces = faces_numpy(first.head_pose.faces)
+    assert faces_numpy(second.head_pose.faces) is faces
+    assert not faces.flags.writeable
+
+
+def test_relocate_keeps_replicas_on_same_device_shared(mhr_path):
+    first, second = _Model(mhr_path), _Model(mhr_path)
+    for model in (first, second):
+        relocate_mhr_models(model, "cpu")
+        model.to("cpu")
+    assert first.head_pose.mhr is second.head_pose_hand.mhr
+
+
+@pytest.mark.skipif(
+    torch.cuda.device_count() < 2, reason="needs two CUDA devices"
+)
+def test_relocate_gives_each_device_its_own_mhr_model(mhr_path):
+    first, second = _Model(mhr_path), _Model(mhr_path)
+    relocate_mhr_models(first, "cuda:0")
+    first.to("cuda:0")
+    relocate_mhr_models(second, "cuda:1")
+    second.to("cuda:1")
+
+    assert first.head_pose.mhr is not second.head_pose.mhr
+    assert first.head_pose.mhr is first.head_pose_hand.mhr
+    assert next(first.head_pose.mhr.parameters()).device == torch.device("cuda:0")
+    assert next(second.head_pose.mhr.parameters()).device == torch.device("cuda:1")
+
+
+def test_converting_one_replica_leaves_the_other_unchanged(mhr_path):
+    first, second = _Model(mhr_path), _Model(mhr_path)
+    share_mhr_buffers(first)
+    share_mhr_buffers(second)
+    relocate_mhr_models(second, "cpu", torch.float64)
+    second.to(torch.float64)
+
+    for model, dtype in ((first, torch.float32), (second, torch.float64)):
+        for head in (model.head_pose, model.head_pose_hand):
+            assert head.keypoint_mapping.dtype == dtype
+            assert head.hand_pose_comps.dtype == dtype
+            assert next(head.mhr.parameters()).dtype == dtype
+            # Integer buffers are not converted and stay shared
+            assert head.faces is first.head_pose.faces
+    # Replicas converted the same way share the converted assets again
+    third = _Model(mhr_path)
+    share_mhr_buffers(third)
+    relocate_mhr_models(third, dtype=torch.float64)
+    third.to(torch.float64)
+    assert third.head_pose.mhr is second.head_pose.mhr
+    assert third.head_pose.keypoint_mapping is second.head_pose.keypoint_mapping
@@ -0,0 +1,104 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+启动耗时基准 - 在新的Python进程中测量导入和构建模型的时间 (冷启动)
+
+测量项:
+    import              import sam_3d_body
+    import_estimator    from sam_3d_body import SAM3DBodyEstimator
+    dinov3              在meta设备上构建DINOv3骨干网络 (解析模型定义 + 构建，不分配权重)
+    load_model          load_sam_3d_body (指定 --checkpoint_path 时)
+
+使用方法:
+    python -m tools.benchmark_startup
+    python -m tools.benchmark_startup --checkpoint_path ./checkpoints/sam-3d-body-dinov3/model.ckpt
+    SAM3D_DINOV3_REPO=./dinov3 python -m tools.benchmark_startup --repeat 5
+    python -m tools.benchmark_startup --download   # 对比: 允许通过torch.hub从GitHub获取定义
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_SNIPPETS = {
+    "import": "import sam_3d_body",
+    "import_estimator": "from sam_3d_body import SAM3DBodyEstimator",
+    "dinov3": (
+        "from sam_3d_body.models.backbones.dinov3 import build_dinov3_encoder\n"
+        "from sam_3d_body.utils.checkpoint import init_empty_weights\n"
+        "with init_empty_weights():\n"
+        "    build_dinov3_encoder({backbone!r}, pretrained=False)"
+    ),
+    "load_model": (
+        "from sam_3d_body import load_sam_3d_body\n"
+        "load_sam_3d_body({checkpoint_path!r}, device={device!r})"
+    ),
+}
+
+_TIMED = """
+import json, time
+start = time.perf_counter()
+{body}
+print(json.dumps(time.perf_counter() - start))
+"""
+
+
+def time_snippet(body: str, env: dict) -> float:
+    """在新进程中运行代码，返回其用时 (秒)；失败时抛出RuntimeError"""
+    result = subprocess.run(
+        [sys.executable, "-c", _TIMED.format(body=body)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"退出码 {result.returncode}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量导入和构建模型的冷启动耗时")
+    parser.add_argument("--checkpoint_path", default="", type=str, help="同时测量加载该检查点")
+    parser.add_argument("--device", default="cpu", type=str, help="加载模型的设备 (默认: cpu)")
+    parser.add_argument(
+        "--backbone", default="dinov3_vith16plus", type=str,
+        help="DINOv3骨干网络名称 (默认: dinov3_vith16plus)",
+    )
+    parser.add_argument("--repeat", default=3, type=int, help="每项重复次数，取中位数 (默认: 3)")
+    parser.add_argument(
+        "--download", action="store_true", default=False,
+        help="设置 SAM3D_DINOV3_DOWNLOAD=1 (没有本地定义时从GitHub获取)",
+    )
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.download:
+        env["SAM3D_DINOV3_DOWNLOAD"] = "1"
+    names = ["import", "import_estimator", "dinov3"]
+    if args.checkpoint_path:
+        names.append("load_model")
+
+    results = {}
+    for name in names:
+        body = _SNIPPETS[name].format(
+            backbone=args.backbone, checkpoint_path=args.checkpoint_path, device=args.device
+        )
+        try:
+            times = [time_snippet(body, env) for _ in range(max(args.repeat, 1))]
+        except RuntimeError as e:
+            print(f"{name:<18} 失败: {e}")
+            continue
+        results[name] = {
+            "median_s": round(statistics.median(times), 3),
+            "min_s": round(min(times), 3),
+        }
+        print(f"{name:<18} 中位数 {results[name]['median_s']:>7.3f}秒  最小 {results[name]['min_s']:>7.3f}秒")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
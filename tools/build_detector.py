@@ -6,6 +6,8 @@ from pathlib import Path
 import numpy as np
 import torch
 
+from sam_3d_body.data.utils.frame_context import FrameContext
+
 
 class HumanDetector:
     def __init__(self, name="vitdet", device="cuda", **kwargs):
@@ -122,14 +124,20 @@ def run_detectron2_vitdet(
 ):
     import detectron2.data.transforms as T
 
-    height, width = img.shape[:2]
+    # img: BGR image or FrameContext
+    frame = FrameContext.wrap(img, "bgr")
+    height, width = frame.shape[:2]
 
     IMAGE_SIZE = 1024
-    transforms = T.ResizeShortestEdge(short_edge_length=IMAGE_SIZE, max_size=IMAGE_SIZE)
-    img_transformed = transforms(T.AugInput(img)).apply_image(img)
-    img_transformed = torch.as_tensor(
-        img_transformed.astype("float32").transpose(2, 0, 1)
-    )
+
+    def resize():
+        transforms = T.ResizeShortestEdge(short_edge_length=IMAGE_SIZE, max_size=IMAGE_SIZE)
+        return transforms(T.AugInput(frame.bgr)).apply_image(frame.bgr)
+
+    # uint8 CHW view: the model normalizes to float on its own device, so the
+    # float32 copy is made there instead of on the CPU (and uploads 4x less)
+    img_transformed = frame.get(("vitdet", IMAGE_SIZE), resize)
+    img_transformed = torch.as_tensor(img_transformed.transpose(2, 0, 1))
     inputs = {"image": img_transformed, "height": height, "width": width}
 
     with torch.no_grad():
@@ -0,0 +1,74 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+创建SAM3DBodyEstimator - 加载SAM 3D Body模型和可选的检测器、分割器、FOV估计器
+
+process_image.py、process_video.py 和 process_batch.py 共用，
+参数取自各脚本的命令行参数 (属性名相同)，路径为空时读取环境变量:
+    SAM3D_MHR_PATH、SAM3D_DETECTOR_PATH、SAM3D_SEGMENTOR_PATH、SAM3D_FOV_PATH
+"""
+
+import os
+
+import torch
+
+
+def build_estimator(args, device=None):
+    """
+    按命令行参数加载模型并创建估计器
+
+    Args:
+        args: 含 checkpoint_path、mhr_path、detector_name、detector_path、segmentor_name、
+              segmentor_path、fov_name、local_moge_path (可选 fov_path) 的参数对象
+        device: 运行设备 (默认: 有CUDA时为cuda)
+    """
+    from sam_3d_body import SAM3DBodyEstimator, load_sam_3d_body
+
+    # 获取模型路径
+    mhr_path = args.mhr_path or os.environ.get("SAM3D_MHR_PATH", "")
+    detector_path = args.detector_path or os.environ.get("SAM3D_DETECTOR_PATH", "")
+    segmentor_path = args.segmentor_path or os.environ.get("SAM3D_SEGMENTOR_PATH", "")
+    fov_path = getattr(args, "fov_path", "") or os.environ.get("SAM3D_FOV_PATH", "")
+
+    # 初始化设备
+    if device is None:
+        device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
+    print(f"使用设备: {device}")
+
+    # 加载SAM 3D Body模型
+    print("正在加载SAM 3D Body模型...")
+    model, model_cfg = load_sam_3d_body(
+        args.checkpoint_path, device=device, mhr_path=mhr_path
+    )
+
+    # 加载可选模块
+    human_detector, human_segmentor, fov_estimator = None, None, None
+
+    if args.detector_name:
+        from tools.build_detector import HumanDetector
+        print(f"正在加载人体检测器: {args.detector_name}")
+        human_detector = HumanDetector(
+            name=args.detector_name, device=device, path=detector_path
+        )
+
+    if len(segmentor_path):
+        from tools.build_sam import HumanSegmentor
+        print(f"正在加载人体分割器: {args.segmentor_name}")
+        human_segmentor = HumanSegmentor(
+            name=args.segmentor_name, device=device, path=segmentor_path
+        )
+
+    if args.fov_name:
+        from tools.build_fov_estimator import FOVEstimator
+        print(f"正在加载FOV估计器: {args.fov_name}")
+        # 优先使用local_moge_path，否则使用fov_path
+        moge_path = args.local_moge_path if args.local_moge_path else fov_path
+        fov_estimator = FOVEstimator(name=args.fov_name, device=device, path=moge_path)
+
+    # 创建估计器
+    return SAM3DBodyEstimator(
+        sam_3d_body_model=model,
+        model_cfg=model_cfg,
+        human_detector=human_detector,
+        human_segmentor=human_segmentor,
+        fov_estimator=fov_estimator,
+    )
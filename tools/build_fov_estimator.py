@@ -2,6 +2,8 @@
 
 import torch
 
+from sam_3d_body.data.utils.frame_context import FrameContext
+
 
 class FOVEstimator:
     def __init__(self, name="moge2", device="cuda", **kwargs):
@@ -152,11 +154,11 @@ def load_moge(device, path=""):
 
 
 def run_moge(model, input_image, device):
-    # We expect the image to be RGB already
-    H, W, _ = input_image.shape
-    input_image = torch.tensor(
-        input_image / 255, dtype=torch.float32, device=device
-    ).permute(2, 0, 1)
+    # We expect the image to be RGB already (numpy array or FrameContext)
+    frame = FrameContext.wrap(input_image)
+    H, W, _ = frame.shape
+    # Upload uint8 once and scale on the device (no full-frame float64 / float32 CPU copies)
+    input_image = frame.tensor(device).float() / 255
 
     # Infer w/ MoGe2
     moge_data = model.infer(input_image)
@@ -0,0 +1,159 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+运动自适应选帧 - 代替固定的 --frame_skip，运动快时多处理、静止时少处理
+
+每个候选帧缩小为灰度小图后与上一个选中的帧比较，得到运动分数:
+    - diff: 平均像素差 (0~1)，几乎没有开销
+    - flow: Farneback光流的平均位移 (占小图宽度的比例)，对光照变化不敏感
+有人体框时 (最近一个检测完的帧的结果) 只在框内 (外扩一些) 计算，背景运动不影响选帧。
+选帧在解码线程中进行，比检测超前: 人体框落后于当前候选帧大约
+预读队列 (--prefetch) + 检测阶段输入队列 (--stage_queue) 个选中帧，
+人移动很快时框外扩 box_margin 补偿这段滞后。
+
+距上一个选中帧:
+    - 少于 min_gap 帧: 不选
+    - 运动分数 >= threshold: 选中 ("motion")
+    - 达到 max_gap 帧: 无论运动多少都选中 ("max_gap")
+第一个候选帧总是选中 ("first")。
+
+使用方法:
+    sampler = MotionSampler(threshold=0.03, min_gap=1, max_gap=15)
+    reader = PrefetchVideoReader(video_path, frames, sampler=sampler)   # 在解码线程中选帧
+    pipeline = build_estimator_pipeline(estimator, on_detect=lambda i, boxes: sampler.update_box(boxes))
+    for result in pipeline.run(reader):
+        sampler.info(result.item[0])  # {"motion_score": 分数, "sample_reason": 原因}
+"""
+
+import threading
+from typing import Dict, Optional, Sequence
+
+import cv2
+import numpy as np
+
+SAMPLING_METHODS = ("diff", "flow")
+
+# 各方法的默认阈值
+DEFAULT_THRESHOLDS = {"diff": 0.03, "flow": 0.01}
+
+
+class MotionSampler:
+    """按与上一个选中帧之间的运动量选择要处理的帧 (可作为 PrefetchVideoReader 的 sampler)"""
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        min_gap: int = 1,
+        max_gap: int = 15,
+        method: str = "diff",
+        width: int = 160,
+        box_margin: float = 0.2,
+    ):
+        """
+        Args:
+            threshold: 运动分数阈值 (默认: diff为0.03，flow为0.01)
+            min_gap: 两个选中帧之间最少相隔的帧数
+            max_gap: 两个选中帧之间最多相隔的帧数 (运动再小也要处理)
+            method: "diff" (缩小后的帧差) 或 "flow" (光流位移)
+            width: 计算分数用的小图宽度
+            box_margin: 人体框向外扩展的比例
+        """
+        if method not in SAMPLING_METHODS:
+            raise ValueError(f"不支持的选帧方法: {method} (可选: {', '.join(SAMPLING_METHODS)})")
+        self.method = method
+        self.threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        self.min_gap = max(min_gap, 1)
+        self.max_gap = max(max_gap, self.min_gap)
+        self.width = width
+        self.box_margin = box_margin
+
+        self._lock = threading.Lock()
+        self._box = None  # 原图坐标的人体框 [x1, y1, x2, y2]
+        self._reference = None  # 上一个选中帧的小图
+        self._last_selected = None
+        # 帧号 -> {"motion_score", "sample_reason"}，解码线程写入、主线程读取，用_lock保护
+        self.selected: Dict[int, Dict] = {}
+        self.candidates = 0
+
+    def update_box(self, boxes: Optional[Sequence]):
+        """
+        更新用于计算运动分数的人体框 (多个框时取并集，None表示整帧)
+
+        可以在任意线程中调用 (例如流水线的检测阶段)，之后选帧的候选帧使用新的框。
+        """
+        box = None
+        if boxes is not None and len(boxes):
+            boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+            box = np.concatenate([boxes[:, :2].min(axis=0), boxes[:, 2:].max(axis=0)])
+        with self._lock:
+            self._box = box
+
+    def _small(self, frame: np.ndarray) -> np.ndarray:
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        height = max(1, round(gray.shape[0] * self.width / gray.shape[1]))
+        return cv2.resize(gray, (self.width, height), interpolation=cv2.INTER_AREA)
+
+    def _region(self, scale: float, shape) -> tuple:
+        """人体框在小图中的范围 (没有框或框太小时为整张图)"""
+        with self._lock:
+            box = self._box
+        height, width = shape
+        if box is None:
+            return slice(None), slice(None)
+        x1, y1, x2, y2 = box * scale
+        mx, my = (x2 - x1) * self.box_margin, (y2 - y1) * self.box_margin
+        x1, x2 = int(max(x1 - mx, 0)), int(min(x2 + mx, width))
+        y1, y2 = int(max(y1 - my, 0)), int(min(y2 + my, height))
+        if x2 - x1 < 8 or y2 - y1 < 8:
+            return slice(None), slice(None)
+        return slice(y1, y2), slice(x1, x2)
+
+    def score(self, small: np.ndarray, scale: float) -> float:
+        """当前小图相对于上一个选中帧的运动分数"""
+        rows, cols = self._region(scale, small.shape)
+        if self.method == "flow":
+            flow = cv2.calcOpticalFlowFarneback(
+                self._reference, small, None, 0.5, 3, 15, 3, 5, 1.2, 0
+            )
+            magnitude = np.linalg.norm(flow[rows, cols], axis=-1)
+            return float(magnitude.mean() / small.shape[1])
+        diff = cv2.absdiff(small[rows, cols], self._reference[rows, cols])
+        return float(diff.mean() / 255.0)
+
+    def __call__(self, frame_idx: int, frame: np.ndarray) -> bool:
+        """是否处理这一帧 (frame为BGR或灰度原图)，按帧号升序调用"""
+        self.candidates += 1
+        gap = None if self._last_selected is None else frame_idx - self._last_selected
+        if gap is not None and gap < self.min_gap:
+            return False
+
+        small = self._small(frame)
+        if gap is None:
+            score, reason = 0.0, "first"
+        else:
+            score = self.score(small, self.width / frame.shape[1])
+            if score >= self.threshold:
+                reason = "motion"
+            elif gap >= self.max_gap:
+                reason = "max_gap"
+            else:
+                return False
+
+        self._reference = small
+        self._last_selected = frame_idx
+        with self._lock:
+            self.selected[frame_idx] = {"motion_score": round(score, 5), "sample_reason": reason}
+        return True
+
+    def info(self, frame_idx: int) -> Dict:
+        """选中帧的运动分数和选中原因 (记入处理清单和video_info.json)"""
+        with self._lock:
+            return self.selected.get(frame_idx, {})
+
+    def config(self) -> Dict:
+        """选帧参数 (记入video_info.json)"""
+        return {
+            "method": self.method,
+            "threshold": self.threshold,
+            "min_gap": self.min_gap,
+            "max_gap": self.max_gap,
+        }
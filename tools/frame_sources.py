@@ -0,0 +1,354 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+帧来源 - 视频文件、图像序列目录和tar分片使用同一个读取接口
+
+支持的输入:
+    - 视频文件 (.mp4 等): PrefetchVideoReader 在后台线程中顺序解码 (见 tools/video_reader.py)
+    - 图像序列目录: 目录中的 JPEG/PNG 等图片按文件名自然排序 (frame_2 在 frame_10 之前)
+    - webdataset格式的tar分片: 单个 .tar 文件，或只包含 .tar 文件的目录 (按文件名排序)。
+      每个样本的图片成员 (<key>.jpg / <key>.png 等) 为一帧，其余成员 (metadata.json、
+      annotation.pyd 等) 忽略，与 data/scripts/create_webdataset.py 生成的格式一致
+
+帧号为帧在序列中的位置 (从0开始)。图像序列和tar分片没有帧率，使用调用方指定的fps。
+
+视频只能顺序解码，图片可以并行解码: ImageFrameReader 用后台线程按顺序读取文件 (tar成员
+只能顺序读取)，JPEG/PNG解码交给线程池 (cv2.imdecode 解码时释放GIL)，最多预读 queue_size 帧，
+输出仍按帧号顺序。
+
+使用方法:
+    fps, total_frames, width, height = probe_frames(path)
+    with open_frames(path, frames_to_process, rgb=False, decode_workers=4) as reader:
+        for frame_idx, frame_bgr in reader:
+            outputs = estimator.process_one_image(frame_bgr)
+    print(reader.missing)  # 无法读取的帧
+"""
+
+import queue
+import re
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from tools.video_reader import PrefetchVideoReader, probe_video
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+TAR_EXTENSIONS = {".tar"}
+DEFAULT_FPS = 30.0
+
+_END = object()
+
+
+def _natural_key(name: str):
+    """自然排序: 文件名中的数字按数值比较"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def list_image_files(folder: Union[str, Path]) -> List[Path]:
+    """目录中的图片 (按文件名自然排序)"""
+    files = [
+        p for p in Path(folder).iterdir()
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+    ]
+    return sorted(files, key=lambda p: _natural_key(p.name))
+
+
+def list_tar_shards(path: Union[str, Path]) -> List[Path]:
+    """单个tar文件，或目录中的所有tar分片 (按文件名自然排序)"""
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    shards = [p for p in path.iterdir() if p.is_file() and p.suffix.lower() in TAR_EXTENSIONS]
+    return sorted(shards, key=lambda p: _natural_key(p.name))
+
+
+def frame_source_type(path: Union[str, Path]) -> str:
+    """输入类型: "video"、"images" (图像序列目录) 或 "tar" (tar分片)"""
+    path = Path(path)
+    if path.is_dir():
+        if list_image_files(path):
+            return "images"
+        if list_tar_shards(path):
+            return "tar"
+        raise ValueError(f"目录中没有图片或tar分片: {path}")
+    if path.suffix.lower() in TAR_EXTENSIONS:
+        return "tar"
+    return "video"
+
+
+def _sample_image(member: tarfile.TarInfo) -> Optional[str]:
+    """webdataset样本中图片成员的样本键 (不是图片时为None)"""
+    if not member.isfile():
+        return None
+    folder, _, basename = member.name.rpartition("/")
+    # webdataset约定: 文件名第一个"."之前为样本键，之后为字段名 (jpg、metadata.json 等)
+    key, _, field = basename.partition(".")
+    if f".{field.lower()}" not in IMAGE_EXTENSIONS:
+        return None
+    return f"{folder}/{key}" if folder else key
+
+
+def index_tar_shards(shards: Iterable[Union[str, Path]]) -> List[Tuple[Path, tarfile.TarInfo, str]]:
+    """所有分片中每个样本的图片成员: [(分片路径, 成员, 样本键)]，按分片和成员顺序"""
+    entries = []
+    for shard in shards:
+        seen = set()
+        with tarfile.open(shard, "r:") as tar:
+            for member in tar.getmembers():
+                key = _sample_image(member)
+                # 同一样本有多张图片时只取第一张
+                if key is not None and key not in seen:
+                    seen.add(key)
+                    entries.append((Path(shard), member, key))
+    return entries
+
+
+def _decode_image(data: np.ndarray) -> Optional[np.ndarray]:
+    """解码JPEG/PNG等图片数据为BGR图像 (失败时为None)"""
+    if data.size == 0:
+        return None
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+
+class ImageFrameReader:
+    """
+    图像帧读取器的基类 (可迭代，产生 (帧号, RGB图像))，接口与 PrefetchVideoReader 相同
+
+    子类实现 _payloads(): 在读取线程中按帧号顺序产生 (帧号, 数据)，
+    以及 _load(数据) -> BGR图像: 在解码线程池中运行。
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        frame_indices: Optional[Iterable[int]] = None,
+        queue_size: int = 8,
+        rgb: bool = True,
+        sampler: Optional[Callable[[int, np.ndarray], bool]] = None,
+        timer=None,
+        decode_workers: int = 4,
+        fps: float = DEFAULT_FPS,
+    ):
+        """
+        Args:
+            names: 每一帧的名称 (文件名或样本键)
+            frame_indices: 要读取的帧号 (默认: 全部帧)，按升序读取
+            queue_size: 预读队列长度 (至少为解码线程数)
+            rgb: 转换为RGB (False时为OpenCV的BGR)
+            sampler: 可选的选帧函数 sampler(帧号, BGR图像) -> 是否输出该帧
+            timer: 可选的 sam_3d_body.utils.timing.StageTimer，记录每帧的读取和解码时间 ("decode")
+            decode_workers: 解码线程数
+            fps: 帧率 (图像序列没有帧率)
+        """
+        self.names = names
+        self.fps = fps
+        self.total_frames = len(names)
+        if frame_indices is None:
+            frame_indices = range(self.total_frames)
+        self.frame_indices = sorted(set(int(i) for i in frame_indices))
+        self.rgb = rgb
+        self.sampler = sampler
+        self.timer = timer
+        self.decode_workers = max(decode_workers, 1)
+        self.missing: List[int] = []
+        self.width, self.height = self._probe_size()
+
+        self._queue = queue.Queue(maxsize=max(queue_size, self.decode_workers, 1))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _payloads(self, frame_indices: List[int]) -> Iterator[Tuple[int, object]]:
+        raise NotImplementedError
+
+    def _load(self, payload) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def _probe_size(self) -> Tuple[int, int]:
+        """由第一张可以解码的图片得到 (宽, 高)"""
+        for _, payload in self._payloads(list(range(self.total_frames))):
+            image = self._load(payload)
+            if image is not None:
+                return image.shape[1], image.shape[0]
+        return 0, 0
+
+    def _put(self, item) -> bool:
+        """放入队列，队列满时等待 (关闭时返回False)"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self, payload) -> Optional[np.ndarray]:
+        start = time.perf_counter()
+        try:
+            image = self._load(payload)
+        except (OSError, cv2.error):
+            image = None
+        if self.timer is not None:
+            self.timer.add("decode", time.perf_counter() - start)
+        return image
+
+    def _read(self):
+        # 读取线程按顺序提交解码任务，队列中保存尚未取走的任务 (即预读的帧)
+        pool = ThreadPoolExecutor(self.decode_workers, thread_name_prefix="frame_decode")
+        finished = False
+        try:
+            for frame_idx, payload in self._payloads(self.frame_indices):
+                if self._stop.is_set():
+                    return
+                if not self._put((frame_idx, pool.submit(self._decode, payload))):
+                    return
+            finished = True
+        except BaseException as e:
+            self._put(e)
+            return
+        finally:
+            # 正常结束时队列中的任务继续解码；关闭或出错时取消尚未开始的任务
+            pool.shutdown(wait=False, cancel_futures=not finished)
+        self._put(_END)
+
+    def start(self) -> "ImageFrameReader":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._read, name="frame_reader", daemon=True)
+            self._thread.start()
+        return self
+
+    def __iter__(self):
+        self.start()
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            frame_idx, future = item
+            frame = future.result()
+            if frame is None:
+                self.missing.append(frame_idx)
+                continue
+            if self.sampler is not None and not self.sampler(frame_idx, frame):
+                continue
+            if self.rgb:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            yield frame_idx, frame
+
+    def __len__(self) -> int:
+        """候选帧数 (使用sampler时实际输出的帧更少)"""
+        return len(self.frame_indices)
+
+    @property
+    def buffered(self) -> int:
+        """已提交解码、等待处理的帧数"""
+        return self._queue.qsize()
+
+    def close(self):
+        """停止读取线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ImageFolderReader(ImageFrameReader):
+    """图像序列目录 (文件按名称自然排序，读取和解码都在线程池中进行)"""
+
+    def __init__(self, folder: Union[str, Path], frame_indices=None, **kwargs):
+        self.files = list_image_files(folder)
+        super().__init__([p.name for p in self.files], frame_indices, **kwargs)
+
+    def _payloads(self, frame_indices):
+        for frame_idx in frame_indices:
+            if frame_idx >= len(self.files):
+                self.missing.append(frame_idx)
+                continue
+            yield frame_idx, self.files[frame_idx]
+
+    def _load(self, path):
+        # np.fromfile + imdecode 支持非ASCII路径 (cv2.imread 在Windows上不支持)
+        return _decode_image(np.fromfile(str(path), dtype=np.uint8))
+
+
+class TarShardReader(ImageFrameReader):
+    """webdataset格式的tar分片 (成员在读取线程中顺序读出，解码在线程池中进行)"""
+
+    def __init__(self, path: Union[str, Path], frame_indices=None, **kwargs):
+        self.shards = list_tar_shards(path)
+        self.entries = index_tar_shards(self.shards)
+        super().__init__([key for _, _, key in self.entries], frame_indices, **kwargs)
+
+    def _payloads(self, frame_indices):
+        tars = {}
+        try:
+            for frame_idx in frame_indices:
+                if frame_idx >= len(self.entries):
+                    self.missing.append(frame_idx)
+                    continue
+                shard, member, _ = self.entries[frame_idx]
+                if shard not in tars:
+                    # 帧号升序，前面的分片不会再用到
+                    for tar in tars.values():
+                        tar.close()
+                    tars = {shard: tarfile.open(shard, "r:")}
+                data = tars[shard].extractfile(member).read()
+                yield frame_idx, np.frombuffer(data, dtype=np.uint8)
+        finally:
+            for tar in tars.values():
+                tar.close()
+
+    def _load(self, data):
+        return _decode_image(data)
+
+
+def open_frames(
+    path: Union[str, Path],
+    frame_indices: Optional[Iterable[int]] = None,
+    queue_size: int = 8,
+    rgb: bool = True,
+    sampler: Optional[Callable[[int, np.ndarray], bool]] = None,
+    timer=None,
+    decode_workers: int = 4,
+    fps: float = DEFAULT_FPS,
+):
+    """
+    按输入类型打开帧读取器 (可迭代，产生 (帧号, 图像))
+
+    参数含义见 ImageFrameReader；视频只能顺序解码，不使用 decode_workers，
+    帧率取自视频文件而不是 fps。
+    """
+    source = frame_source_type(path)
+    kwargs = dict(queue_size=queue_size, rgb=rgb, sampler=sampler, timer=timer)
+    if source == "video":
+        return PrefetchVideoReader(path, frame_indices, **kwargs)
+    reader_cls = ImageFolderReader if source == "images" else TarShardReader
+    return reader_cls(path, frame_indices, decode_workers=decode_workers, fps=fps, **kwargs)
+
+
+def probe_frames(path: Union[str, Path], fps: float = DEFAULT_FPS):
+    """输入的 (fps, 总帧数, 宽, 高)；图像序列和tar分片的帧率为 fps"""
+    if frame_source_type(path) == "video":
+        return probe_video(path)
+    reader = open_frames(path, [], fps=fps)
+    return reader.fps, reader.total_frames, reader.width, reader.height
+
+
+def list_frame_names(path: Union[str, Path]) -> Optional[List[str]]:
+    """每一帧的文件名 (图像序列) 或样本键 (tar分片)；视频为None"""
+    source = frame_source_type(path)
+    if source == "images":
+        return [p.name for p in list_image_files(path)]
+    if source == "tar":
+        return [key for _, _, key in index_tar_shards(list_tar_shards(path))]
+    return None
@@ -0,0 +1,347 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+动画glTF导出 - 将整段视频的网格保存为一个二进制glTF (.glb) 文件
+
+所有帧共用一个面片索引缓冲区，每帧的顶点位置保存在同一个二进制块中，
+时间轴由视频帧率和帧号决定，可直接导入Blender、Maya或在three.js中播放。
+
+两种动画方式:
+    - nodes (默认): 每帧一个网格节点 (顶点缓冲区独立、索引共享)，按帧切换节点缩放 (0/1)
+      实现显示/隐藏。大小与帧数成正比，适合导入DCC软件
+    - morph: 每人每段 (clip_frames 帧) 一个网格，段内每帧一个变形目标 (与段内第一帧的顶点差)，
+      按帧切换变形权重 (STEP插值)，只在本段时间内显示。权重数据为 帧数 x clip_frames，
+      分段避免整段一个网格时变形目标数和权重随帧数平方增长，适合three.js等播放器
+
+同一个人在相邻帧之间按检测框IoU配对 (tools.interpolate.match_people)，
+检测顺序变化时身份不会互换。
+
+坐标系: 顶点 (加相机平移后) 从相机坐标系 (y向下、z向前) 转换为glTF的y向上坐标系 (y、z取反)。
+某一帧中不存在的人通过缩放为0隐藏。
+
+使用方法:
+    export_glb("output/video_name", "output/video_name/video_name.glb")
+"""
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+
+from .interpolate import match_people
+from .mesh_export import MeshSource, iter_frame_vertices
+
+GLB_SUFFIX = ".glb"
+
+_GLB_MAGIC = 0x46546C67  # "glTF"
+_GLB_VERSION = 2
+_CHUNK_JSON = 0x4E4F534A  # "JSON"
+_CHUNK_BIN = 0x004E4942  # "BIN\0"
+
+_FLOAT = 5126
+_UINT32 = 5125
+_ARRAY_BUFFER = 34962
+_ELEMENT_ARRAY_BUFFER = 34963
+
+# 相机坐标系 -> glTF (y向上，-z向前)
+_AXIS_FLIP = np.array([1.0, -1.0, -1.0], dtype=np.float32)
+
+
+class _BinWriter:
+    """将数据顺序写入二进制块 (临时文件)，同时记录glTF的bufferView和accessor"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+        self.buffer_views = []
+        self.accessors = []
+
+    def add(
+        self,
+        array: np.ndarray,
+        accessor_type: str,
+        component_type: int = _FLOAT,
+        target: Optional[int] = None,
+        min_max: bool = False,
+    ) -> int:
+        """写入一个数组，返回accessor索引"""
+        data = array.tobytes()
+        view = {"buffer": 0, "byteOffset": self.offset, "byteLength": len(data)}
+        if target is not None:
+            view["target"] = target
+        self.f.write(data)
+        # 每个bufferView按4字节对齐
+        padding = -len(data) % 4
+        self.f.write(b"\0" * padding)
+        self.offset += len(data) + padding
+        self.buffer_views.append(view)
+
+        accessor = {
+            "bufferView": len(self.buffer_views) - 1,
+            "componentType": component_type,
+            "count": len(array),
+            "type": accessor_type,
+        }
+        if min_max:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+
+def export_glb(
+    input_path: Union[str, Path, MeshSource],
+    output_path: Union[str, Path],
+    mode: str = "nodes",
+    frame_indices: Optional[Iterable[int]] = None,
+    fps: Optional[float] = None,
+    with_translation: bool = True,
+    reconstructor=None,
+    progress=None,
+    clip_frames: int = 300,
+    min_iou: float = 0.3,
+) -> Dict:
+    """
+    将一段视频的所有帧导出为一个带动画的GLB文件
+
+    Args:
+        input_path: 视频输出目录、序列文件或已打开的MeshSource
+        output_path: 输出的.glb文件
+        mode: "nodes" (每帧一个网格节点) 或 "morph" (分段的变形目标)
+        frame_indices: 要导出的帧号 (默认: 全部)
+        fps: 时间轴帧率 (默认: video_info.json中的fps，没有时为30)
+        with_translation: 加上相机平移 (保留人在画面中的位置和移动)
+        reconstructor: tools.mhr_reconstruct.MeshReconstructor，仅参数模式的输入需要
+        progress: 可选的回调 progress(完成帧数)
+        clip_frames: morph方式每段的帧数 (每段每人一个网格)
+        min_iou: 相邻帧中两个检测框被认为是同一个人的最小IoU
+
+    Returns:
+        {"frames": 帧数, "people": 跟踪到的人数, "output_path": 输出文件}
+    """
+    if mode not in ("morph", "nodes"):
+        raise ValueError(f"不支持的动画方式: {mode} (可选: nodes, morph)")
+    clip_frames = max(int(clip_frames), 1)
+    source = input_path if isinstance(input_path, MeshSource) else MeshSource(input_path)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    available = set(source.frame_indices)
+    if frame_indices is None:
+        frame_indices = source.frame_indices
+    frame_indices = [i for i in frame_indices if i in available]
+    if not frame_indices:
+        raise ValueError(f"没有可导出的帧: {source.path}")
+
+    faces = source.faces
+    if faces is None and reconstructor is not None:
+        faces = reconstructor.faces
+    if faces is None:
+        raise ValueError(f"输入中没有面片拓扑 (faces): {source.path}")
+
+    fps = fps or source.fps or 30.0
+    first_frame = frame_indices[0]
+    times = np.array([(i - first_frame) / fps for i in frame_indices], dtype=np.float32)
+    num_frames = len(frame_indices)
+
+    with tempfile.TemporaryFile(dir=output_path.parent) as bin_file:
+        writer = _BinWriter(bin_file)
+        indices = writer.add(
+            np.ascontiguousarray(faces, dtype=np.uint32).reshape(-1),
+            "SCALAR",
+            _UINT32,
+            _ELEMENT_ARRAY_BUFFER,
+        )
+
+        # 按检测框IoU跟踪的每个人: 出现的帧、每帧的顶点accessor，morph方式下按段分组
+        tracks = []
+        frames = iter_frame_vertices(source, frame_indices, reconstructor)
+        for t, (frame_idx, vertices) in enumerate(frames):
+            translations = source.frame_translations(frame_idx) if with_translation else []
+            boxes = source.frame_boxes(frame_idx)
+            assigned = dict(
+                (j, i) for i, j in match_people(
+                    [{"bbox": track["box"]} for track in tracks],
+                    [{"bbox": box} for box in boxes],
+                    min_iou,
+                )
+            )
+            for person, verts in enumerate(vertices):
+                verts = np.asarray(verts, dtype=np.float32)
+                if with_translation and translations[person] is not None:
+                    verts = verts + np.asarray(translations[person], dtype=np.float32)
+                verts = np.ascontiguousarray(verts * _AXIS_FLIP)
+
+                if person not in assigned:
+                    assigned[person] = len(tracks)
+                    tracks.append({"frames": [], "accessors": [], "clips": {}})
+                track = tracks[assigned[person]]
+                track["box"] = boxes[person]
+                if mode == "morph":
+                    clip = track["clips"].setdefault(
+                        t // clip_frames, {"base": verts, "frames": [], "accessors": []}
+                    )
+                    # 变形目标保存与段内基准的差值
+                    clip["accessors"].append(
+                        writer.add(verts - clip["base"], "VEC3", target=_ARRAY_BUFFER, min_max=True)
+                    )
+                    clip["frames"].append(t)
+                else:
+                    track["accessors"].append(
+                        writer.add(verts, "VEC3", target=_ARRAY_BUFFER, min_max=True)
+                    )
+                    track["frames"].append(t)
+            if progress:
+                progress(t + 1)
+
+        nodes, meshes, channels, samplers = [], [], [], []
+        clip_times = {}  # 段号 -> (权重的时间accessor, 可见性关键帧, 其时间accessor)
+
+        def add_sampler(input_accessor, values, accessor_type):
+            samplers.append({
+                "input": input_accessor,
+                "output": writer.add(values, accessor_type),
+                "interpolation": "STEP",
+            })
+            return len(samplers) - 1
+
+        def add_visibility(node, visible_frames, keys, keys_accessor):
+            """缩放动画: 关键帧keys中出现的帧为1，其余为0"""
+            scale = np.zeros((len(keys), 3), dtype=np.float32)
+            scale[np.isin(keys, visible_frames)] = 1.0
+            nodes[node]["scale"] = scale[0].tolist()
+            channels.append({
+                "sampler": add_sampler(keys_accessor, scale, "VEC3"),
+                "target": {"node": node, "path": "scale"},
+            })
+
+        def get_clip_times(clip):
+            if clip not in clip_times:
+                first = clip * clip_frames
+                last = min(first + clip_frames, num_frames)
+                # 可见性: 开始时、本段每一帧和下一段第一帧 (之后保持隐藏)
+                keys = np.array(
+                    sorted({0} | set(range(first, min(last + 1, num_frames)))), dtype=np.int64
+                )
+                clip_times[clip] = (
+                    writer.add(times[first:last], "SCALAR", min_max=True),
+                    keys,
+                    writer.add(times[keys], "SCALAR", min_max=True),
+                )
+            return clip_times[clip]
+
+        root_children = []
+        for person, track in enumerate(tracks):
+            children = []
+            if mode == "morph":
+                for clip_idx, clip in sorted(track["clips"].items()):
+                    base = writer.add(clip["base"], "VEC3", target=_ARRAY_BUFFER, min_max=True)
+                    num_targets = len(clip["accessors"])
+                    name = f"person{person}_clip{clip_idx}"
+                    meshes.append({
+                        "name": name,
+                        "primitives": [{
+                            "attributes": {"POSITION": base},
+                            "indices": indices,
+                            "material": 0,
+                            "targets": [{"POSITION": a} for a in clip["accessors"]],
+                        }],
+                        "weights": [0.0] * num_targets,
+                    })
+                    nodes.append({"name": name, "mesh": len(meshes) - 1})
+                    node = len(nodes) - 1
+                    children.append(node)
+                    # 段内第k个变形目标在其所在帧权重为1 (不存在的帧保持上一次的形状，并被缩放隐藏)
+                    weights_accessor, keys, keys_accessor = get_clip_times(clip_idx)
+                    first = clip_idx * clip_frames
+                    clip_len = min(clip_frames, num_frames - first)
+                    weights = np.zeros((clip_len, num_targets), dtype=np.float32)
+                    target_of_frame = (
+                        np.searchsorted(np.asarray(clip["frames"]) - first, np.arange(clip_len), "right")
+                        - 1
+                    )
+                    has_target = target_of_frame >= 0
+                    weights[np.nonzero(has_target)[0], target_of_frame[has_target]] = 1.0
+                    channels.append({
+                        "sampler": add_sampler(weights_accessor, weights.reshape(-1), "SCALAR"),
+                        "target": {"node": node, "path": "weights"},
+                    })
+                    if len(keys) == num_frames and len(clip["frames"]) == num_frames:
+                        continue  # 只有一段且每帧都出现
+                    add_visibility(node, clip["frames"], keys, keys_accessor)
+            else:
+                for t, accessor in zip(track["frames"], track["accessors"]):
+                    meshes.append({
+                        "name": f"person{person}_frame{frame_indices[t]}",
+                        "primitives": [{
+                            "attributes": {"POSITION": accessor},
+                            "indices": indices,
+                            "material": 0,
+                        }],
+                    })
+                    nodes.append({
+                        "name": f"person{person}_frame{frame_indices[t]}",
+                        "mesh": len(meshes) - 1,
+                    })
+                    node = len(nodes) - 1
+                    children.append(node)
+                    if num_frames == 1:
+                        continue
+                    # 只在出现的这一帧显示: 关键帧 [开始, 本帧, 下一帧]
+                    keys = sorted({0, t, min(t + 1, num_frames - 1)})
+                    scale = np.array(
+                        [[1.0] * 3 if key == t else [0.0] * 3 for key in keys], dtype=np.float32
+                    )
+                    nodes[node]["scale"] = scale[0].tolist()
+                    channels.append({
+                        "sampler": add_sampler(
+                            writer.add(times[keys], "SCALAR", min_max=True), scale, "VEC3"
+                        ),
+                        "target": {"node": node, "path": "scale"},
+                    })
+            nodes.append({"name": f"person{person}", "children": children})
+            root_children.append(len(nodes) - 1)
+
+        nodes.append({"name": source.name, "children": root_children})
+        gltf = {
+            "asset": {"version": "2.0", "generator": "sam_3d_body tools/gltf_export.py"},
+            "scene": 0,
+            "scenes": [{"nodes": [len(nodes) - 1]}],
+            "nodes": nodes,
+            "meshes": meshes,
+            "materials": [{
+                "name": "body",
+                "pbrMetallicRoughness": {
+                    "baseColorFactor": [0.31, 0.76, 0.97, 1.0],
+                    "metallicFactor": 0.0,
+                    "roughnessFactor": 0.8,
+                },
+                "doubleSided": True,
+            }],
+            "accessors": writer.accessors,
+            "bufferViews": writer.buffer_views,
+            "buffers": [{"byteLength": writer.offset}],
+            "extras": {"fps": fps, "frame_indices": frame_indices},
+        }
+        if channels:
+            gltf["animations"] = [{"name": source.name, "channels": channels, "samplers": samplers}]
+
+        json_chunk = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+        json_chunk += b" " * (-len(json_chunk) % 4)
+        total = 12 + 8 + len(json_chunk) + 8 + writer.offset
+
+        bin_file.seek(0)
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(struct.pack("<III", _GLB_MAGIC, _GLB_VERSION, total))
+            f.write(struct.pack("<II", len(json_chunk), _CHUNK_JSON))
+            f.write(json_chunk)
+            f.write(struct.pack("<II", writer.offset, _CHUNK_BIN))
+            shutil.copyfileobj(bin_file, f, 16 << 20)
+        os.replace(tmp_path, output_path)
+
+    return {"frames": num_frames, "people": len(tracks), "output_path": str(output_path)}
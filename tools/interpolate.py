@@ -0,0 +1,388 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+MHR参数插值 - 由跳帧 (--frame_skip / --adaptive) 处理的关键帧补全跳过的帧，得到全帧率的动作
+
+相邻两个关键帧中的人按检测框IoU配对 (同一个人)，对配对的每个人在中间帧插值:
+    - 全局旋转 (欧拉角xyz): 转为四元数后球面插值 (slerp)
+    - 关节参数 (body_pose、hand、expression): 线性插值
+    - 体型 (shape、scale)、相机平移、焦距、检测框: 线性插值
+中间帧的网格用MHR头 (mhr_forward) 批量重建；仅参数模式的输出不重建，由查看器按需重建。
+
+插值帧写回原输出 (帧文件为 frame_XXXXXX.mhr.json / .mhr.bin，序列文件按帧顺序重写)，
+video_info.json 中对应记录带 "interpolated": true。再次运行时插值帧被重新生成，
+关键帧不受影响。
+
+使用方法:
+    reconstructor = MeshReconstructor.from_checkpoint(checkpoint_path, mhr_path)
+    interpolate_video("output/video_name", reconstructor, max_gap=30)
+"""
+
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .mesh_export import MeshSource
+from .mhr_codec import CompressedSequence
+from .mhr_io import (
+    JSON_PRECISION,
+    MESH_FIELDS,
+    MHR_JSON_SUFFIX,
+    MHRFile,
+    atomic_write,
+    dump_json,
+    is_binary_mhr,
+    save_mhr_binary,
+)
+from .mhr_sequence import PARTIAL_SUFFIX, MHRSequence, MHRSequenceWriter, sequence_frame_file
+
+# 线性插值的MHR参数 (全局旋转单独做球面插值)
+_LINEAR_PARAMS = ("body_pose", "hand", "expression", "shape", "scale")
+
+# MHR数据中人的字段 -> estimator输出的键 (写入序列文件时使用)
+_OUTPUT_KEYS = (
+    (("bbox",), "bbox"),
+    (("focal_length",), "focal_length"),
+    (("camera", "translation"), "pred_cam_t"),
+    (("mesh", "vertices"), "pred_vertices"),
+    (("mesh", "keypoints_3d"), "pred_keypoints_3d"),
+    (("mesh", "keypoints_2d"), "pred_keypoints_2d"),
+    (("params", "global_rot"), "global_rot"),
+    (("params", "body_pose"), "body_pose_params"),
+    (("params", "shape"), "shape_params"),
+    (("params", "scale"), "scale_params"),
+    (("params", "hand"), "hand_pose_params"),
+    (("params", "expression"), "expr_params"),
+)
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """两组检测框 [x1, y1, x2, y2] 两两之间的IoU，形状为 [Na, Nb]"""
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(1, -1, 4)
+    w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = w * h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def match_people(people_a: List[Dict], people_b: List[Dict], min_iou: float = 0.3) -> List[Tuple[int, int]]:
+    """按检测框IoU从大到小贪心配对两帧中的人，返回 [(a中的序号, b中的序号)]"""
+    if not people_a or not people_b:
+        return []
+    if any(p.get("bbox") is None for p in people_a + people_b):
+        # 没有检测框时只有单人才能配对
+        return [(0, 0)] if len(people_a) == len(people_b) == 1 else []
+    iou = box_iou([p["bbox"] for p in people_a], [p["bbox"] for p in people_b])
+    pairs = []
+    for flat in np.argsort(-iou, axis=None):
+        i, j = np.unravel_index(flat, iou.shape)
+        if iou[i, j] < min_iou:
+            break
+        if all(i != a and j != b for a, b in pairs):
+            pairs.append((int(i), int(j)))
+    return sorted(pairs)
+
+
+def _slerp(q0: np.ndarray, q1: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """逐对的四元数球面插值 (沿最短弧)，q0、q1为 [N, 4]，t为 [N]"""
+    dot = np.sum(q0 * q1, axis=-1)
+    q1 = np.where(dot[:, None] < 0, -q1, q1)
+    dot = np.abs(dot).clip(max=1.0)
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    # 夹角很小时退化为线性插值
+    small = sin_theta < 1e-6
+    safe = np.where(small, 1.0, sin_theta)
+    w0 = np.where(small, 1 - t, np.sin((1 - t) * theta) / safe)
+    w1 = np.where(small, t, np.sin(t * theta) / safe)
+    q = w0[:, None] * q0 + w1[:, None] * q1
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def slerp_euler(rot_a: np.ndarray, rot_b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """欧拉角 (xyz，与mhr_forward相同的约定) 的球面插值，rot为 [N, 3]，t为 [N]"""
+    import roma
+    import torch
+
+    q0 = roma.euler_to_unitquat("xyz", torch.as_tensor(rot_a, dtype=torch.float64)).numpy()
+    q1 = roma.euler_to_unitquat("xyz", torch.as_tensor(rot_b, dtype=torch.float64)).numpy()
+    q = _slerp(q0, q1, np.asarray(t, dtype=np.float64))
+    return roma.unitquat_to_euler("xyz", torch.as_tensor(q)).numpy().astype(np.float32)
+
+
+def _get(person: Dict, path: Tuple[str, ...]):
+    value = person
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def interpolate_people(
+    pairs: List[Tuple[Dict, Dict]],
+    t: np.ndarray,
+) -> List[Dict]:
+    """
+    批量插值多对 (关键帧a中的人, 关键帧b中的人)，t为每对的插值位置 (0为a，1为b)
+
+    Returns:
+        插值得到的人 (MHR数据中的人的结构，mesh字段为None，需要时重建)
+    """
+    t = np.asarray(t, dtype=np.float32)
+    people_a = [a for a, _ in pairs]
+    people_b = [b for _, b in pairs]
+
+    def stack(people, path):
+        values = [_get(p, path) for p in people]
+        if any(v is None for v in values):
+            return None
+        return np.stack([np.asarray(v, dtype=np.float32) for v in values])
+
+    def lerp(path):
+        a, b = stack(people_a, path), stack(people_b, path)
+        if a is None or b is None:
+            return None
+        w = t.reshape((-1,) + (1,) * (a.ndim - 1))
+        return a + (b - a) * w
+
+    rot_a = stack(people_a, ("params", "global_rot"))
+    rot_b = stack(people_b, ("params", "global_rot"))
+    global_rot = slerp_euler(rot_a, rot_b, t) if rot_a is not None and rot_b is not None else None
+    params = {name: lerp(("params", name)) for name in _LINEAR_PARAMS}
+    translation = lerp(("camera", "translation"))
+    focal = lerp(("focal_length",))
+    bbox = lerp(("bbox",))
+
+    people = []
+    for k in range(len(pairs)):
+        people.append({
+            "id": k,
+            "bbox": bbox[k] if bbox is not None else None,
+            "focal_length": float(focal[k]) if focal is not None else 500.0,
+            "camera": {"translation": translation[k] if translation is not None else None},
+            "mesh": dict.fromkeys(MESH_FIELDS),
+            "params": dict(
+                global_rot=global_rot[k] if global_rot is not None else None,
+                **{name: value[k] if value is not None else None for name, value in params.items()},
+            ),
+        })
+    return people
+
+
+def _frame_people(source: MeshSource, frame_idx: int) -> List[Dict]:
+    """某一帧中每人的检测框、相机和参数 (不解码网格)"""
+    if source.sequence is not None:
+        return source.sequence.frame_mhr(frame_idx)["people"]
+    return MHRFile(source.frame_files[frame_idx]).people
+
+
+def plan_interpolation(
+    source: MeshSource,
+    keyframes: List[int],
+    max_gap: int = 30,
+    min_iou: float = 0.3,
+) -> List[Tuple[int, int, int, List[Tuple[int, int]]]]:
+    """
+    需要插值的帧: [(帧号, 前一个关键帧, 后一个关键帧, 配对的人)]
+
+    相邻关键帧相距超过 max_gap 帧 (例如中间有人离开画面) 时不插值。
+    """
+    plan = []
+    for ka, kb in zip(keyframes, keyframes[1:]):
+        if kb - ka <= 1 or kb - ka > max_gap:
+            continue
+        pairs = match_people(_frame_people(source, ka), _frame_people(source, kb), min_iou)
+        if not pairs:
+            continue
+        for frame_idx in range(ka + 1, kb):
+            plan.append((frame_idx, ka, kb, pairs))
+    return plan
+
+
+def _to_outputs(person: Dict) -> Dict:
+    """MHR数据中的人 -> estimator输出格式 (MHRSequenceWriter.append使用)"""
+    outputs = {}
+    for path, key in _OUTPUT_KEYS:
+        value = _get(person, path)
+        if value is not None:
+            outputs[key] = value
+    return outputs
+
+
+def interpolate_video(
+    input_path: Union[str, Path],
+    reconstructor=None,
+    max_gap: int = 30,
+    min_iou: float = 0.3,
+    batch_frames: int = 64,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Dict:
+    """
+    补全视频输出中跳过的帧，写回原输出目录或序列文件
+
+    Args:
+        input_path: process_video.py 的输出目录或 .mhrseq 序列文件
+        reconstructor: tools.mhr_reconstruct.MeshReconstructor，保存了网格的输出需要它重建中间帧
+        max_gap: 相邻关键帧最多相隔多少帧时才插值
+        min_iou: 相邻关键帧中两个检测框被认为是同一个人的最小IoU
+        batch_frames: 每批插值和重建的帧数
+        progress: 可选的回调 progress(已完成的插值帧数)
+
+    Returns:
+        {"keyframes": 关键帧数, "interpolated": 插值帧数, "output": 输出路径}
+    """
+    source = MeshSource(input_path, prefer_raw=True)
+    if isinstance(source.sequence, CompressedSequence):
+        raise ValueError(f"不支持直接修改压缩序列，请对原始 .mhrseq 插值: {source.sequence.path}")
+    folder = source.path if source.path.is_dir() else source.path.parent
+    info_path = folder / "video_info.json" if source.path.is_dir() else None
+
+    # 之前插值的帧重新生成，只以真正推理的帧为关键帧
+    if source.sequence is not None:
+        previous = set(source.sequence.metadata.get("interpolated_frames", []))
+    else:
+        previous = {
+            int(r["frame_idx"]) for r in source.video_info.get("processed_frames", [])
+            if r.get("interpolated")
+        }
+    keyframes = [i for i in source.frame_indices if i not in previous]
+    plan = plan_interpolation(source, keyframes, max_gap, min_iou)
+
+    params_only = source.params_only
+    if not params_only and plan and reconstructor is None:
+        raise ValueError("输出中保存了网格，插值帧需要MHR模型重建网格 (请指定检查点)")
+
+    image_size = None
+    if source.video_info.get("width") and source.video_info.get("height"):
+        image_size = [source.video_info["width"], source.video_info["height"]]
+
+    def frames():
+        """按批插值 (并重建网格)，产生 (帧号, MHR数据)"""
+        cache = {}
+        for start in range(0, len(plan), batch_frames):
+            batch = plan[start:start + batch_frames]
+            pairs, t, owners = [], [], []
+            for frame_idx, ka, kb, matched in batch:
+                for key in (ka, kb):
+                    if key not in cache:
+                        cache[key] = _frame_people(source, key)
+                for i, j in matched:
+                    pairs.append((cache[ka][i], cache[kb][j]))
+                    t.append((frame_idx - ka) / (kb - ka))
+                    owners.append(frame_idx)
+            people = interpolate_people(pairs, np.array(t))
+            batch_data = []
+            for frame_idx, _, _, matched in batch:
+                frame_people = [p for p, owner in zip(people, owners) if owner == frame_idx]
+                for k, person in enumerate(frame_people):
+                    person["id"] = k
+                batch_data.append({
+                    "version": "1.0",
+                    "image_path": f"frame_{frame_idx}",
+                    "image_size": image_size,
+                    "num_people": len(frame_people),
+                    "faces": None,
+                    "people": frame_people,
+                    "params_only": True,
+                    "interpolated": True,
+                })
+            if not params_only:
+                # 一批中所有帧的所有人一起前向计算
+                batch_data = reconstructor.reconstruct_frames([(None, d) for d in batch_data])
+            for (frame_idx, _, _, _), mhr_data in zip(batch, batch_data):
+                yield frame_idx, mhr_data
+            # 只保留之后还会用到的关键帧
+            last_key = batch[-1][1]
+            for key in [k for k in cache if k < last_key]:
+                del cache[key]
+
+    done = 0
+    records = []
+    if source.sequence is not None:
+        output = source.sequence.path
+        if plan or previous:
+            _rewrite_sequence(source.sequence, keyframes, frames(), progress)
+        sequence_name = output.name
+        records = [
+            {"frame_idx": f, "file": sequence_frame_file(sequence_name, f),
+             "num_people": len(pairs), "interpolated": True}
+            for f, _, _, pairs in plan
+        ]
+    else:
+        output = folder
+        for frame_idx, mhr_data in frames():
+            # 与前一个关键帧使用相同的格式
+            suffix = "".join(Path(source.frame_files[plan[done][1]]).suffixes[-2:])
+            suffix = suffix if suffix.startswith(".mhr") else MHR_JSON_SUFFIX
+            path = folder / f"frame_{frame_idx:06d}{suffix}"
+            if is_binary_mhr(path):
+                save_mhr_binary(path, mhr_data)
+            else:
+                dump_json(path, mhr_data, JSON_PRECISION)
+            records.append({"frame_idx": frame_idx, "file": path.name,
+                            "num_people": mhr_data["num_people"], "interpolated": True})
+            done += 1
+            if progress:
+                progress(done)
+        # 之前插值、这次不再需要的帧文件 (例如关键帧变了)
+        regenerated = {r["frame_idx"] for r in records}
+        for frame_idx in previous - regenerated:
+            stale = source.frame_files.get(frame_idx)
+            if stale is not None and stale.exists():
+                stale.unlink()
+
+    if info_path is not None and info_path.exists():
+        with open(info_path, "r") as f:
+            video_info = json.load(f)
+        kept = [r for r in video_info.get("processed_frames", []) if not r.get("interpolated")]
+        video_info["processed_frames"] = sorted(kept + records, key=lambda r: r["frame_idx"])
+        video_info["interpolation"] = {
+            "max_gap": max_gap,
+            "min_iou": min_iou,
+            "keyframes": len(keyframes),
+            "interpolated": len(records),
+        }
+        with atomic_write(info_path, "w") as f:
+            json.dump(video_info, f, indent=2)
+
+    return {"keyframes": len(keyframes), "interpolated": len(records), "output": str(output)}
+
+
+def _rewrite_sequence(
+    sequence: MHRSequence,
+    keyframes: List[int],
+    interpolated: Iterable[Tuple[int, Dict]],
+    progress: Optional[Callable[[int], None]] = None,
+) -> Path:
+    """按帧顺序重写序列文件: 关键帧原样复制，插值帧追加在对应位置"""
+    path = sequence.path
+    if path.name.endswith(PARTIAL_SUFFIX):
+        raise ValueError(f"序列文件未完成，请先用 recover_sequence() 恢复: {path}")
+    interpolated = iter(interpolated)
+    pending = next(interpolated, None)
+    frame_numbers = []
+    writer = MHRSequenceWriter(
+        path,
+        faces=sequence.faces,
+        metadata=sequence.metadata,
+        params_only=sequence.params_only,
+    )
+    done = 0
+    for key in sorted(keyframes) + [None]:
+        while pending is not None and (key is None or pending[0] < key):
+            frame_idx, mhr_data = pending
+            if writer._file is None:
+                writer.extend(sequence, [])
+            writer.append(frame_idx, [_to_outputs(p) for p in mhr_data["people"]])
+            frame_numbers.append(frame_idx)
+            done += 1
+            if progress:
+                progress(done)
+            pending = next(interpolated, None)
+        if key is not None:
+            writer.extend(sequence, [key])
+    writer.finalize({"interpolated_frames": frame_numbers})
+    return path
@@ -0,0 +1,125 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+处理清单 - 视频处理过程中逐帧追加的 manifest.jsonl
+
+每完成一帧 (文件已原子写入磁盘) 追加一行JSON记录，格式与video_info.json中的
+processed_frames相同: {"frame_idx": 帧号, "file": 文件名, "num_people": 人数}；
+没有检测到人体的帧记录为 {"frame_idx": 帧号, "num_people": 0}，恢复时不再重复处理。
+
+进程被中断时清单中只可能缺少最后一行或最后一行不完整，
+process_video.py --resume 读取清单、校验帧文件后只处理剩下的帧。
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Container, Dict, List, Optional, Union
+
+from .mhr_io import MHR_BINARY_SUFFIX, _BINARY_MAGIC
+from .mhr_sequence import parse_sequence_frame_file
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+class FrameManifest:
+    """追加写入的逐帧处理清单 (线程安全)"""
+
+    def __init__(self, path: Union[str, Path], fsync: bool = False):
+        """
+        Args:
+            path: 清单文件路径 (通常为 <输出目录>/manifest.jsonl)
+            fsync: 每条记录后fsync (更安全，但每帧多一次磁盘同步)
+        """
+        self.path = Path(path)
+        self.fsync = fsync
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self) -> List[Dict]:
+        """读取所有完整的记录 (忽略中断时写了一半的最后一行)，同一帧以最后一条为准"""
+        if not self.path.exists():
+            return []
+        records = {}
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[int(record["frame_idx"])] = record
+        return [records[i] for i in sorted(records)]
+
+    def reset(self):
+        """清空清单 (不恢复时重新开始)"""
+        with self._lock:
+            self._close()
+            if self.path.exists():
+                self.path.unlink()
+
+    def append(self, record: Dict):
+        """追加一条记录并立即写入磁盘"""
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a")
+                # 上次中断时最后一行可能不完整，从新的一行开始
+                if self._file.tell() > 0 and not self._last_byte_is_newline():
+                    self._file.write("\n")
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def _last_byte_is_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def frame_file_valid(
+    output_folder: Union[str, Path],
+    record: Dict,
+    sequence_frames: Optional[Container[int]] = None,
+) -> bool:
+    """
+    清单记录对应的帧输出是否完整
+
+    序列帧 (<序列文件名>/<帧号>) 检查帧号是否在已写入的序列中；帧文件检查文件存在且结尾完整
+    (.mhr.json 以 "}" 结尾，.mhr.bin 魔数正确)。没有人体的帧总是有效。
+    """
+    frame_file = record.get("file")
+    if not frame_file:
+        return record.get("num_people", 0) == 0
+    parsed = parse_sequence_frame_file(frame_file)
+    if parsed is not None:
+        return sequence_frames is not None and parsed[1] in sequence_frames
+
+    path = Path(output_folder) / frame_file
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return False
+    if size == 0:
+        return False
+    with open(path, "rb") as f:
+        if frame_file.endswith(MHR_BINARY_SUFFIX):
+            return f.read(len(_BINARY_MAGIC)) == _BINARY_MAGIC
+        f.seek(max(size - 16, 0))
+        return f.read().rstrip().endswith(b"}")
@@ -0,0 +1,350 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+网格批量导出 - 将处理好的视频目录或序列文件逐帧导出为OBJ / 二进制PLY网格
+
+支持的输入 (MeshSource):
+    - process_video.py 的输出目录 (frame_XXXXXX.mhr.json / .mhr.bin 帧文件或 .mhrseq 序列)
+    - 序列文件 .mhrseq (.partial) 或压缩序列 .mhrz
+    - 单个 .mhr.json / .mhr.bin 文件
+
+导出在多个工作进程中并行进行，每个进程只打开一次输入、只编码一次共享的面片拓扑，
+各帧只格式化顶点。仅参数模式的输入需要MHR头重建网格 (在主进程中批量重建)。
+
+使用方法:
+    export_meshes("output/video_name", "output/video_name/meshes", mesh_format="ply")
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from .mhr_codec import COMPRESSED_SUFFIX, CompressedSequence, is_sequence_path
+from .mhr_io import FRAME_FILE_PATTERN, MESH_EXPORTERS, MHRFile
+from .mhr_sequence import MHRSequence, PARTIAL_SUFFIX, SEQUENCE_SUFFIX, find_sequence_files
+
+
+class MeshSource:
+    """
+    统一读取各种MHR输出的逐帧网格
+
+    frame_indices、faces、fps、params_only、frame_vertices(frame_idx)、frame_mhr(frame_idx)
+    """
+
+    def __init__(self, path: Union[str, Path], prefer_raw: bool = False):
+        """
+        Args:
+            path: 输出目录、序列文件或单个MHR文件
+            prefer_raw: 目录中同时有 .mhrz 和 .mhrseq 时使用原始序列 (需要修改序列时)
+        """
+        self.path = Path(path)
+        self.prefer_raw = prefer_raw
+        self.sequence = None
+        self.frame_files = {}
+        self.video_info = {}
+
+        if self.path.is_dir():
+            info_file = self.path / "video_info.json"
+            if info_file.exists():
+                with open(info_file, "r") as f:
+                    self.video_info = json.load(f)
+            sequence_path = self._find_sequence()
+            if sequence_path is not None:
+                self._open_sequence(sequence_path)
+            else:
+                for frame in self.video_info.get("processed_frames", []):
+                    self.frame_files[int(frame["frame_idx"])] = self.path / frame["file"]
+                if not self.frame_files:
+                    for f in sorted(self.path.iterdir()):
+                        match = FRAME_FILE_PATTERN.match(f.name)
+                        if match:
+                            self.frame_files.setdefault(int(match.group(1)), f)
+        elif is_sequence_path(self.path) or self.path.name.endswith(COMPRESSED_SUFFIX):
+            self._open_sequence(self.path)
+        elif self.path.exists():
+            self.frame_files[0] = self.path
+        else:
+            raise ValueError(f"输入不存在: {self.path}")
+
+        if self.sequence is not None:
+            self.frame_indices = self.sequence.frame_indices
+        else:
+            self.frame_indices = sorted(self.frame_files)
+        self._faces = None
+
+    def _find_sequence(self) -> Optional[Path]:
+        """目录中video_info.json引用的 (或唯一的) 序列文件，默认优先使用压缩序列"""
+        names = []
+        if self.video_info.get("sequence"):
+            names.append(self.video_info["sequence"])
+        names += [p.name for p in find_sequence_files(self.path)]
+        for name in names:
+            if name.endswith(PARTIAL_SUFFIX):
+                name = name[: -len(PARTIAL_SUFFIX)]
+            stem = name[: -len(SEQUENCE_SUFFIX)] if name.endswith(SEQUENCE_SUFFIX) else name
+            candidates = [
+                self.path / (stem + COMPRESSED_SUFFIX),
+                self.path / name,
+                self.path / (name + PARTIAL_SUFFIX),
+            ]
+            if self.prefer_raw:
+                candidates.append(candidates.pop(0))
+            for candidate in candidates:
+                if candidate.exists():
+                    return candidate
+        return None
+
+    def _open_sequence(self, path: Path):
+        if path.name.endswith(COMPRESSED_SUFFIX):
+            self.sequence = CompressedSequence(path)
+        else:
+            self.sequence = MHRSequence(path)
+        self.video_info = dict(self.sequence.metadata, **self.video_info)
+
+    @property
+    def name(self) -> str:
+        """输出文件名前缀 (单个文件时为文件名去掉.mhr.*后缀)"""
+        if self.sequence is None and not self.path.is_dir():
+            return self.path.name.split(".mhr.")[0]
+        return self.video_info.get("video_name") or self.path.name.split(".")[0]
+
+    @property
+    def fps(self) -> Optional[float]:
+        return self.video_info.get("fps")
+
+    @property
+    def params_only(self) -> bool:
+        if self.sequence is not None:
+            return self.sequence.params_only
+        if not self.frame_indices:
+            return False
+        return MHRFile(self.frame_files[self.frame_indices[0]]).params_only
+
+    @property
+    def faces(self) -> Optional[np.ndarray]:
+        """共享的面片拓扑 (序列头部、faces.json或第一个保存了faces的帧文件)"""
+        if self._faces is None:
+            if self.sequence is not None:
+                self._faces = self.sequence.faces
+            elif (self.path / "faces.json").exists():
+                with open(self.path / "faces.json", "r") as f:
+                    self._faces = np.asarray(json.load(f), dtype=np.int32)
+            else:
+                for frame_idx in self.frame_indices:
+                    faces = MHRFile(self.frame_files[frame_idx]).faces
+                    if faces is not None:
+                        self._faces = faces
+                        break
+        return self._faces
+
+    def frame_vertices(self, frame_idx: int) -> List[np.ndarray]:
+        """某一帧每个人的顶点 [V, 3] (仅参数模式时为空列表)"""
+        if self.sequence is not None:
+            if self.sequence.params_only:
+                return []
+            return list(self.sequence.frame(frame_idx)["vertices"])
+        mhr_file = MHRFile(self.frame_files[frame_idx])
+        if mhr_file.params_only:
+            return []
+        return [mhr_file.mesh(i, "vertices") for i in range(mhr_file.num_people)]
+
+    def frame_translations(self, frame_idx: int) -> List[Optional[np.ndarray]]:
+        """某一帧每个人的相机平移 [3]"""
+        if self.sequence is not None:
+            return list(self.sequence.frame(frame_idx)["camera_translation"])
+        mhr_file = MHRFile(self.frame_files[frame_idx])
+        return [person["camera"]["translation"] for person in mhr_file.people]
+
+    def frame_boxes(self, frame_idx: int) -> List[Optional[np.ndarray]]:
+        """某一帧每个人的检测框 [4] (没有时为None)"""
+        if self.sequence is not None:
+            records = self.sequence.frame(frame_idx)
+            if "bbox" not in records.dtype.names:
+                return [None] * len(records)
+            return list(records["bbox"])
+        mhr_file = MHRFile(self.frame_files[frame_idx])
+        return [person.get("bbox") for person in mhr_file.people]
+
+    def frame_mhr(self, frame_idx: int) -> Dict:
+        """某一帧的MHR数据字典"""
+        if self.sequence is not None:
+            return self.sequence.frame_mhr(frame_idx)
+        return MHRFile(self.frame_files[frame_idx]).load()
+
+
+def iter_frame_vertices(
+    source: MeshSource,
+    frame_indices: Optional[Iterable[int]] = None,
+    reconstructor=None,
+):
+    """
+    按顺序逐帧产生 (帧号, 每人的顶点列表)，仅参数模式时用reconstructor批量重建
+
+    Args:
+        source: MeshSource
+        frame_indices: 帧号 (默认: 全部)
+        reconstructor: tools.mhr_reconstruct.MeshReconstructor
+    """
+    frame_indices = list(source.frame_indices if frame_indices is None else frame_indices)
+    if not source.params_only:
+        for frame_idx in frame_indices:
+            yield frame_idx, source.frame_vertices(frame_idx)
+        return
+    if reconstructor is None:
+        raise ValueError("仅参数模式的输入没有网格，需要MHR模型重建 (--checkpoint_path)")
+    for chunk in _chunks(frame_indices, reconstructor.batch_size):
+        frames = reconstructor.reconstruct_frames([(None, source.frame_mhr(i)) for i in chunk])
+        for frame_idx, mhr_data in zip(chunk, frames):
+            yield frame_idx, [p["mesh"]["vertices"] for p in mhr_data["people"]]
+
+
+def mesh_file_name(name: str, frame_idx: Optional[int], person: int, mesh_format: str) -> str:
+    """导出文件名: <名称>_person<i>.<格式> 或 frame_XXXXXX_person<i>.<格式>"""
+    base = name if frame_idx is None else f"frame_{frame_idx:06d}"
+    return f"{base}_person{person}.{mesh_format}"
+
+
+# 工作进程状态 (每个进程初始化一次)
+_worker = {}
+
+
+def _init_worker(source_path, faces, mesh_format, output_folder, name, single):
+    export, encode_faces = MESH_EXPORTERS[mesh_format]
+    _worker.update(
+        source=MeshSource(source_path) if source_path is not None else None,
+        export=export,
+        faces=encode_faces(faces),  # 共享拓扑只编码一次
+        mesh_format=mesh_format,
+        output_folder=Path(output_folder),
+        name=name,
+        single=single,
+    )
+
+
+def _export_vertices(frame_idx: int, vertices: List[np.ndarray]) -> int:
+    w = _worker
+    for person, verts in enumerate(vertices):
+        file_name = mesh_file_name(
+            w["name"], None if w["single"] else frame_idx, person, w["mesh_format"]
+        )
+        w["export"](w["output_folder"] / file_name, verts, w["faces"], verbose=False)
+    return len(vertices)
+
+
+def _export_frames(frame_indices: List[int]) -> int:
+    """从输入读取并导出一批帧 (工作进程中执行)"""
+    source = _worker["source"]
+    return sum(
+        _export_vertices(frame_idx, source.frame_vertices(frame_idx))
+        for frame_idx in frame_indices
+    )
+
+
+def _export_reconstructed(frames: List) -> int:
+    """导出主进程重建的顶点 (工作进程中执行)"""
+    return sum(_export_vertices(frame_idx, vertices) for frame_idx, vertices in frames)
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def export_meshes(
+    input_path: Union[str, Path, MeshSource],
+    output_folder: Union[str, Path],
+    mesh_format: str = "ply",
+    frame_indices: Optional[Iterable[int]] = None,
+    num_workers: Optional[int] = None,
+    reconstructor=None,
+    progress=None,
+) -> Dict:
+    """
+    将输入的所有帧 (或指定帧) 导出为每帧每人一个网格文件
+
+    Args:
+        input_path: 视频输出目录、序列文件、单个MHR文件或已打开的MeshSource
+        output_folder: 网格输出目录
+        mesh_format: "obj" 或 "ply" (二进制，更小更快)
+        frame_indices: 要导出的帧号 (默认: 全部)，不存在的帧被跳过
+        num_workers: 工作进程数 (默认: CPU核数，1表示在当前进程中导出)
+        reconstructor: tools.mhr_reconstruct.MeshReconstructor，仅参数模式的输入需要
+        progress: 可选的回调 progress(完成帧数)
+
+    Returns:
+        {"frames": 导出帧数, "meshes": 导出网格数, "output_folder": 输出目录}
+    """
+    if mesh_format not in MESH_EXPORTERS:
+        raise ValueError(f"不支持的网格格式: {mesh_format} (可选: {list(MESH_EXPORTERS)})")
+    source = input_path if isinstance(input_path, MeshSource) else MeshSource(input_path)
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    available = set(source.frame_indices)
+    if frame_indices is None:
+        frame_indices = source.frame_indices
+    frame_indices = [i for i in frame_indices if i in available]
+
+    params_only = source.params_only
+    if params_only and reconstructor is None:
+        raise ValueError("仅参数模式的输入没有网格，需要MHR模型重建 (--checkpoint_path)")
+    faces = source.faces
+    if faces is None and reconstructor is not None:
+        faces = reconstructor.faces
+    if faces is None:
+        raise ValueError(f"输入中没有面片拓扑 (faces): {source.path}")
+
+    num_workers = num_workers or os.cpu_count() or 1
+    single = source.sequence is None and not source.path.is_dir()
+    initargs = (
+        None if params_only else str(source.path),
+        np.asarray(faces),
+        mesh_format,
+        str(output_folder),
+        source.name,
+        single,
+    )
+    chunk_size = max(1, min(32, len(frame_indices) // (num_workers * 4) or 1))
+    if params_only:
+        # 主进程批量重建，每批帧的顶点交给工作进程写入
+        def tasks():
+            frames = iter_frame_vertices(source, frame_indices, reconstructor)
+            for chunk in _chunks(frame_indices, reconstructor.batch_size):
+                yield _export_reconstructed, [next(frames) for _ in chunk], len(chunk)
+    else:
+        def tasks():
+            for chunk in _chunks(frame_indices, chunk_size):
+                yield _export_frames, chunk, len(chunk)
+
+    num_meshes, num_frames = 0, 0
+    if num_workers <= 1:
+        _init_worker(*initargs)
+        for fn, arg, count in tasks():
+            num_meshes += fn(arg)
+            num_frames += count
+            if progress:
+                progress(num_frames)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=num_workers, initializer=_init_worker, initargs=initargs
+        ) as executor:
+            # 最多 2 * num_workers 个批次在途，避免重建的顶点堆积在内存中
+            pending = []
+            for fn, arg, count in tasks():
+                pending.append((executor.submit(fn, arg), count))
+                if len(pending) >= 2 * num_workers:
+                    future, count = pending.pop(0)
+                    num_meshes += future.result()
+                    num_frames += count
+                    if progress:
+                        progress(num_frames)
+            for future, count in pending:
+                num_meshes += future.result()
+                num_frames += count
+                if progress:
+                    progress(num_frames)
+
+    return {"frames": num_frames, "meshes": num_meshes, "output_folder": str(output_folder)}
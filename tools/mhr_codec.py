@@ -0,0 +1,531 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+MHR序列压缩 - 对视频序列的顶点和3D关键点做量化 + 时间差分编码 (.mhrz)
+
+编码流程 (每个字段):
+    1. 按整段序列的包围盒 (每个坐标轴的最小/最大值) 量化为16位整数
+    2. 每隔 keyframe_interval 帧一个关键帧，其余帧保存与所在组关键帧的差值
+       (delta="keyframe"，组内任意帧一步解码) 或与前一帧的差值
+       (delta="previous"，运动较快时更小，组内用累加和解码)，差值使用zigzag编码
+    3. 字节重排 (低字节和高字节分别连续存放)
+    4. 可选的熵编码: zstd / lz4 (需安装 zstandard / lz4) 或 zlib
+
+每组 (关键帧 + 之后的差分帧) 单独压缩，解码任意一帧只需解压所在的组，
+组内解码为向量化numpy运算。其余字段 (参数、bbox、相机等) 原样保存。
+
+文件结构:
+    前缀 (魔数 b"MHRZ\\0\\0\\0\\0", 版本, 头部长度)
+    JSON头部 (元信息、记录dtype、帧索引、各字段的量化范围和数据块位置)
+    压缩数据块
+"""
+
+import json
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .mhr_sequence import (
+    MHRSequence,
+    PARTIAL_SUFFIX,
+    SEQUENCE_SUFFIX,
+    _dtype_from_json,
+    _dtype_to_json,
+    records_to_mhr,
+)
+
+COMPRESSED_SUFFIX = ".mhrz"
+
+# 默认压缩的字段 (其余字段原样保存)
+COMPRESSED_FIELDS = ("vertices", "keypoints_3d")
+
+_MAGIC = b"MHRZ\0\0\0\0"
+_VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+_LEVELS = 65535
+
+
+def available_compressions() -> List[str]:
+    """可用的熵编码方式 (按优先级排列)"""
+    names = []
+    try:
+        import zstandard  # noqa: F401
+
+        names.append("zstd")
+    except ImportError:
+        pass
+    try:
+        import lz4.frame  # noqa: F401
+
+        names.append("lz4")
+    except ImportError:
+        pass
+    return names + ["zlib", "none"]
+
+
+def _codec(name: str, level: Optional[int] = None):
+    """返回 (压缩函数, 解压函数)"""
+    if name == "zstd":
+        import zstandard
+
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        decompressor = zstandard.ZstdDecompressor()
+        return compressor.compress, decompressor.decompress
+    if name == "lz4":
+        import lz4.frame
+
+        return (
+            lambda data: lz4.frame.compress(data, compression_level=level or 0),
+            lz4.frame.decompress,
+        )
+    if name == "zlib":
+        return (lambda data: zlib.compress(data, 6 if level is None else level)), zlib.decompress
+    if name == "none":
+        return bytes, bytes
+    raise ValueError(f"不支持的压缩方式: {name} (可选: zstd, lz4, zlib, none)")
+
+
+def _zigzag(delta: np.ndarray) -> np.ndarray:
+    signed = delta.view(np.int16)
+    return ((signed << 1) ^ (signed >> 15)).view(np.uint16)
+
+
+def _unzigzag(encoded: np.ndarray) -> np.ndarray:
+    signed = (encoded >> 1).astype(np.int16) ^ -(encoded & 1).astype(np.int16)
+    return signed.view(np.uint16)
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    """uint16数组按字节重排: 先所有低字节，再所有高字节"""
+    return np.ascontiguousarray(values.view(np.uint8).reshape(-1, 2).T).tobytes()
+
+
+def _unshuffle(data: bytes, shape: Tuple[int, ...]) -> np.ndarray:
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(2, -1)
+    return np.ascontiguousarray(planes.T).view(np.uint16).reshape(shape)
+
+
+def _quantization(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """由包围盒得到 (lo, scale)，float64"""
+    lo, hi = np.asarray(lo, dtype=np.float64), np.asarray(hi, dtype=np.float64)
+    scale = (hi - lo) / _LEVELS
+    scale[scale == 0] = 1.0
+    return lo, scale
+
+
+def _encode_group(
+    frames: np.ndarray,
+    mask: np.ndarray,
+    lo: np.ndarray,
+    scale: np.ndarray,
+    delta: str,
+    compress,
+) -> bytes:
+    """量化并编码一组帧 (第一帧为关键帧)，返回压缩数据块"""
+    quantized = np.rint((np.where(mask, frames, lo) - lo) / scale)
+    group = np.clip(quantized, 0, _LEVELS).astype(np.uint16)
+    group_mask = np.broadcast_to(mask, group.shape)
+    key = group[0]
+    if delta == "keyframe":
+        # 无效位置与关键帧相同 (差值为0)
+        group[1:] = np.where(group_mask[1:], group[1:], key)
+        group[1:] = _zigzag(group[1:] - key)
+    else:
+        # 无效位置与前一帧相同 (差值为0)
+        for i in range(1, len(group)):
+            group[i] = np.where(group_mask[i], group[i], group[i - 1])
+        group[1:] = _zigzag(np.diff(group, axis=0))
+    return compress(_shuffle(group))
+
+
+def encode_frames(
+    frames: np.ndarray,
+    valid: Optional[np.ndarray] = None,
+    keyframe_interval: int = 30,
+    compression: Optional[str] = None,
+    level: Optional[int] = None,
+    delta: str = "keyframe",
+) -> Tuple[Dict, List[bytes]]:
+    """
+    压缩逐帧的坐标数组
+
+    Args:
+        frames: [T, ..., 3] 坐标 (例如 [帧, 人, 顶点, 3])
+        valid: 与frames前几维形状相同的有效掩码 (例如 [帧, 人])，无效位置不参与量化范围
+        keyframe_interval: 关键帧间隔
+        compression: 熵编码方式 (默认: 可用方式中优先级最高的)
+        level: 压缩级别 (默认: 各压缩方式的默认值)
+        delta: 差分参考帧，"keyframe" (所在组的关键帧) 或 "previous" (前一帧)
+
+    Returns:
+        (头部字典, 每组的压缩数据块列表)
+    """
+    if delta not in ("keyframe", "previous"):
+        raise ValueError(f"不支持的差分方式: {delta} (可选: keyframe, previous)")
+    frames = np.asarray(frames, dtype=np.float32)
+    compression = compression or available_compressions()[0]
+    compress, _ = _codec(compression, level)
+    if valid is None:
+        valid = np.ones(frames.shape[:1], dtype=bool)
+    valid = np.asarray(valid, dtype=bool)
+    mask = valid.reshape(valid.shape + (1,) * (frames.ndim - valid.ndim))
+
+    # 1. 按包围盒量化
+    points = frames[valid].reshape(-1, frames.shape[-1])
+    if len(points):
+        lo, scale = _quantization(points.min(axis=0), points.max(axis=0))
+    else:
+        lo, scale = _quantization(np.zeros(frames.shape[-1]), np.zeros(frames.shape[-1]))
+
+    # 2-4. 每组: 关键帧原值 + 差分帧的zigzag差值，字节重排后压缩
+    chunks = [
+        _encode_group(
+            frames[start : start + keyframe_interval],
+            mask[start : start + keyframe_interval],
+            lo, scale, delta, compress,
+        )
+        for start in range(0, len(frames), keyframe_interval)
+    ]
+    header = _frames_header(
+        frames.shape, valid.ndim, lo, scale, keyframe_interval, delta, compression
+    )
+    return header, chunks
+
+
+def _frames_header(shape, valid_ndim, lo, scale, keyframe_interval, delta, compression) -> Dict:
+    return {
+        "shape": list(shape),
+        "valid_ndim": valid_ndim,
+        "lo": lo.tolist(),
+        "scale": scale.tolist(),
+        "keyframe_interval": keyframe_interval,
+        "delta": delta,
+        "compression": compression,
+    }
+
+
+def _field_bounds(field: np.ndarray, chunk_size: int = 4096) -> Tuple[np.ndarray, np.ndarray]:
+    """所有记录中某个坐标字段的包围盒 (分块计算，不一次读入整个字段)"""
+    lo = np.full(field.shape[-1], np.inf)
+    hi = np.full(field.shape[-1], -np.inf)
+    for start in range(0, len(field), chunk_size):
+        points = np.asarray(field[start : start + chunk_size]).reshape(-1, field.shape[-1])
+        lo = np.minimum(lo, points.min(axis=0))
+        hi = np.maximum(hi, points.max(axis=0))
+    if not len(field):
+        lo = hi = np.zeros(field.shape[-1])
+    return lo, hi
+
+
+def decode_group(header: Dict, chunk: bytes, group: int) -> np.ndarray:
+    """解码一组帧 (关键帧 + 差分帧)，返回 [n, ..., 3] float32"""
+    _, decompress = _codec(header["compression"])
+    interval = header["keyframe_interval"]
+    num_frames = header["shape"][0]
+    count = min(interval, num_frames - group * interval)
+    values = _unshuffle(decompress(chunk), (count,) + tuple(header["shape"][1:]))
+    values = values.copy()
+    deltas = _unzigzag(values[1:])
+    if header.get("delta", "keyframe") == "previous":
+        # uint16累加和按2^16取模，与编码时的环绕减法对应
+        deltas = np.cumsum(deltas, axis=0, dtype=np.uint16)
+    values[1:] = values[0] + deltas
+    lo = np.asarray(header["lo"], dtype=np.float32)
+    scale = np.asarray(header["scale"], dtype=np.float32)
+    return values.astype(np.float32) * scale + lo
+
+
+def decode_frames(header: Dict, chunks: Sequence[bytes]) -> np.ndarray:
+    """解码 encode_frames() 的输出，返回 [T, ..., 3] float32 (无效位置为量化前的填充值)"""
+    out = np.empty(header["shape"], dtype=np.float32)
+    interval = header["keyframe_interval"]
+    for group, chunk in enumerate(chunks):
+        out[group * interval : (group + 1) * interval] = decode_group(header, chunk, group)
+    return out
+
+
+def compress_sequence(
+    sequence_path: Union[str, Path],
+    output_path: Optional[Union[str, Path]] = None,
+    fields: Sequence[str] = COMPRESSED_FIELDS,
+    keyframe_interval: int = 30,
+    compression: Optional[str] = None,
+    level: Optional[int] = None,
+    delta: str = "keyframe",
+) -> Path:
+    """
+    将MHR序列文件 (.mhrseq) 压缩为 .mhrz
+
+    Args:
+        sequence_path: 输入的序列文件 (也可以是未finalize的.partial文件)
+        output_path: 输出路径 (默认: 同目录下同名的.mhrz)
+        fields: 量化 + 差分编码的字段 (其余字段原样保存)
+        keyframe_interval: 关键帧间隔
+        compression: 熵编码方式 (zstd / lz4 / zlib / none，默认: 可用方式中优先级最高的)
+        level: 压缩级别
+        delta: 差分参考帧，"keyframe" 或 "previous"
+
+    Returns:
+        输出文件路径
+    """
+    sequence = MHRSequence(sequence_path)
+    if output_path is None:
+        output_path = Path(sequence_path).with_name(
+            sequence.name[: -len(SEQUENCE_SUFFIX)] + COMPRESSED_SUFFIX
+            if sequence.name.endswith(SEQUENCE_SUFFIX)
+            else sequence.name + COMPRESSED_SUFFIX
+        )
+    compression = compression or available_compressions()[0]
+    compress, _ = _codec(compression, level)
+
+    counts = sequence.index["count"]
+    max_people = int(counts.max()) if len(counts) else 0
+    valid = np.arange(max_people)[None, :] < counts[:, None]
+
+    fields = [name for name in fields if name in sequence.dtype.names]
+    if delta not in ("keyframe", "previous"):
+        raise ValueError(f"不支持的差分方式: {delta} (可选: keyframe, previous)")
+    blobs = []
+    offset = 0
+
+    def add_blob(data: bytes) -> List[int]:
+        nonlocal offset
+        blobs.append(data)
+        offset += len(data)
+        return [offset - len(data), len(data)]
+
+    # 逐组读取和编码 (内存占用为一组帧，而不是整段序列的稠密数组)
+    field_headers = {}
+    num_frames = len(sequence)
+    for name in fields:
+        field = sequence.field(name)
+        lo, scale = _quantization(*_field_bounds(field))
+        chunks = []
+        for start in range(0, num_frames, keyframe_interval):
+            stop = min(start + keyframe_interval, num_frames)
+            frames = sequence.dense(name, fill_value=0, start=start, stop=stop)
+            mask = valid[start:stop].reshape(valid[start:stop].shape + (1,) * (frames.ndim - 2))
+            chunks.append(add_blob(_encode_group(frames, mask, lo, scale, delta, compress)))
+        shape = (num_frames, max_people) + field.shape[1:]
+        field_headers[name] = _frames_header(
+            shape, valid.ndim, lo, scale, keyframe_interval, delta, compression
+        )
+        field_headers[name]["chunks"] = chunks
+
+    rest_names = [name for name in sequence.dtype.names if name not in fields]
+    rest_dtype = np.dtype([(name, sequence.dtype.fields[name][0]) for name in rest_names])
+    rest = np.empty(sequence.num_records, dtype=rest_dtype)
+    for name in rest_names:
+        rest[name] = sequence.records[name]
+
+    faces = None
+    if sequence.faces is not None:
+        faces = {
+            "shape": list(sequence.faces.shape),
+            "blob": add_blob(compress(np.ascontiguousarray(sequence.faces).tobytes())),
+        }
+
+    header = {
+        "name": sequence.name,
+        "metadata": sequence.metadata,
+        "record_dtype": _dtype_to_json(sequence.dtype),
+        "rest_dtype": _dtype_to_json(rest_dtype),
+        "frame_indices": [int(i) for i in sequence.index["frame_idx"]],
+        "counts": [int(c) for c in counts],
+        "compression": compression,
+        "fields": field_headers,
+        "records": add_blob(compress(rest.tobytes())),
+        "faces": faces,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    del sequence
+
+    with open(output_path, "wb") as f:
+        f.write(_PREFIX.pack(_MAGIC, _VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for blob in blobs:
+            f.write(blob)
+    return Path(output_path)
+
+
+class CompressedSequence:
+    """
+    读取压缩的MHR序列 (.mhrz)
+
+    接口与 MHRSequence 的读取部分相同 (frame / frame_mhr / dense / frame_indices)，
+    单帧读取只解码所在的组，最近解码的组保存在缓存中。
+    """
+
+    def __init__(self, path: Union[str, Path], cache_groups: int = 8):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != _MAGIC:
+                raise ValueError(f"不是压缩的MHR序列文件: {self.path}")
+            if version > _VERSION:
+                raise ValueError(f"不支持的压缩MHR序列版本 {version}: {self.path}")
+            header = json.loads(f.read(header_len))
+        self._data = np.memmap(self.path, dtype=np.uint8, mode="r", offset=_PREFIX.size + header_len)
+        self.header = header
+        self.name = header["name"]
+        self.metadata = header["metadata"]
+        self.dtype = _dtype_from_json(header["record_dtype"])
+        self.fields = header["fields"]
+        _, self._decompress = _codec(header["compression"])
+
+        counts = np.asarray(header["counts"], dtype=np.int64)
+        self._frame_indices = np.asarray(header["frame_indices"], dtype=np.int64)
+        self._starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        self._counts = counts
+        self._positions = {int(i): t for t, i in enumerate(self._frame_indices)}
+        self.num_records = int(counts.sum())
+
+        rest_dtype = _dtype_from_json(header["rest_dtype"])
+        self._rest = np.frombuffer(self._blob(header["records"]), dtype=rest_dtype)
+
+        self.faces = None
+        if header["faces"] is not None:
+            self.faces = np.frombuffer(
+                self._blob(header["faces"]["blob"]), dtype=np.int32
+            ).reshape(header["faces"]["shape"])
+
+        self.cache_groups = cache_groups
+        self._groups = OrderedDict()
+
+    def _blob(self, location: List[int]) -> bytes:
+        offset, length = location
+        return self._decompress(self._data[offset : offset + length].tobytes())
+
+    def _raw_chunk(self, location: List[int]) -> bytes:
+        offset, length = location
+        return self._data[offset : offset + length].tobytes()
+
+    def _group(self, name: str, group: int) -> np.ndarray:
+        key = (name, group)
+        values = self._groups.get(key)
+        if values is None:
+            header = self.fields[name]
+            values = decode_group(header, self._raw_chunk(header["chunks"][group]), group)
+            self._groups[key] = values
+            while len(self._groups) > self.cache_groups:
+                self._groups.popitem(last=False)
+        else:
+            self._groups.move_to_end(key)
+        return values
+
+    def __len__(self) -> int:
+        return len(self._frame_indices)
+
+    def __contains__(self, frame_idx: int) -> bool:
+        return frame_idx in self._positions
+
+    @property
+    def frame_indices(self) -> List[int]:
+        """已保存的帧号 (按写入顺序)"""
+        return [int(i) for i in self._frame_indices]
+
+    @property
+    def params_only(self) -> bool:
+        return "vertices" not in self.dtype.names
+
+    def frame(self, frame_idx: int) -> np.ndarray:
+        """某一帧所有人的记录 (结构化数组，与MHRSequence.frame相同)"""
+        t = self._positions[frame_idx]
+        start, count = self._starts[t], self._counts[t]
+        records = np.empty(count, dtype=self.dtype)
+        rest = self._rest[start : start + count]
+        for name in rest.dtype.names:
+            records[name] = rest[name]
+        for name, header in self.fields.items():
+            interval = header["keyframe_interval"]
+            records[name] = self._group(name, t // interval)[t % interval, :count]
+        return records
+
+    def frame_mhr(self, frame_idx: int, include_faces: bool = False) -> Dict:
+        """某一帧的MHR数据字典，结构与.mhr.json相同 (数组为numpy数组)"""
+        return records_to_mhr(
+            self.frame(frame_idx),
+            frame_idx,
+            self.metadata,
+            self.faces if include_faces else None,
+        )
+
+    def dense(self, name: str, fill_value: float = np.nan) -> np.ndarray:
+        """
+        某个字段按 [帧, 人, ...] 排列的稠密数组 (人数不足处填充fill_value)
+
+        压缩字段整段向量化解码
+        """
+        max_people = int(self._counts.max()) if len(self._counts) else 0
+        valid = np.arange(max_people)[None, :] < self._counts[:, None]
+        if name in self.fields:
+            header = self.fields[name]
+            out = decode_frames(
+                header, [self._raw_chunk(chunk) for chunk in header["chunks"]]
+            )
+        else:
+            field = self._rest[name]
+            out = np.zeros((len(self), max_people) + field.shape[1:], dtype=field.dtype)
+            out[valid] = field
+        mask = valid.reshape(valid.shape + (1,) * (out.ndim - 2))
+        return np.where(mask, out, np.asarray(fill_value, dtype=out.dtype))
+
+
+def compression_report(
+    sequence_path: Union[str, Path],
+    compressed_path: Union[str, Path],
+) -> Dict:
+    """
+    比较原始序列和压缩序列: 文件大小、压缩字段的原始/压缩大小、最大重建误差和解码速度
+
+    Returns:
+        报告字典 (误差单位与坐标相同，即米)
+    """
+    sequence = MHRSequence(sequence_path)
+    compressed = CompressedSequence(compressed_path)
+    report = {
+        "frames": len(sequence),
+        "records": sequence.num_records,
+        "sequence_bytes": Path(sequence_path).stat().st_size,
+        "compressed_bytes": Path(compressed_path).stat().st_size,
+        "fields": {},
+    }
+    report["ratio"] = report["sequence_bytes"] / max(report["compressed_bytes"], 1)
+    num_frames = len(compressed)
+    for name, header in compressed.fields.items():
+        # 逐组解码和比较 (不生成整段序列的稠密数组)
+        interval = header["keyframe_interval"]
+        elapsed = 0.0
+        max_error = 0.0
+        for group, chunk in enumerate(header["chunks"]):
+            raw_chunk = compressed._raw_chunk(chunk)
+            start = time.perf_counter()
+            decoded = decode_group(header, raw_chunk, group)
+            elapsed += time.perf_counter() - start
+            original = sequence.dense(
+                name, start=group * interval, stop=min((group + 1) * interval, num_frames)
+            )
+            valid = ~np.isnan(original)
+            if valid.any():
+                max_error = max(max_error, float(np.abs(decoded[valid] - original[valid]).max()))
+        raw_bytes = int(sequence.field(name).nbytes)
+        packed_bytes = sum(length for _, length in header["chunks"])
+        report["fields"][name] = {
+            "raw_bytes": raw_bytes,
+            "compressed_bytes": packed_bytes,
+            "ratio": raw_bytes / max(packed_bytes, 1),
+            "max_error": max_error,
+            "quantization_step": max(header["scale"]),
+            "decode_fps": num_frames / max(elapsed, 1e-9),
+        }
+    return report
+
+
+def is_sequence_path(path: Union[str, Path]) -> bool:
+    """是否为MHR序列文件 (.mhrseq 或 .mhrseq.partial)"""
+    name = str(path)
+    return name.endswith(SEQUENCE_SUFFIX) or name.endswith(SEQUENCE_SUFFIX + PARTIAL_SUFFIX)
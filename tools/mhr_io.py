@@ -2,13 +2,66 @@
 """
 MHR文件读写工具
 支持将3D人体模型数据保存为MHR格式(.mhr.json)，并可在网页查看器中加载
+
+另支持紧凑的二进制格式(.mhr.bin):
+    魔数 b"MHRB" | 版本 (uint32) | 头部长度 (uint64) | JSON头部 | 按64字节对齐的数据块
+JSON头部与.mhr.json结构相同，其中数组替换为 {"__block__": i}，
+数据块为小端 float32 / int32 原始数据，可通过内存映射零拷贝读取。
+
+JSON使用快速写入 (dump_json): 有orjson时直接序列化numpy数组，否则按数组整体格式化，
+网格等浮点数默认保留5位小数 (0.01 mm)，MHR参数保留完整的float32精度。
+
+两种格式均支持仅参数模式 (params_only): 不保存顶点、关键点和faces，
+只保存MHR参数、bbox和相机，体积约为完整数据的1/100，
+需要网格时由 tools/mhr_reconstruct.py 按需重建。
 """
 
 import json
+import os
+import re
+import struct
+from contextlib import contextmanager
 import numpy as np
 from typing import Dict, List, Optional, Union
 from pathlib import Path
 
+MHR_JSON_SUFFIX = ".mhr.json"
+MHR_BINARY_SUFFIX = ".mhr.bin"
+
+_BINARY_MAGIC = b"MHRB"
+_BINARY_VERSION = 1
+_BINARY_PREFIX = struct.Struct("<4sIQ")
+_BINARY_ALIGN = 64
+
+# JSON中浮点数保留的小数位数 (坐标单位为米，5位即0.01 mm)
+JSON_PRECISION = 5
+# 这些键下的数组在JSON中保留完整精度 (MHR参数用于重建网格)
+_FULL_PRECISION_KEYS = ("params",)
+
+# 可由MHR参数重建的网格字段 (仅参数模式下不保存)
+MESH_FIELDS = ("vertices", "keypoints_3d", "keypoints_2d")
+
+# process_video.py 保存的帧文件名
+FRAME_FILE_PATTERN = re.compile(r"frame_(\d+)\.mhr\.(?:json|bin)$")
+
+# 二进制PLY中的一个三角形面片
+_PLY_FACE_DTYPE = np.dtype([("count", "u1"), ("indices", "<i4", (3,))])
+
+# 每个人的数组字段 (在.mhr.bin中保存为数据块)
+_PERSON_ARRAY_FIELDS = (
+    ("bbox",),
+    ("camera", "translation"),
+    ("mesh", "vertices"),
+    ("mesh", "keypoints_3d"),
+    ("mesh", "keypoints_2d"),
+    ("params", "global_rot"),
+    ("params", "body_pose"),
+    ("params", "shape"),
+    ("params", "scale"),
+    ("params", "hand"),
+    ("params", "expression"),
+)
+
 
 def numpy_to_list(obj):
     """递归将numpy数组转换为Python列表"""
@@ -25,100 +78,678 @@ def numpy_to_list(obj):
     return obj
 
 
-def save_mhr(
+def _format_array(array: np.ndarray, precision: Optional[int]) -> str:
+    """将数组格式化为JSON: 整个数组一次性按模板格式化，不逐元素调用json"""
+    array = np.asarray(array)
+    if array.dtype.kind in "iu":
+        fmt = "%d"
+    elif array.dtype.kind == "f" and np.isfinite(array).all():
+        if precision is not None:
+            fmt = f"%.{precision}f"
+        else:
+            # 可无损还原的有效位数
+            fmt = "%.9g" if array.dtype.itemsize <= 4 else "%.17g"
+    else:
+        return json.dumps(array.tolist())
+    if array.ndim == 0:
+        return fmt % array.item()
+    template = fmt
+    for dim in reversed(array.shape):
+        template = "[" + ",".join([template] * dim) + "]"
+    return template % tuple(array.ravel().tolist())
+
+
+def _json_chunks(obj, precision: Optional[int]):
+    """逐段生成JSON文本，数组整体格式化"""
+    if isinstance(obj, dict):
+        yield "{"
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                yield ","
+            yield json.dumps(str(key))
+            yield ":"
+            yield from _json_chunks(
+                value, None if key in _FULL_PRECISION_KEYS else precision
+            )
+        yield "}"
+    elif isinstance(obj, (list, tuple)):
+        yield "["
+        for i, value in enumerate(obj):
+            if i:
+                yield ","
+            yield from _json_chunks(value, precision)
+        yield "]"
+    elif isinstance(obj, (np.ndarray, np.generic)):
+        yield _format_array(obj, precision)
+    else:
+        yield json.dumps(obj)
+
+
+def _orjson_ready(obj, precision: Optional[int]):
+    """转换为orjson可直接序列化的对象 (数组按精度取整并保证连续)"""
+    if isinstance(obj, dict):
+        return {
+            str(key): _orjson_ready(value, None if key in _FULL_PRECISION_KEYS else precision)
+            for key, value in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        return [_orjson_ready(value, precision) for value in obj]
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == "f" and precision is not None:
+            # 在float64中取整 (float32放大10^precision后会丢失精度)
+            obj = np.round(obj.astype(np.float64), precision)
+        return np.ascontiguousarray(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def _get_orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def dump_json(
     filepath: Union[str, Path],
+    obj,
+    precision: Optional[int] = JSON_PRECISION,
+    use_orjson: Optional[bool] = None,
+):
+    """
+    快速写入JSON文件 (可直接包含numpy数组，替代 numpy_to_list + json.dump)
+
+    Args:
+        filepath: 输出文件路径
+        obj: 要保存的对象 (字典/列表/numpy数组/标量)
+        precision: 浮点数保留的小数位数，None为完整精度
+                   ("params" 键下的数组始终保留完整精度)
+        use_orjson: 是否使用orjson (默认: 已安装时使用)
+    """
+    orjson = _get_orjson() if use_orjson is not False else None
+    if use_orjson and orjson is None:
+        raise ImportError("use_orjson=True 需要安装orjson")
+    if orjson is not None:
+        data = orjson.dumps(
+            _orjson_ready(obj, precision), option=orjson.OPT_SERIALIZE_NUMPY
+        )
+        with atomic_write(filepath, "wb") as f:
+            f.write(data)
+        return filepath
+    # 逐段写入文件，不在内存中拼接完整的JSON文本
+    with atomic_write(filepath, "w") as f:
+        for chunk in _json_chunks(obj, precision):
+            f.write(chunk)
+    return filepath
+
+
+@contextmanager
+def atomic_write(filepath: Union[str, Path], mode: str = "wb"):
+    """
+    先写入同目录下的临时文件，成功后原子重命名为目标文件
+
+    进程中断时目标文件要么是完整的旧文件，要么是完整的新文件，不会只写了一半
+    """
+    filepath = Path(filepath)
+    tmp_path = filepath.with_name(f".{filepath.name}.tmp")
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+def is_binary_mhr(filepath: Union[str, Path]) -> bool:
+    """是否为二进制MHR文件 (.mhr.bin)"""
+    return str(filepath).endswith(MHR_BINARY_SUFFIX)
+
+
+def is_params_only(mhr_data: Dict) -> bool:
+    """MHR数据是否缺少网格 (仅参数模式保存，需要重建顶点)"""
+    if mhr_data.get("params_only"):
+        return True
+    return any(
+        person["mesh"].get("vertices") is None for person in mhr_data["people"]
+    )
+
+
+def build_mhr_data(
     outputs: List[Dict],
-    faces: np.ndarray,
+    faces: Optional[np.ndarray],
     image_path: Optional[str] = None,
     image_size: Optional[tuple] = None,
-):
+    params_only: bool = False,
+) -> Dict:
     """
-    保存MHR数据到JSON文件
+    构建MHR数据字典，数组字段保留为numpy数组
 
     Args:
-        filepath: 输出文件路径 (建议使用.mhr.json后缀)
         outputs: estimator.process_one_image()的输出列表
-        faces: 网格面片索引 (来自estimator.faces)
+        faces: 网格面片索引，为None时不保存faces (引用外部faces.json)
         image_path: 原始图片路径 (可选)
         image_size: 原始图片尺寸 (width, height) (可选)
+        params_only: 仅保存参数，不保存顶点、关键点和faces
     """
-    filepath = Path(filepath)
-
     mhr_data = {
         "version": "1.0",
         "image_path": str(image_path) if image_path else None,
         "image_size": list(image_size) if image_size else None,
         "num_people": len(outputs),
-        "faces": numpy_to_list(faces),
+        "faces": None if params_only else faces,
         "people": []
     }
+    if params_only:
+        mhr_data["params_only"] = True
 
     for i, person in enumerate(outputs):
         person_data = {
             "id": i,
-            "bbox": numpy_to_list(person.get("bbox")),
+            "bbox": person.get("bbox"),
             "focal_length": float(person.get("focal_length", 500.0)),
             "camera": {
-                "translation": numpy_to_list(person.get("pred_cam_t")),
+                "translation": person.get("pred_cam_t"),
             },
             "mesh": {
-                "vertices": numpy_to_list(person.get("pred_vertices")),
-                "keypoints_3d": numpy_to_list(person.get("pred_keypoints_3d")),
-                "keypoints_2d": numpy_to_list(person.get("pred_keypoints_2d")),
+                "vertices": person.get("pred_vertices"),
+                "keypoints_3d": person.get("pred_keypoints_3d"),
+                "keypoints_2d": person.get("pred_keypoints_2d"),
             },
             "params": {
-                "global_rot": numpy_to_list(person.get("global_rot")),
-                "body_pose": numpy_to_list(person.get("body_pose_params")),
-                "shape": numpy_to_list(person.get("shape_params")),
-                "scale": numpy_to_list(person.get("scale_params")),
-                "hand": numpy_to_list(person.get("hand_pose_params")),
-                "expression": numpy_to_list(person.get("expr_params")),
+                "global_rot": person.get("global_rot"),
+                "body_pose": person.get("body_pose_params"),
+                "shape": person.get("shape_params"),
+                "scale": person.get("scale_params"),
+                "hand": person.get("hand_pose_params"),
+                "expression": person.get("expr_params"),
             }
         }
+        if params_only:
+            person_data["mesh"] = dict.fromkeys(MESH_FIELDS)
         mhr_data["people"].append(person_data)
 
-    with open(filepath, 'w') as f:
-        json.dump(mhr_data, f)
+    return mhr_data
+
+
+def save_mhr(
+    filepath: Union[str, Path],
+    outputs: List[Dict],
+    faces: Optional[np.ndarray],
+    image_path: Optional[str] = None,
+    image_size: Optional[tuple] = None,
+    params_only: bool = False,
+    precision: Optional[int] = JSON_PRECISION,
+    verbose: bool = True,
+):
+    """
+    保存MHR数据到文件
+
+    Args:
+        filepath: 输出文件路径 (.mhr.json 为JSON格式，.mhr.bin 为二进制格式)
+        outputs: estimator.process_one_image()的输出列表
+        faces: 网格面片索引 (来自estimator.faces)，为None时不保存
+        image_path: 原始图片路径 (可选)
+        image_size: 原始图片尺寸 (width, height) (可选)
+        params_only: 仅保存参数 (不保存顶点、关键点和faces)，
+                     网格可用 tools/mhr_reconstruct.py 重建
+        precision: JSON中网格等浮点数保留的小数位数，None为完整精度
+        verbose: 打印保存路径
+    """
+    filepath = Path(filepath)
+
+    mhr_data = build_mhr_data(outputs, faces, image_path, image_size, params_only)
+
+    if is_binary_mhr(filepath):
+        save_mhr_binary(filepath, mhr_data)
+    else:
+        dump_json(filepath, mhr_data, precision)
+
+    if verbose:
+        print(f"MHR数据已保存到: {filepath}")
+    return filepath
+
+
+def save_mhr_without_faces(
+    filepath: Union[str, Path],
+    outputs: List[Dict],
+    image_path: Optional[str] = None,
+    image_size: Optional[tuple] = None,
+    **kwargs,
+):
+    """保存MHR数据但不包含faces (引用外部faces.json，节省空间)，其余参数同save_mhr"""
+    kwargs.setdefault("verbose", False)
+    return save_mhr(filepath, outputs, None, image_path, image_size, **kwargs)
+
+
+def _binary_dtype(array: np.ndarray) -> np.dtype:
+    """二进制格式中的数据类型: 浮点数为float32，整数为int32 (超出范围时为int64)"""
+    if array.dtype.kind == "f":
+        return np.dtype("<f4")
+    if array.dtype.kind in "iu":
+        if array.size == 0 or (
+            array.min() >= np.iinfo(np.int32).min and array.max() <= np.iinfo(np.int32).max
+        ):
+            return np.dtype("<i4")
+        return np.dtype("<i8")
+    if array.dtype.kind == "b":
+        return np.dtype("|b1")
+    raise TypeError(f"不支持的数组类型: {array.dtype}")
+
+
+def _align(offset: int) -> int:
+    return (offset + _BINARY_ALIGN - 1) // _BINARY_ALIGN * _BINARY_ALIGN
+
+
+def _array_fields(mhr_data: Dict):
+    """遍历MHR数据中的数组字段，返回 (所在字典, 键) 列表"""
+    fields = [(mhr_data, "faces")]
+    for person in mhr_data["people"]:
+        for path in _PERSON_ARRAY_FIELDS:
+            parent = person
+            for key in path[:-1]:
+                parent = parent[key]
+            fields.append((parent, path[-1]))
+    return fields
+
+
+def save_mhr_binary(filepath: Union[str, Path], mhr_data: Dict):
+    """
+    将MHR数据字典保存为二进制格式 (.mhr.bin)
+
+    Args:
+        filepath: 输出文件路径
+        mhr_data: build_mhr_data() 构建的数据字典 (数组字段可为numpy数组或列表)
+    """
+    header_data = json.loads(json.dumps(mhr_data, default=lambda o: None))
+    blocks = []
+    arrays = []
+    offset = 0
+    for (parent, key), (header_parent, _) in zip(
+        _array_fields(mhr_data), _array_fields(header_data)
+    ):
+        value = parent[key]
+        if value is None:
+            continue
+        array = np.asarray(value)
+        array = np.ascontiguousarray(array, dtype=_binary_dtype(array))
+        offset = _align(offset)
+        header_parent[key] = {"__block__": len(blocks)}
+        blocks.append({
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        })
+        arrays.append(array)
+        offset += array.nbytes
+
+    header = json.dumps(
+        {"data": header_data, "blocks": blocks}, separators=(",", ":")
+    ).encode("utf-8")
+    data_start = _align(_BINARY_PREFIX.size + len(header))
 
-    print(f"MHR数据已保存到: {filepath}")
+    with atomic_write(filepath, "wb") as f:
+        f.write(_BINARY_PREFIX.pack(_BINARY_MAGIC, _BINARY_VERSION, len(header)))
+        f.write(header)
+        for block, array in zip(blocks, arrays):
+            f.write(b"\0" * (data_start + block["offset"] - f.tell()))
+            f.write(memoryview(array).cast("B"))
     return filepath
 
 
-def load_mhr(filepath: Union[str, Path]) -> Dict:
+def load_mhr_binary(filepath: Union[str, Path], mmap: bool = True) -> Dict:
     """
-    从JSON文件加载MHR数据
+    从二进制文件 (.mhr.bin) 加载MHR数据
 
     Args:
         filepath: MHR文件路径
+        mmap: 使用内存映射，数组为文件的只读零拷贝视图；
+              否则一次性读入内存 (数组同样为只读视图)
+
+    Returns:
+        MHR数据字典，数组字段为numpy数组
+    """
+    with open(filepath, "rb") as f:
+        magic, version, header_len = _BINARY_PREFIX.unpack(f.read(_BINARY_PREFIX.size))
+        if magic != _BINARY_MAGIC:
+            raise ValueError(f"不是二进制MHR文件: {filepath}")
+        if version > _BINARY_VERSION:
+            raise ValueError(f"不支持的二进制MHR版本 {version}: {filepath}")
+        header = json.loads(f.read(header_len))
+        if mmap:
+            buffer = np.memmap(f, dtype=np.uint8, mode="r")
+        else:
+            f.seek(0)
+            buffer = f.read()
+    data_start = _align(_BINARY_PREFIX.size + header_len)
+
+    arrays = [
+        np.ndarray(
+            tuple(block["shape"]),
+            dtype=np.dtype(block["dtype"]),
+            buffer=buffer,
+            offset=data_start + block["offset"],
+        )
+        for block in header["blocks"]
+    ]
+
+    mhr_data = header["data"]
+    for parent, key in _array_fields(mhr_data):
+        value = parent[key]
+        if isinstance(value, dict) and "__block__" in value:
+            parent[key] = arrays[value["__block__"]]
+    return mhr_data
+
+
+def convert_mhr_to_binary(
+    json_path: Union[str, Path],
+    output_path: Optional[Union[str, Path]] = None,
+) -> Path:
+    """
+    将已有的.mhr.json文件转换为二进制格式
+
+    Args:
+        json_path: 输入的.mhr.json文件路径
+        output_path: 输出路径 (默认: 同目录下同名的.mhr.bin)
+
+    Returns:
+        输出文件路径
+    """
+    json_path = Path(json_path)
+    if output_path is None:
+        name = json_path.name
+        if name.endswith(MHR_JSON_SUFFIX):
+            name = name[: -len(MHR_JSON_SUFFIX)]
+        output_path = json_path.with_name(name + MHR_BINARY_SUFFIX)
+
+    with open(json_path, 'r') as f:
+        mhr_data = json.load(f)
+    for parent, key in _array_fields(mhr_data):
+        if parent.get(key) is not None:
+            parent[key] = np.asarray(parent[key])
+
+    save_mhr_binary(output_path, mhr_data)
+    return Path(output_path)
+
+
+def load_mhr(filepath: Union[str, Path], mmap: bool = False) -> Dict:
+    """
+    从文件加载MHR数据
+
+    Args:
+        filepath: MHR文件路径 (.mhr.json 或 .mhr.bin)
+        mmap: 仅对.mhr.bin有效，使用内存映射零拷贝读取数组
 
     Returns:
         MHR数据字典
     """
     filepath = Path(filepath)
 
-    with open(filepath, 'r') as f:
-        mhr_data = json.load(f)
+    if is_binary_mhr(filepath):
+        return load_mhr_binary(filepath, mmap=mmap)
 
-    # 将列表转回numpy数组
-    mhr_data["faces"] = np.array(mhr_data["faces"])
+    # 网格和faces直接解析为numpy数组，不经过Python列表
+    return MHRFile(filepath).load()
 
-    for person in mhr_data["people"]:
-        if person["mesh"]["vertices"]:
-            person["mesh"]["vertices"] = np.array(person["mesh"]["vertices"])
-        if person["mesh"]["keypoints_3d"]:
-            person["mesh"]["keypoints_3d"] = np.array(person["mesh"]["keypoints_3d"])
-        if person["mesh"]["keypoints_2d"]:
-            person["mesh"]["keypoints_2d"] = np.array(person["mesh"]["keypoints_2d"])
-        if person["camera"]["translation"]:
-            person["camera"]["translation"] = np.array(person["camera"]["translation"])
 
-    return mhr_data
+# 按需加载的大数组: JSON中 "键": [[...]] 形式的二维数字数组
+_LAZY_ARRAY_KEYS = ("faces",) + MESH_FIELDS
+_LAZY_JSON_ARRAY = re.compile(
+    r'"(%s)"\s*:\s*(\[\s*\[)' % "|".join(_LAZY_ARRAY_KEYS)
+)
+_JSON_ARRAY_END = re.compile(r"\]\s*\]")
+
+
+def _skip_json_arrays(text: str):
+    """
+    将JSON文本中的大数组替换为占位符 {"__span__": i}
+
+    数字数组中不会出现引号和括号，二维数组在第一个 "]]" 处结束，
+    因此无需解析其中的数字即可跳过。
+
+    Returns:
+        (骨架JSON文本, 每个数组在原文本中的 (起点, 终点) 列表)
+    """
+    parts, spans, pos = [], [], 0
+    for match in _LAZY_JSON_ARRAY.finditer(text):
+        start = match.start(2)
+        if start < pos:
+            continue
+        end = _JSON_ARRAY_END.search(text, match.end()).end()
+        parts.append(text[pos:start])
+        parts.append('{"__span__":%d}' % len(spans))
+        spans.append((start, end))
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts), spans
+
+
+def _parse_json_array(text: str, dtype) -> np.ndarray:
+    """解析二维JSON数字数组 (一次性向量化解析)"""
+    first_row = text[text.index("[", 1) : text.index("]") + 1]
+    cols = first_row.count(",") + 1
+    rows = text.count("]") - 1
+    values = np.fromstring(text.replace("[", " ").replace("]", " "), dtype=dtype, sep=",")
+    if values.size != rows * cols:
+        # 不规则数组或非数字内容
+        return np.array(json.loads(text))
+    return values.reshape(rows, cols)
+
+
+class MHRFile:
+    """
+    按需加载的MHR文件 (.mhr.json / .mhr.bin)
+
+    打开时只解析头部和每人的元信息 (bbox、相机、参数等)，顶点、关键点和faces
+    在第一次访问时才解码: .mhr.bin只读取JSON头部和小数据块，
+    .mhr.json跳过大数组中数字的解析。适合扫描大量输出文件。
+
+    使用方法:
+        mhr_file = MHRFile("output/video/frame_000000.mhr.json")
+        mhr_file.num_people, mhr_file.people[0]["bbox"]  # 不解码网格
+        vertices = mhr_file.mesh(0, "vertices")           # 解码第0人的顶点
+        mhr_data = mhr_file.load()                        # 与load_mhr()相同的完整数据
+    """
+
+    def __init__(self, filepath: Union[str, Path], mmap: bool = True):
+        """
+        Args:
+            filepath: MHR文件路径
+            mmap: 仅对.mhr.bin有效，大数组为文件的内存映射只读视图
+        """
+        self.path = Path(filepath)
+        self.mmap = mmap
+        # (人的序号 或 None, 字段名) -> 解码函数
+        self._loaders = {}
+        self._arrays = {}
+        if is_binary_mhr(self.path):
+            self.data = self._open_binary()
+        else:
+            self.data = self._open_json()
+
+    def _open_json(self) -> Dict:
+        with open(self.path, "r") as f:
+            text = f.read()
+        skeleton, spans = _skip_json_arrays(text)
+        mhr_data = json.loads(skeleton)
+
+        def lazy(key, value):
+            if isinstance(value, dict) and "__span__" in value:
+                start, end = spans[value["__span__"]]
+                dtype = np.int64 if key[1] == "faces" else np.float64
+                self._loaders[key] = lambda: _parse_json_array(text[start:end], dtype)
+                return None
+            if value is not None and value != []:
+                return np.array(value)
+            return value
+
+        mhr_data["faces"] = lazy((None, "faces"), mhr_data.get("faces"))
+        for i, person in enumerate(mhr_data["people"]):
+            for name in MESH_FIELDS:
+                person["mesh"][name] = lazy((i, name), person["mesh"].get(name))
+            if person["camera"]["translation"]:
+                person["camera"]["translation"] = np.array(person["camera"]["translation"])
+        return mhr_data
+
+    def _open_binary(self) -> Dict:
+        with open(self.path, "rb") as f:
+            magic, version, header_len = _BINARY_PREFIX.unpack(f.read(_BINARY_PREFIX.size))
+            if magic != _BINARY_MAGIC:
+                raise ValueError(f"不是二进制MHR文件: {self.path}")
+            if version > _BINARY_VERSION:
+                raise ValueError(f"不支持的二进制MHR版本 {version}: {self.path}")
+            header = json.loads(f.read(header_len))
+            data_start = _align(_BINARY_PREFIX.size + header_len)
+            blocks = header["blocks"]
+
+            def read_block(index):
+                block = blocks[index]
+                dtype = np.dtype(block["dtype"])
+                count = int(np.prod(block["shape"]))
+                f.seek(data_start + block["offset"])
+                return np.frombuffer(
+                    f.read(count * dtype.itemsize), dtype=dtype
+                ).reshape(block["shape"])
+
+            def lazy(key, value):
+                if isinstance(value, dict) and "__block__" in value:
+                    if key[1] in _LAZY_ARRAY_KEYS:
+                        index = value["__block__"]
+                        self._loaders[key] = lambda: self._read_block(
+                            blocks[index], data_start
+                        )
+                        return None
+                    # 小数组 (bbox、参数等) 直接读取
+                    return read_block(value["__block__"])
+                return value
+
+            mhr_data = header["data"]
+            mhr_data["faces"] = lazy((None, "faces"), mhr_data.get("faces"))
+            for i, person in enumerate(mhr_data["people"]):
+                for path in _PERSON_ARRAY_FIELDS:
+                    parent = person
+                    for key in path[:-1]:
+                        parent = parent[key]
+                    parent[path[-1]] = lazy((i, path[-1]), parent[path[-1]])
+        return mhr_data
+
+    def _read_block(self, block: Dict, data_start: int) -> np.ndarray:
+        dtype = np.dtype(block["dtype"])
+        offset = data_start + block["offset"]
+        if self.mmap:
+            return np.memmap(
+                self.path, dtype=dtype, mode="r", offset=offset, shape=tuple(block["shape"])
+            )
+        count = int(np.prod(block["shape"]))
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return np.frombuffer(f.read(count * dtype.itemsize), dtype=dtype).reshape(
+                block["shape"]
+            )
+
+    def _get(self, key) -> Optional[np.ndarray]:
+        if key not in self._arrays:
+            loader = self._loaders.get(key)
+            self._arrays[key] = loader() if loader is not None else None
+        return self._arrays[key]
+
+    @property
+    def num_people(self) -> int:
+        return len(self.data["people"])
+
+    @property
+    def people(self) -> List[Dict]:
+        """每人的元信息 (mesh中未解码的数组为None，用mesh()读取)"""
+        return self.data["people"]
+
+    @property
+    def image_path(self) -> Optional[str]:
+        return self.data.get("image_path")
+
+    @property
+    def image_size(self) -> Optional[List[int]]:
+        return self.data.get("image_size")
+
+    @property
+    def params_only(self) -> bool:
+        """文件中是否没有网格 (仅参数模式)"""
+        if self.data.get("params_only"):
+            return True
+        return any(
+            (i, "vertices") not in self._loaders and person["mesh"].get("vertices") is None
+            for i, person in enumerate(self.people)
+        )
+
+    @property
+    def faces(self) -> Optional[np.ndarray]:
+        """网格面片索引 (第一次访问时解码)"""
+        if (None, "faces") in self._loaders:
+            return self._get((None, "faces"))
+        return self.data.get("faces")
+
+    def mesh(self, person: int, name: str = "vertices") -> Optional[np.ndarray]:
+        """某人的网格字段 (vertices / keypoints_3d / keypoints_2d)，第一次访问时解码"""
+        if (person, name) in self._loaders:
+            return self._get((person, name))
+        return self.people[person]["mesh"].get(name)
+
+    def load(self) -> Dict:
+        """解码所有数组，返回与load_mhr()相同结构的完整数据字典"""
+        mhr_data = dict(self.data)
+        mhr_data["faces"] = self.faces
+        mhr_data["people"] = []
+        for i, person in enumerate(self.people):
+            person = dict(person)
+            person["mesh"] = {name: self.mesh(i, name) for name in MESH_FIELDS}
+            mhr_data["people"].append(person)
+        return mhr_data
+
+    def summary(self) -> Dict:
+        """文件摘要 (不解码网格): 文件名、人数、图片信息、每人的bbox"""
+        return {
+            "file": self.path.name,
+            "num_people": self.num_people,
+            "image_path": self.image_path,
+            "image_size": self.image_size,
+            "params_only": self.params_only,
+            "bboxes": [
+                numpy_to_list(person.get("bbox")) for person in self.people
+            ],
+        }
+
+
+def scan_mhr_files(filepaths) -> List[Dict]:
+    """批量读取MHR文件摘要 (只读取头部，不解码网格)"""
+    return [MHRFile(filepath).summary() for filepath in filepaths]
+
+
+def encode_obj_faces(faces: np.ndarray) -> bytes:
+    """
+    OBJ面片部分 ("f i j k" 行，索引从1开始)
+
+    同一拓扑导出多个网格时只需编码一次，结果可作为 faces 传给 export_obj
+    """
+    faces = np.asarray(faces, dtype=np.int64) + 1
+    return (("f %d %d %d\n" * len(faces)) % tuple(faces.ravel())).encode("ascii")
+
+
+def encode_ply_faces(faces: np.ndarray) -> bytes:
+    """二进制PLY的面片数据 (每个面: uchar 3 + 3个int32)，可作为 faces 传给 export_ply"""
+    faces = np.asarray(faces)
+    data = np.empty(len(faces), dtype=_PLY_FACE_DTYPE)
+    data["count"] = 3
+    data["indices"] = faces
+    return data.tobytes()
 
 
 def export_obj(
     filepath: Union[str, Path],
     vertices: np.ndarray,
-    faces: np.ndarray,
+    faces: Union[np.ndarray, bytes],
+    verbose: bool = True,
 ):
     """
     导出OBJ格式的3D模型文件
@@ -126,20 +757,70 @@ def export_obj(
     Args:
         filepath: 输出OBJ文件路径
         vertices: 顶点坐标 (N, 3)
-        faces: 面片索引 (M, 3)，从0开始
+        faces: 面片索引 (M, 3)，从0开始；或 encode_obj_faces() 的结果
+        verbose: 打印保存信息
     """
     filepath = Path(filepath)
+    if not isinstance(faces, bytes):
+        faces = encode_obj_faces(faces)
 
-    with open(filepath, 'w') as f:
-        f.write("# MHR exported mesh\n")
+    # 整体格式化顶点，不逐行写入
+    vertices = np.asarray(vertices, dtype=np.float64)
+    vertex_text = ("v %.6f %.6f %.6f\n" * len(vertices)) % tuple(vertices.ravel())
 
-        # 写入顶点
-        for v in vertices:
-            f.write(f"v {v[0]:.6f} {v[1]:.6f} {v[2]:.6f}\n")
+    with open(filepath, 'wb') as f:
+        f.write(b"# MHR exported mesh\n")
+        f.write(vertex_text.encode("ascii"))
+        f.write(faces)
+
+    if verbose:
+        print(f"OBJ文件已保存到: {filepath}")
+    return filepath
 
-        # 写入面片 (OBJ索引从1开始)
-        for face in faces:
-            f.write(f"f {face[0]+1} {face[1]+1} {face[2]+1}\n")
 
-    print(f"OBJ文件已保存到: {filepath}")
+def export_ply(
+    filepath: Union[str, Path],
+    vertices: np.ndarray,
+    faces: Union[np.ndarray, bytes],
+    verbose: bool = True,
+):
+    """
+    导出二进制PLY格式的3D模型文件 (小端float32顶点 + int32面片索引)
+
+    Args:
+        filepath: 输出PLY文件路径
+        vertices: 顶点坐标 (N, 3)
+        faces: 面片索引 (M, 3)，从0开始；或 encode_ply_faces() 的结果
+        verbose: 打印保存信息
+    """
+    filepath = Path(filepath)
+    if not isinstance(faces, bytes):
+        faces = encode_ply_faces(faces)
+    vertices = np.ascontiguousarray(vertices, dtype="<f4")
+    header = (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        "comment MHR exported mesh\n"
+        f"element vertex {len(vertices)}\n"
+        "property float x\n"
+        "property float y\n"
+        "property float z\n"
+        f"element face {len(faces) // _PLY_FACE_DTYPE.itemsize}\n"
+        "property list uchar int vertex_indices\n"
+        "end_header\n"
+    )
+
+    with open(filepath, 'wb') as f:
+        f.write(header.encode("ascii"))
+        f.write(vertices.tobytes())
+        f.write(faces)
+
+    if verbose:
+        print(f"PLY文件已保存到: {filepath}")
     return filepath
+
+
+MESH_EXPORTERS = {
+    "obj": (export_obj, encode_obj_faces),
+    "ply": (export_ply, encode_ply_faces),
+}
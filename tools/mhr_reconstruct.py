@@ -0,0 +1,331 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+MHR网格重建 - 由仅参数模式 (params_only) 保存的MHR参数按需重建网格
+
+仅参数模式只保存MHR参数、bbox和相机 (约为完整数据的1/100)，
+顶点、3D/2D关键点在需要时用MHR头重新计算，与推理时的最后一次
+mhr_forward完全相同 (global_trans为0，y/z轴翻转，取前70个关键点)。
+
+使用方法:
+    reconstructor = MeshReconstructor.from_checkpoint(checkpoint_path, mhr_path)
+    mhr_data = reconstructor.reconstruct_file("output/frame_000000.mhr.json")
+    frames = reconstructor.reconstruct_sequence(MHRSequence(path), range(0, 100))
+
+多帧一起重建时所有人合并为批次前向计算，最近重建的帧保存在LRU缓存中。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+
+from .mhr_io import MESH_FIELDS, is_params_only, load_mhr
+
+# (MHR数据中的参数名, mhr_forward的参数名)
+_FORWARD_PARAMS = (
+    ("global_rot", "global_rot"),
+    ("body_pose", "body_pose_params"),
+    ("hand", "hand_pose_params"),
+    ("scale", "scale_params"),
+    ("shape", "shape_params"),
+    ("expression", "expr_params"),
+)
+
+
+class MeshReconstructor:
+    """
+    由MHR参数批量重建顶点和关键点，带LRU帧缓存 (线程安全)
+
+    缓存以帧为单位，键由调用方给出 (文件路径、(序列路径, 帧号) 等)，
+    缓存的数组为只读，返回的MHR数据字典为浅拷贝，不修改输入。
+    """
+
+    def __init__(
+        self,
+        mhr_head,
+        device: Optional[Union[str, torch.device]] = None,
+        batch_size: int = 64,
+        cache_size: int = 256,
+    ):
+        """
+        Args:
+            mhr_head: 身体MHR头 (SAM3DBody.head_pose 或 load_mhr_head() 的返回值)
+            device: 计算设备 (默认: MHR头所在设备)
+            batch_size: 每次前向计算的最大人数
+            cache_size: 缓存的最大帧数 (0表示不缓存)
+        """
+        self.head = mhr_head.eval()
+        self.device = torch.device(device) if device else mhr_head.faces.device
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_checkpoint(
+        cls,
+        checkpoint_path: str,
+        mhr_path: str = "",
+        device: Optional[str] = None,
+        **kwargs,
+    ) -> "MeshReconstructor":
+        """只加载检查点 (或推理包) 中的MHR头来创建重建器"""
+        from sam_3d_body import load_mhr_head
+
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        mhr_head, _ = load_mhr_head(checkpoint_path, device=device, mhr_path=mhr_path)
+        return cls(mhr_head, device=device, **kwargs)
+
+    @property
+    def faces(self) -> np.ndarray:
+        """网格面片索引 (只读)"""
+        from sam_3d_body.models.heads.mhr_registry import faces_numpy
+
+        return faces_numpy(self.head.faces)
+
+    @torch.no_grad()
+    def forward(
+        self,
+        params: Dict[str, np.ndarray],
+        camera_translation: Optional[np.ndarray] = None,
+        focal_length: Optional[np.ndarray] = None,
+        image_size: Optional[np.ndarray] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        批量计算顶点和关键点
+
+        Args:
+            params: MHR参数名 -> [N, D] 数组 (global_rot、body_pose、hand、scale、shape、expression)
+            camera_translation: [N, 3] 相机平移，与 focal_length、image_size 一起用于投影2D关键点
+            focal_length: [N] 焦距
+            image_size: [N, 2] 原始图片尺寸 (width, height)
+
+        Returns:
+            {"vertices": [N, V, 3], "keypoints_3d": [N, 70, 3], "keypoints_2d": [N, 70, 2] 或None}
+        """
+        num = len(params["global_rot"])
+        project = (
+            camera_translation is not None
+            and focal_length is not None
+            and image_size is not None
+        )
+        outputs = {name: [] for name in MESH_FIELDS}
+        for start in range(0, num, self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            kwargs = {
+                arg: torch.as_tensor(
+                    np.asarray(params[name][batch], dtype=np.float32), device=self.device
+                )
+                for name, arg in _FORWARD_PARAMS
+            }
+            verts, j3d = self.head.mhr_forward(
+                global_trans=kwargs["global_rot"] * 0,
+                return_keypoints=True,
+                **kwargs,
+            )
+            # 与SAM3DBody.forward_step中的最后一次前向计算相同
+            j3d = j3d[:, :70]  # 308 --> 70 keypoints
+            verts[..., [1, 2]] *= -1  # Camera system difference
+            j3d[..., [1, 2]] *= -1  # Camera system difference
+            outputs["vertices"].append(verts.cpu().numpy())
+            outputs["keypoints_3d"].append(j3d.cpu().numpy())
+
+            if project:
+                cam_t = torch.as_tensor(
+                    np.asarray(camera_translation[batch], dtype=np.float32), device=self.device
+                )
+                focal = torch.as_tensor(
+                    np.asarray(focal_length[batch], dtype=np.float32), device=self.device
+                )
+                size = torch.as_tensor(
+                    np.asarray(image_size[batch], dtype=np.float32), device=self.device
+                )
+                proj = j3d + cam_t[:, None, :]
+                proj[:, :, [0, 1]] *= focal[:, None, None]
+                proj[:, :, [0, 1]] = proj[:, :, [0, 1]] + size[:, None, :] / 2 * proj[:, :, [2]]
+                proj[:, :, :2] = proj[:, :, :2] / proj[:, :, [2]]
+                outputs["keypoints_2d"].append(proj[:, :, :2].cpu().numpy())
+
+        return {
+            name: np.concatenate(arrays) if arrays else None
+            for name, arrays in outputs.items()
+        }
+
+    def _cached(self, key):
+        with self._lock:
+            meshes = self._cache.get(key)
+            if meshes is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            return meshes
+
+    def _store(self, key, meshes):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = meshes
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _compute(self, frames: List[Dict]) -> List[List[Dict]]:
+        """一次性重建多帧中所有人的网格，返回每帧每人的网格字段"""
+        people = [person for mhr_data in frames for person in mhr_data["people"]]
+        if not people:
+            return [[] for _ in frames]
+
+        params = {
+            name: np.stack([np.asarray(p["params"][name], dtype=np.float32) for p in people])
+            for name, _ in _FORWARD_PARAMS
+        }
+        camera_translation = focal_length = image_size = None
+        if all(
+            mhr_data.get("image_size") for mhr_data in frames if mhr_data["people"]
+        ) and all(p["camera"]["translation"] is not None for p in people):
+            camera_translation = np.stack([p["camera"]["translation"] for p in people])
+            focal_length = np.array([p["focal_length"] for p in people])
+            image_size = np.array([
+                mhr_data["image_size"]
+                for mhr_data in frames
+                for _ in mhr_data["people"]
+            ])
+
+        outputs = self.forward(params, camera_translation, focal_length, image_size)
+
+        meshes = []
+        i = 0
+        for mhr_data in frames:
+            frame_meshes = []
+            for _ in mhr_data["people"]:
+                mesh = {}
+                for name in MESH_FIELDS:
+                    array = outputs[name]
+                    if array is not None:
+                        array = array[i]
+                        array.setflags(write=False)
+                    mesh[name] = array
+                frame_meshes.append(mesh)
+                i += 1
+            meshes.append(frame_meshes)
+        return meshes
+
+    def reconstruct_frames(
+        self,
+        frames: Iterable[Tuple[object, Dict]],
+        include_faces: bool = False,
+    ) -> List[Dict]:
+        """
+        批量重建多帧的网格
+
+        Args:
+            frames: (缓存键, MHR数据字典) 列表，缓存键为None时不缓存
+            include_faces: 在结果中填入faces
+
+        Returns:
+            填入网格字段的MHR数据字典列表 (顺序与输入相同)
+        """
+        frames = list(frames)
+        meshes = [None] * len(frames)
+        missing = []
+        for i, (key, mhr_data) in enumerate(frames):
+            if not is_params_only(mhr_data):
+                continue
+            if key is not None:
+                meshes[i] = self._cached(key)
+            if meshes[i] is None:
+                missing.append(i)
+
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+                computed = self._compute([frames[i][1] for i in missing])
+            for i, frame_meshes in zip(missing, computed):
+                meshes[i] = frame_meshes
+                if frames[i][0] is not None:
+                    self._store(frames[i][0], frame_meshes)
+
+        results = []
+        for (_, mhr_data), frame_meshes in zip(frames, meshes):
+            mhr_data = dict(mhr_data)
+            if frame_meshes is not None:
+                mhr_data["people"] = [
+                    dict(person, mesh=mesh)
+                    for person, mesh in zip(mhr_data["people"], frame_meshes)
+                ]
+                mhr_data.pop("params_only", None)
+            if include_faces and mhr_data.get("faces") is None:
+                mhr_data["faces"] = self.faces
+            results.append(mhr_data)
+        return results
+
+    def reconstruct(
+        self, mhr_data: Dict, key=None, include_faces: bool = False
+    ) -> Dict:
+        """重建单帧的网格，不是仅参数模式的数据原样返回"""
+        return self.reconstruct_frames([(key, mhr_data)], include_faces)[0]
+
+    def reconstruct_file(
+        self, filepath: Union[str, Path], include_faces: bool = False
+    ) -> Dict:
+        """加载并重建 .mhr.json / .mhr.bin 文件 (文件修改后缓存自动失效)"""
+        filepath = Path(filepath)
+        key = (str(filepath.resolve()), os.stat(filepath).st_mtime_ns)
+        return self.reconstruct(load_mhr(filepath), key, include_faces)
+
+    def reconstruct_files(
+        self, filepaths: Iterable[Union[str, Path]], include_faces: bool = False
+    ) -> List[Dict]:
+        """批量加载并重建多个MHR文件 (例如一个帧范围)"""
+        frames = []
+        for filepath in filepaths:
+            filepath = Path(filepath)
+            key = (str(filepath.resolve()), os.stat(filepath).st_mtime_ns)
+            frames.append((key, load_mhr(filepath)))
+        return self.reconstruct_frames(frames, include_faces)
+
+    def reconstruct_sequence(
+        self,
+        sequence,
+        frame_indices: Optional[Iterable[int]] = None,
+        include_faces: bool = False,
+    ) -> Dict[int, Dict]:
+        """
+        批量重建MHR序列 (.mhrseq) 中的一段帧
+
+        Args:
+            sequence: tools.mhr_sequence.MHRSequence
+            frame_indices: 帧号列表或范围 (默认: 全部帧)，序列中没有的帧被跳过
+
+        Returns:
+            帧号 -> MHR数据字典
+        """
+        if frame_indices is None:
+            frame_indices = sequence.frame_indices
+        frame_indices = [i for i in frame_indices if i in sequence]
+        # 未finalize的序列仍在追加，记录数作为缓存键的一部分
+        base_key = (str(sequence.path.resolve()), sequence.num_records)
+        results = self.reconstruct_frames(
+            [((base_key, i), sequence.frame_mhr(i)) for i in frame_indices],
+            include_faces,
+        )
+        return dict(zip(frame_indices, results))
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def cache_info(self) -> Dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "max_size": self.cache_size,
+            }
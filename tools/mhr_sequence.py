@@ -0,0 +1,563 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+MHR序列存储 - 将整段视频的MHR数据保存在单个文件中 (.mhrseq)
+
+文件结构:
+    前缀 (魔数 b"MHRSEQ\\0\\0", 版本, 头部长度)
+    JSON头部 (视频元信息、每人记录的结构化dtype、faces数据块位置)
+    faces数据块 (int32，可选)
+    每人一条定长记录，按帧顺序追加 (frame_idx, person_id, bbox, 顶点, 关键点, 参数...)
+    帧索引 (frame_idx, 起始记录, 人数)          <- 以下部分在finalize时写入
+    JSON尾部 (记录数、索引位置、元信息)
+    结尾 (尾部位置, 尾部长度, 魔数 b"MHRSEND\\0")
+
+仅参数模式 (params_only=True) 的记录不含顶点和关键点，需要网格时由
+tools/mhr_reconstruct.py 按需重建。
+
+写入过程中文件名为 <名称>.mhrseq.partial，finalize后原子重命名为 <名称>.mhrseq。
+程序崩溃后留下的.partial文件仍可直接读取 (通过扫描记录重建索引)，
+也可以用 recover_sequence() 补写索引后转为正式文件。
+"""
+
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+SEQUENCE_SUFFIX = ".mhrseq"
+PARTIAL_SUFFIX = ".partial"
+
+_MAGIC = b"MHRSEQ\0\0"
+_END_MAGIC = b"MHRSEND\0"
+_VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+_TRAILER = struct.Struct("<QQ8s")
+_ALIGN = 64
+
+# (记录字段名, estimator输出中的键)
+SEQUENCE_FIELDS = (
+    ("bbox", "bbox"),
+    ("focal_length", "focal_length"),
+    ("camera_translation", "pred_cam_t"),
+    ("vertices", "pred_vertices"),
+    ("keypoints_3d", "pred_keypoints_3d"),
+    ("keypoints_2d", "pred_keypoints_2d"),
+    ("global_rot", "global_rot"),
+    ("body_pose", "body_pose_params"),
+    ("shape", "shape_params"),
+    ("scale", "scale_params"),
+    ("hand", "hand_pose_params"),
+    ("expression", "expr_params"),
+)
+
+# 可由MHR参数重建的字段 (仅参数模式下不保存)
+MESH_FIELDS = ("vertices", "keypoints_3d", "keypoints_2d")
+
+_INDEX_DTYPE = np.dtype([("frame_idx", "<i4"), ("start", "<i8"), ("count", "<i4")])
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def record_dtype(person: Optional[Dict] = None, params_only: bool = False) -> np.dtype:
+    """根据一个人的estimator输出确定每条记录的结构化dtype"""
+    fields = [("frame_idx", "<i4"), ("person_id", "<i4")]
+    if person is not None:
+        for name, key in SEQUENCE_FIELDS:
+            if params_only and name in MESH_FIELDS:
+                continue
+            value = person.get(key)
+            if value is not None:
+                fields.append((name, "<f4", np.shape(value)))
+    return np.dtype(fields)
+
+
+def _dtype_to_json(dtype: np.dtype) -> List:
+    return [
+        [name, dtype.fields[name][0].base.str, list(dtype.fields[name][0].shape)]
+        for name in dtype.names
+    ]
+
+
+def _dtype_from_json(fields: List) -> np.dtype:
+    return np.dtype([(name, base, tuple(shape)) for name, base, shape in fields])
+
+
+def _read_header(f):
+    magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+    if magic != _MAGIC:
+        raise ValueError(f"不是MHR序列文件: {f.name}")
+    if version > _VERSION:
+        raise ValueError(f"不支持的MHR序列版本 {version}: {f.name}")
+    return json.loads(f.read(header_len))
+
+
+def _build_index(frame_indices: np.ndarray) -> np.ndarray:
+    """由按帧顺序排列的记录的frame_idx重建帧索引"""
+    if len(frame_indices) == 0:
+        return np.zeros(0, dtype=_INDEX_DTYPE)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(frame_indices)) + 1])
+    index = np.zeros(len(starts), dtype=_INDEX_DTYPE)
+    index["frame_idx"] = frame_indices[starts]
+    index["start"] = starts
+    index["count"] = np.diff(np.concatenate([starts, [len(frame_indices)]]))
+    return index
+
+
+def _write_footer(f, index: np.ndarray, num_records: int, metadata: Dict):
+    """在文件末尾写入帧索引、JSON尾部和结尾"""
+    index_offset = f.tell()
+    f.write(index.tobytes())
+    footer = json.dumps({
+        "num_records": num_records,
+        "num_frames": len(index),
+        "index_offset": index_offset,
+        "metadata": metadata,
+    }).encode("utf-8")
+    footer_offset = f.tell()
+    f.write(footer)
+    f.write(_TRAILER.pack(footer_offset, len(footer), _END_MAGIC))
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class MHRSequenceWriter:
+    """
+    逐帧追加写入MHR序列文件
+
+    使用方法:
+        with MHRSequenceWriter(path, faces=estimator.faces, metadata=info) as writer:
+            for frame_idx, outputs in ...:
+                writer.append(frame_idx, outputs)
+
+    退出with语句 (包括异常退出) 时自动finalize，已写入的帧不会丢失。
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        faces: Optional[np.ndarray] = None,
+        metadata: Optional[Dict] = None,
+        params_only: bool = False,
+    ):
+        """
+        Args:
+            path: 输出路径 (建议使用.mhrseq后缀)
+            faces: 网格面片索引 (来自estimator.faces)，所有帧共用
+            metadata: 视频元信息 (fps、分辨率等)，保存在头部
+            params_only: 仅保存参数 (不保存顶点、关键点和faces)
+        """
+        self.path = Path(path)
+        self.partial_path = Path(str(self.path) + PARTIAL_SUFFIX)
+        self.faces = None if params_only else faces
+        self.params_only = params_only
+        self.metadata = dict(metadata or {})
+        if params_only:
+            self.metadata["params_only"] = True
+        self.dtype = None
+        self._file = None
+        self._finalized = False
+        self._num_records = 0
+        self._index = []
+
+    @classmethod
+    def resume(
+        cls,
+        path: Union[str, Path],
+        faces: Optional[np.ndarray] = None,
+        metadata: Optional[Dict] = None,
+        params_only: bool = False,
+    ) -> "MHRSequenceWriter":
+        """
+        继续写入已有的序列文件 (中断后留下的.partial文件或已finalize的文件)
+
+        已有的帧保留 (不完整的最后一条记录被截断)，frames 为已写入的帧；
+        文件不存在或没有记录时与直接创建相同。
+        """
+        writer = cls(path, faces=faces, metadata=metadata, params_only=params_only)
+        source = writer.partial_path if writer.partial_path.exists() else writer.path
+        if not source.exists():
+            return writer
+
+        sequence = MHRSequence(source)
+        if sequence.num_records == 0:
+            # 没有记录的序列只有占位的记录结构 (frame_idx, person_id)，由第一帧重新确定
+            del sequence
+            source.unlink()
+            return writer
+        if sequence.params_only != params_only:
+            raise ValueError(f"已有序列文件的仅参数模式与当前设置不同: {source}")
+        records_end = sequence.records_offset + sequence.num_records * sequence.dtype.itemsize
+        writer.dtype = sequence.dtype
+        writer.metadata = dict(sequence.metadata, **writer.metadata)
+        writer._index = [tuple(int(v) for v in row) for row in sequence.index]
+        writer._num_records = sequence.num_records
+        del sequence
+
+        if source != writer.partial_path:
+            os.replace(source, writer.partial_path)
+        writer._file = open(writer.partial_path, "r+b")
+        # 去掉footer (已finalize时) 或不完整的记录，从记录末尾继续追加
+        writer._file.truncate(records_end)
+        writer._file.seek(records_end)
+        return writer
+
+    @property
+    def frames(self) -> Dict[int, int]:
+        """已写入的帧: {帧号: 人数}"""
+        return {frame_idx: count for frame_idx, _, count in self._index}
+
+    def _open(self, dtype: np.dtype):
+        self.dtype = dtype
+        faces = None
+        if self.faces is not None:
+            faces = np.ascontiguousarray(self.faces, dtype="<i4")
+
+        header = {
+            "metadata": self.metadata,
+            "record_dtype": _dtype_to_json(self.dtype),
+            "faces": None,
+            "records_offset": 0,
+        }
+        # 头部长度依赖于其中的偏移量，用定宽数字预留位置
+        header_len = len(json.dumps(dict(
+            header,
+            faces={"shape": [0, 0], "offset": 10**15} if faces is not None else None,
+            records_offset=10**15,
+        )).encode("utf-8"))
+        offset = _align(_PREFIX.size + header_len)
+        if faces is not None:
+            header["faces"] = {"shape": list(faces.shape), "offset": offset}
+            offset = _align(offset + faces.nbytes)
+        header["records_offset"] = offset
+        header_bytes = json.dumps(header).encode("utf-8").ljust(header_len)
+
+        self.partial_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.partial_path, "wb")
+        self._file.write(_PREFIX.pack(_MAGIC, _VERSION, header_len))
+        self._file.write(header_bytes)
+        if faces is not None:
+            self._file.write(b"\0" * (header["faces"]["offset"] - self._file.tell()))
+            self._file.write(memoryview(faces).cast("B"))
+        self._file.write(b"\0" * (offset - self._file.tell()))
+        self._file.flush()
+
+    def append(self, frame_idx: int, outputs: List[Dict]):
+        """追加一帧的estimator输出 (未检测到人体的帧不写入)"""
+        if not outputs:
+            return
+        if self._file is None:
+            self._open(record_dtype(outputs[0], self.params_only))
+
+        records = np.zeros(len(outputs), dtype=self.dtype)
+        records["frame_idx"] = frame_idx
+        records["person_id"] = np.arange(len(outputs))
+        for name, key in SEQUENCE_FIELDS:
+            if name not in self.dtype.names:
+                continue
+            for i, person in enumerate(outputs):
+                value = person.get(key)
+                if value is not None:
+                    records[name][i] = value
+        self._write_records(frame_idx, records)
+
+    def extend(self, sequence: "MHRSequence", frame_indices: Optional[List[int]] = None):
+        """
+        追加另一个序列文件中的帧 (记录结构必须相同)，用于合并分片处理的结果
+
+        Args:
+            sequence: 已打开的序列文件 (可以是.partial文件)
+            frame_indices: 要追加的帧号 (默认: 全部，按其写入顺序)
+        """
+        if sequence.num_records == 0:
+            # 没有检测到人体的分片只有占位的记录结构 (frame_idx, person_id)，不能用它确定结构
+            return
+        if self._file is None:
+            if self.faces is None and not self.params_only:
+                self.faces = sequence.faces
+            self._open(sequence.dtype)
+        elif sequence.dtype != self.dtype:
+            raise ValueError(f"序列记录结构不同，无法合并: {sequence.path}")
+        if frame_indices is None:
+            frame_indices = sequence.frame_indices
+        for frame_idx in frame_indices:
+            self._write_records(frame_idx, sequence.frame(frame_idx))
+
+    def _write_records(self, frame_idx: int, records: np.ndarray):
+        self._file.write(np.ascontiguousarray(records).tobytes())
+        self._file.flush()
+        self._index.append((frame_idx, self._num_records, len(records)))
+        self._num_records += len(records)
+
+    def finalize(self, metadata: Optional[Dict] = None) -> Path:
+        """
+        写入帧索引并原子重命名为正式文件
+
+        已经finalize时不做任何事 (再次写入会用空序列覆盖正式文件)
+
+        Args:
+            metadata: 需要更新的元信息 (可选)
+        """
+        if self._finalized:
+            return self.path
+        if metadata:
+            self.metadata.update(metadata)
+        if self._file is None:
+            self._open(record_dtype(None, self.params_only))
+        index = np.array(self._index, dtype=_INDEX_DTYPE)
+        _write_footer(self._file, index, self._num_records, self.metadata)
+        self._file.close()
+        self._file = None
+        os.replace(self.partial_path, self.path)
+        self._finalized = True
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finalize()
+
+
+class MHRSequence:
+    """
+    读取MHR序列文件 (内存映射，任意帧O(1)随机访问)
+
+    也可以直接打开崩溃后留下的.partial文件，此时通过扫描记录重建帧索引。
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        # 序列名 (不含.partial后缀)
+        self.name = self.path.name
+        if self.name.endswith(PARTIAL_SUFFIX):
+            self.name = self.name[: -len(PARTIAL_SUFFIX)]
+        with open(self.path, "rb") as f:
+            header = _read_header(f)
+            file_size = os.fstat(f.fileno()).st_size
+
+            self.dtype = _dtype_from_json(header["record_dtype"])
+            self.metadata = header["metadata"]
+            records_offset = header["records_offset"]
+
+            footer = None
+            if file_size >= records_offset + _TRAILER.size:
+                f.seek(file_size - _TRAILER.size)
+                footer_offset, footer_len, end_magic = _TRAILER.unpack(f.read(_TRAILER.size))
+                if end_magic == _END_MAGIC:
+                    f.seek(footer_offset)
+                    footer = json.loads(f.read(footer_len))
+
+            if footer is not None:
+                self.finalized = True
+                self.metadata = footer["metadata"]
+                num_records = footer["num_records"]
+                f.seek(footer["index_offset"])
+                index = np.frombuffer(
+                    f.read(footer["num_frames"] * _INDEX_DTYPE.itemsize), dtype=_INDEX_DTYPE
+                )
+            else:
+                # 未finalize: 只保留完整的记录
+                self.finalized = False
+                num_records = max(file_size - records_offset, 0) // self.dtype.itemsize
+                index = None
+
+        self.num_records = num_records
+        self.records_offset = records_offset
+        if num_records > 0:
+            self.records = np.memmap(
+                self.path, dtype=self.dtype, mode="r",
+                offset=records_offset, shape=(num_records,),
+            )
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+        if index is None:
+            index = _build_index(np.asarray(self.records["frame_idx"]))
+        self.index = index
+        self._frames = {
+            int(frame_idx): (int(start), int(count))
+            for frame_idx, start, count in index
+        }
+
+        self.faces = None
+        if header["faces"] is not None:
+            self.faces = np.memmap(
+                self.path, dtype="<i4", mode="r",
+                offset=header["faces"]["offset"], shape=tuple(header["faces"]["shape"]),
+            )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, frame_idx: int) -> bool:
+        return frame_idx in self._frames
+
+    @property
+    def frame_indices(self) -> List[int]:
+        """已保存的帧号 (按写入顺序)"""
+        return [int(i) for i in self.index["frame_idx"]]
+
+    def frame(self, frame_idx: int) -> np.ndarray:
+        """某一帧所有人的记录 (结构化数组，文件的零拷贝视图)"""
+        start, count = self._frames[frame_idx]
+        return self.records[start : start + count]
+
+    def field(self, name: str) -> np.ndarray:
+        """所有记录的某个字段，形状为 (记录数, ...)"""
+        return self.records[name]
+
+    def dense(
+        self,
+        name: str,
+        fill_value: float = np.nan,
+        start: int = 0,
+        stop: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        某个字段按 [帧, 人, ...] 排列的稠密数组 (人数不足处填充fill_value)
+
+        例如 dense("vertices") 的形状为 [T, P, V, 3]；start / stop 为帧的位置范围
+        (按写入顺序，不是帧号)，只读取这些帧，人数维度仍为整段序列的最大人数
+        """
+        field = self.records[name]
+        max_people = int(self.index["count"].max()) if len(self.index) else 0
+        index = self.index[start:stop]
+        out = np.full((len(index), max_people) + field.shape[1:], fill_value, dtype=field.dtype)
+        for t, (_, first, count) in enumerate(index):
+            out[t, :count] = field[first : first + count]
+        return out
+
+    @property
+    def params_only(self) -> bool:
+        """记录中是否缺少顶点 (仅参数模式保存，需要重建网格)"""
+        return "vertices" not in self.dtype.names
+
+    def frame_mhr(self, frame_idx: int, include_faces: bool = False) -> Dict:
+        """某一帧的MHR数据字典，结构与.mhr.json相同 (数组为numpy数组)"""
+        return records_to_mhr(
+            self.frame(frame_idx),
+            frame_idx,
+            self.metadata,
+            self.faces if include_faces else None,
+        )
+
+    def frame_file(self, frame_idx: int) -> str:
+        """video_info.json中引用该帧的文件名 (查看器通过 /api/frame/<文件名> 加载)"""
+        return sequence_frame_file(self.name, frame_idx)
+
+    def video_info(self) -> Dict:
+        """由序列文件生成video_info.json格式的视频信息"""
+        video_info = dict(self.metadata)
+        video_info["sequence"] = self.name
+        video_info["processed_frames"] = [
+            {
+                "frame_idx": int(frame_idx),
+                "file": self.frame_file(int(frame_idx)),
+                "num_people": int(count),
+            }
+            for frame_idx, _, count in self.index
+        ]
+        return video_info
+
+
+def records_to_mhr(
+    records: np.ndarray,
+    frame_idx: int,
+    metadata: Dict,
+    faces: Optional[np.ndarray] = None,
+) -> Dict:
+    """由一帧的序列记录构建MHR数据字典，结构与.mhr.json相同 (数组为numpy数组)"""
+    names = records.dtype.names
+
+    def get(record, name):
+        return record[name] if name in names else None
+
+    width, height = metadata.get("width"), metadata.get("height")
+    people = []
+    for record in records:
+        people.append({
+            "id": int(record["person_id"]),
+            "bbox": get(record, "bbox"),
+            "focal_length": float(record["focal_length"]) if "focal_length" in names else 500.0,
+            "camera": {
+                "translation": get(record, "camera_translation"),
+            },
+            "mesh": {
+                "vertices": get(record, "vertices"),
+                "keypoints_3d": get(record, "keypoints_3d"),
+                "keypoints_2d": get(record, "keypoints_2d"),
+            },
+            "params": {
+                "global_rot": get(record, "global_rot"),
+                "body_pose": get(record, "body_pose"),
+                "shape": get(record, "shape"),
+                "scale": get(record, "scale"),
+                "hand": get(record, "hand"),
+                "expression": get(record, "expression"),
+            },
+        })
+    mhr_data = {
+        "version": "1.0",
+        "image_path": f"frame_{frame_idx}",
+        "image_size": [width, height] if width and height else None,
+        "num_people": len(people),
+        "faces": faces,
+        "people": people,
+    }
+    if "vertices" not in names:
+        mhr_data["params_only"] = True
+    return mhr_data
+
+
+def sequence_frame_file(sequence_name: str, frame_idx: int) -> str:
+    """序列中某一帧在video_info.json中的文件名: <序列文件名>/<帧号>"""
+    return f"{sequence_name}/{frame_idx}"
+
+
+def parse_sequence_frame_file(frame_file: str):
+    """解析 sequence_frame_file() 生成的文件名，不是序列帧时返回None"""
+    sequence_name, _, frame_idx = frame_file.rpartition("/")
+    if not frame_idx.isdigit() or not sequence_name.endswith(SEQUENCE_SUFFIX):
+        return None
+    return sequence_name, int(frame_idx)
+
+
+def find_sequence_files(folder: Union[str, Path]) -> List[Path]:
+    """查找目录中的序列文件 (包括未finalize的.partial文件)"""
+    folder = Path(folder)
+    return sorted(folder.glob(f"*{SEQUENCE_SUFFIX}")) + sorted(
+        folder.glob(f"*{SEQUENCE_SUFFIX}{PARTIAL_SUFFIX}")
+    )
+
+
+def recover_sequence(partial_path: Union[str, Path]) -> Path:
+    """
+    将崩溃后留下的.partial文件补写索引并转为正式文件
+
+    不完整的最后一条记录会被截断。
+
+    Returns:
+        正式文件路径
+    """
+    partial_path = Path(partial_path)
+    if not str(partial_path).endswith(PARTIAL_SUFFIX):
+        raise ValueError(f"不是未完成的序列文件: {partial_path}")
+    sequence = MHRSequence(partial_path)
+    if sequence.finalized:
+        raise ValueError(f"序列文件已完成: {partial_path}")
+    index, num_records, metadata = sequence.index, sequence.num_records, sequence.metadata
+    records_end = sequence.records_offset + num_records * sequence.dtype.itemsize
+    del sequence
+
+    with open(partial_path, "r+b") as f:
+        f.truncate(records_end)
+        f.seek(0, os.SEEK_END)
+        _write_footer(f, index, num_records, metadata)
+
+    final_path = Path(str(partial_path)[: -len(PARTIAL_SUFFIX)])
+    os.replace(partial_path, final_path)
+    return final_path
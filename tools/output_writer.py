@@ -0,0 +1,178 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+异步输出写入 - 在后台线程中保存MHR文件和渲染可视化，推理循环不等待磁盘和渲染
+
+使用方法:
+    with AsyncOutputWriter(max_pending=8) as writer:
+        for frame_idx in frames:
+            outputs = estimator.process_one_image(...)
+            writer.submit(
+                save_mhr, path, outputs, faces,
+                record={"frame_idx": frame_idx, "file": path.name},
+            )
+    video_info["processed_frames"] = writer.records
+
+- 有界队列: 未完成的任务达到 max_pending 时 submit 阻塞 (反压)，内存不会无限增长
+- 顺序记录: 任务可以乱序完成，records 按提交顺序只包含已成功完成的任务；
+  on_record 回调在记录加入 records 时按同样的顺序调用 (例如追加到处理清单)
+- flush() 等待所有已提交任务完成，close() 在此基础上关闭线程池；
+  任务中的异常在下一次 submit / flush / close 时抛出
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+
+class AsyncOutputWriter:
+    """
+    有界、按提交顺序记录完成情况的后台输出写入器
+
+    使用线程而不是进程: 推理时PyTorch释放GIL，写文件和OpenCV编码也大多释放GIL，
+    且不需要把网格数据序列化到其他进程。可视化渲染 (pyrender EGL) 要求同一时间
+    只有一个线程渲染，默认只用一个工作线程。
+    """
+
+    def __init__(
+        self,
+        max_pending: int = 8,
+        num_workers: int = 1,
+        on_record: Optional[Callable[[Dict], None]] = None,
+    ):
+        """
+        Args:
+            max_pending: 最多同时排队/执行的任务数，0表示同步执行 (不使用后台线程)
+            num_workers: 工作线程数 (>1时任务可能乱序完成，records仍按提交顺序)
+            on_record: 任务成功、记录加入records时调用 on_record(record)
+        """
+        self.max_pending = max_pending
+        self.on_record = on_record
+        self._executor = (
+            ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="output_writer")
+            if max_pending > 0
+            else None
+        )
+        self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self._lock = threading.Lock()
+        self._all_done = threading.Condition(self._lock)
+        self._pending = 0
+        self._next_seq = 0  # 下一个提交序号
+        self._next_record = 0  # 下一个要放入records的序号
+        self._finished = {}  # 序号 -> 记录 (失败的任务为None)
+        self._error = None
+        self._closed = False
+        self.records: List[Dict] = []
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        record: Optional[Dict] = None,
+        **kwargs,
+    ):
+        """
+        提交一个输出任务，队列已满时阻塞直到有任务完成
+
+        Args:
+            fn: 在后台线程中执行的函数 (例如 save_mhr)
+            record: 任务成功后按提交顺序加入 records 的记录 (None表示不记录)
+        """
+        if self._closed:
+            raise RuntimeError("AsyncOutputWriter已关闭")
+        self._raise_error()
+
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending += 1
+
+        if self._executor is None:
+            self._run(seq, fn, args, kwargs, record)
+            self._raise_error()
+            return
+
+        self._slots.acquire()
+        try:
+            self._executor.submit(self._run, seq, fn, args, kwargs, record)
+        except BaseException:
+            self._slots.release()
+            self._finish(seq, None)
+            raise
+
+    def _run(self, seq, fn, args, kwargs, record):
+        try:
+            fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            record = None
+        finally:
+            if self._executor is not None:
+                self._slots.release()
+        self._finish(seq, record)
+
+    def _finish(self, seq, record):
+        with self._lock:
+            self._finished[seq] = record
+            # 只有之前的任务都完成后才把记录加入records，保证顺序
+            while self._next_record in self._finished:
+                record = self._finished.pop(self._next_record)
+                if record is not None:
+                    self.records.append(record)
+                    if self.on_record is not None:
+                        self._notify(record)
+                self._next_record += 1
+            self._pending -= 1
+            if self._pending == 0:
+                self._all_done.notify_all()
+
+    def _notify(self, record):
+        try:
+            self.on_record(record)
+        except Exception as e:
+            if self._error is None:
+                self._error = e
+
+    def _raise_error(self):
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    @property
+    def pending(self) -> int:
+        """未完成的任务数"""
+        with self._lock:
+            return self._pending
+
+    def flush(self):
+        """等待所有已提交的任务完成，有任务失败时抛出其异常"""
+        with self._all_done:
+            while self._pending > 0:
+                self._all_done.wait()
+        self._raise_error()
+
+    def close(self):
+        """等待所有任务完成并关闭工作线程 (可重复调用)"""
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        # 已有异常时仍等待已提交的任务写完，但不覆盖原异常
+        try:
+            self.close()
+        except Exception as e:
+            print(f"警告: 输出任务失败: {e}")
@@ -0,0 +1,362 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+分阶段流水线 - 将逐帧处理拆成多个阶段，各阶段在自己的线程中并行运行
+
+    解码 (PrefetchVideoReader) -> 检测 -> 预处理 -> 推理 -> 后处理 -> 保存 (AsyncOutputWriter)
+
+阶段之间用有界队列连接 (反压)，每个阶段可以有多个工作线程，
+总吞吐量由最慢的阶段决定，而不是所有阶段耗时之和。结果按输入顺序产生。
+
+某一项在某个阶段返回 SKIP 或抛出异常时，之后的阶段跳过这一项，
+结果中为 StageResult.skipped / StageResult.error，由调用方决定如何处理。
+
+使用方法:
+    pipeline = StagePipeline([
+        Stage("detect", detect_fn),
+        Stage("prepare", prepare_fn, workers=2),
+        Stage("infer", infer_fn),
+    ])
+    for result in pipeline.run(items):
+        ...
+    print(pipeline.format_stats())
+
+使用线程而不是进程: 各阶段的主要开销 (CUDA、OpenCV) 都释放GIL，
+且阶段之间传递的是大图像和GPU张量，放到其他进程需要序列化和复制。
+"""
+
+import queue
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# 阶段函数返回SKIP时之后的阶段跳过这一项
+SKIP = object()
+
+_END = object()
+_POLL = 0.1
+
+
+class Stage:
+    """流水线中的一个阶段"""
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, queue_size: int = 4):
+        """
+        Args:
+            name: 阶段名称 (用于统计)
+            fn: 处理函数 fn(item) -> 结果 (传给下一阶段)，返回SKIP表示跳过
+            workers: 工作线程数 (推理等非线程安全的阶段必须为1)
+            queue_size: 输入队列长度
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(workers, 1)
+        self.queue_size = max(queue_size, 1)
+
+
+class StageResult:
+    """一项经过流水线后的结果"""
+
+    __slots__ = ("index", "item", "value", "skipped", "error", "stage")
+
+    def __init__(self, index: int, item):
+        self.index = index
+        self.item = item  # 输入项
+        self.value = item  # 最后一个阶段的结果
+        self.skipped = False
+        self.error: Optional[BaseException] = None
+        self.stage: Optional[str] = None  # 跳过或出错的阶段
+
+    @property
+    def ok(self) -> bool:
+        return not self.skipped and self.error is None
+
+
+class _StageStats:
+    def __init__(self, stage: Stage):
+        self.stage = stage
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.busy = 0.0  # 执行fn的总时间 (所有线程之和)
+        self.wait_input = 0.0  # 等待输入的总时间
+        self.wait_output = 0.0  # 等待下一阶段队列的总时间 (反压)
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self.depth_max = 0
+
+    def sample_depth(self, depth: int):
+        with self.lock:
+            self.depth_sum += depth
+            self.depth_samples += 1
+            self.depth_max = max(self.depth_max, depth)
+
+    def as_dict(self, elapsed: float) -> Dict:
+        workers = self.stage.workers
+        return {
+            "stage": self.stage.name,
+            "workers": workers,
+            "processed": self.processed,
+            "busy_s": self.busy,
+            "ms_per_item": 1000 * self.busy / self.processed if self.processed else 0.0,
+            # 工作线程忙碌时间占比，接近1的阶段是瓶颈
+            "utilization": self.busy / (workers * elapsed) if elapsed > 0 else 0.0,
+            "wait_input_s": self.wait_input,
+            "wait_output_s": self.wait_output,
+            "queue_mean": self.depth_sum / self.depth_samples if self.depth_samples else 0.0,
+            "queue_max": self.depth_max,
+            "queue_size": self.stage.queue_size,
+        }
+
+
+class StagePipeline:
+    """由有界队列连接的多阶段线程流水线"""
+
+    def __init__(self, stages: List[Stage]):
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = stages
+        self._stats = [_StageStats(stage) for stage in stages]
+        self._elapsed = 0.0
+
+    def _get(self, q: queue.Queue, stop: threading.Event):
+        while True:
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                if stop.is_set():
+                    return _END
+
+    def _put(self, q: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker(self, i, in_q, out_q, remaining, lock, stop):
+        stage = self.stages[i]
+        stats = self._stats[i]
+        next_workers = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+        while True:
+            t0 = time.perf_counter()
+            stats.sample_depth(in_q.qsize())
+            result = self._get(in_q, stop)
+            t1 = time.perf_counter()
+            if result is _END:
+                break
+
+            busy = 0.0
+            if result.ok:
+                try:
+                    value = stage.fn(result.value)
+                    if value is SKIP:
+                        result.skipped = True
+                        result.stage = stage.name
+                    else:
+                        result.value = value
+                except Exception as e:
+                    result.error = e
+                    result.stage = stage.name
+                busy = time.perf_counter() - t1
+
+            t2 = time.perf_counter()
+            self._put(out_q, result, stop)
+            with stats.lock:
+                stats.processed += 1
+                stats.busy += busy
+                stats.wait_input += t1 - t0
+                stats.wait_output += time.perf_counter() - t2
+            if stop.is_set():
+                return
+
+        # 本阶段最后一个结束的线程通知下一阶段的所有线程结束
+        with lock:
+            remaining[i] -= 1
+            last = remaining[i] == 0
+        if last:
+            for _ in range(next_workers):
+                self._put(out_q, _END, stop)
+
+    def run(self, items: Iterable) -> Iterator[StageResult]:
+        """
+        处理所有输入项，按输入顺序产生 StageResult
+
+        提前停止迭代 (break或异常) 时所有线程都会结束。
+        """
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        out_q = queue.Queue(maxsize=max(stage.workers for stage in self.stages) * 2 + 2)
+        remaining = [stage.workers for stage in self.stages]
+        lock = threading.Lock()
+        feed_error = []
+
+        def feed():
+            try:
+                for index, item in enumerate(items):
+                    if not self._put(queues[0], StageResult(index, item), stop):
+                        return
+            except BaseException as e:
+                feed_error.append(e)
+            for _ in range(self.stages[0].workers):
+                self._put(queues[0], _END, stop)
+
+        threads = [threading.Thread(target=feed, name="pipeline_feed", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            next_q = queues[i + 1] if i + 1 < len(self.stages) else out_q
+            for w in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._worker,
+                    args=(i, queues[i], next_q, remaining, lock, stop),
+                    name=f"pipeline_{stage.name}_{w}",
+                    daemon=True,
+                ))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            # 多线程阶段可能乱序完成，按输入顺序重排
+            pending = {}
+            next_index = 0
+            while True:
+                result = self._get(out_q, stop)
+                if result is _END:
+                    break
+                pending[result.index] = result
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+            if feed_error:
+                raise feed_error[0]
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self._elapsed += time.perf_counter() - start
+
+    def run_inline(self, items: Iterable) -> Iterator[StageResult]:
+        """
+        与 run() 结果相同，但所有阶段依次在调用线程中运行 (不并行)
+
+        用于torch.profiler等只记录当前线程的工具 (见 process_video.py --profile)。
+        """
+        start = time.perf_counter()
+        try:
+            for index, item in enumerate(items):
+                result = StageResult(index, item)
+                for stage, stats in zip(self.stages, self._stats):
+                    if not result.ok:
+                        break
+                    t0 = time.perf_counter()
+                    try:
+                        value = stage.fn(result.value)
+                        if value is SKIP:
+                            result.skipped = True
+                            result.stage = stage.name
+                        else:
+                            result.value = value
+                    except Exception as e:
+                        result.error = e
+                        result.stage = stage.name
+                    with stats.lock:
+                        stats.processed += 1
+                        stats.busy += time.perf_counter() - t0
+                yield result
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def stats(self) -> List[Dict]:
+        """各阶段的统计: 处理数、忙碌时间、利用率、等待时间、队列深度"""
+        return [stats.as_dict(self._elapsed) for stats in self._stats]
+
+    def format_stats(self) -> str:
+        """统计表格 (利用率最高的阶段是瓶颈)"""
+        header = ["阶段", "线程", "处理", "ms/项", "利用率", "等输入s", "等输出s", "队列均值", "队列最大"]
+        rows = [
+            [
+                s["stage"],
+                str(s["workers"]),
+                str(s["processed"]),
+                f"{s['ms_per_item']:.1f}",
+                f"{s['utilization']:.0%}",
+                f"{s['wait_input_s']:.1f}",
+                f"{s['wait_output_s']:.1f}",
+                f"{s['queue_mean']:.1f}",
+                f"{s['queue_max']}/{s['queue_size']}",
+            ]
+            for s in self.stats()
+        ]
+        widths = [max(_display_width(row[i]) for row in [header] + rows) for i in range(len(header))]
+        lines = [
+            "  ".join(
+                cell + " " * (width - _display_width(cell)) if i == 0
+                else " " * (width - _display_width(cell)) + cell
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in [header] + rows
+        ]
+        lines.append(f"总时间: {self._elapsed:.1f}秒")
+        return "\n".join(lines)
+
+
+def _display_width(text: str) -> int:
+    """终端显示宽度 (中文字符占两列)"""
+    return sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+
+
+def build_estimator_pipeline(
+    estimator,
+    bbox_thr: float = 0.5,
+    use_mask: bool = False,
+    inference_type: str = "full",
+    prepare_workers: int = 2,
+    queue_size: int = 2,
+    on_detect: Optional[Callable] = None,
+) -> StagePipeline:
+    """
+    SAM3DBodyEstimator.process_one_image 拆成的流水线
+
+    输入项为 (帧号, RGB图像或FrameContext)，成功时 StageResult.value 为 process_one_image 的输出列表，
+    没有检测到人体时 skipped 为True。各阶段共用detect返回的FrameContext，
+    同一帧的颜色转换、缩放和上传到GPU只做一次。
+
+    阶段: detect (检测 + SAM掩膜) -> prepare (裁剪预处理，CPU，多线程)
+          -> infer (FOV + 模型推理，GPU) -> postprocess (输出转为numpy)
+
+    on_detect(帧号, 检测框 [N, 4] 或 None) 在检测线程中每帧检测完成后调用，
+    例如让 MotionSampler 尽早用上新的人体框，不必等到这一帧走完整条流水线。
+    """
+
+    def detect(item):
+        frame_idx, img = item
+        boxes, img = estimator.detect(img, bbox_thr=bbox_thr)
+        if on_detect is not None:
+            on_detect(frame_idx, boxes if len(boxes) else None)
+        if len(boxes) == 0:
+            return SKIP
+        masks, masks_score = estimator.segment(img, boxes, use_mask=use_mask)
+        return {"img": img, "boxes": boxes, "masks": masks, "masks_score": masks_score}
+
+    def prepare(ctx):
+        ctx["batch"] = estimator.prepare(ctx["img"], ctx["boxes"], ctx["masks"], ctx["masks_score"])
+        return ctx
+
+    def infer(ctx):
+        ctx["batch"], ctx["outputs"] = estimator.infer(
+            ctx["img"], ctx["batch"], inference_type=inference_type
+        )
+        return ctx
+
+    def postprocess(ctx):
+        return estimator.postprocess(
+            ctx["batch"], ctx["outputs"], ctx["masks"], inference_type=inference_type
+        )
+
+    return StagePipeline([
+        Stage("detect", detect, queue_size=queue_size),
+        Stage("prepare", prepare, workers=prepare_workers, queue_size=queue_size),
+        Stage("infer", infer, queue_size=queue_size),
+        Stage("postprocess", postprocess, queue_size=queue_size),
+    ])
@@ -0,0 +1,181 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+预读视频帧 - 在后台线程中顺序解码视频，推理时不等待解码
+
+每次 cap.set(CAP_PROP_POS_FRAMES) 都会跳到前一个关键帧重新解码，跳帧处理时非常慢。
+PrefetchVideoReader 只在开始时 (以及两帧相距很远时) 定位一次，之后顺序读取:
+不需要的帧只 grab() 不解码成图像，需要的帧才 retrieve() 并转换一次为RGB，
+结果放入有界队列 (解码线程最多领先 queue_size 帧)。
+
+指定 sampler (例如 tools/frame_sampler.py 的 MotionSampler) 时每个候选帧都会解码，
+由 sampler(帧号, BGR图像) 决定是否输出，不输出的帧不进入队列。
+
+使用方法:
+    with PrefetchVideoReader(video_path, frames_to_process) as reader:
+        print(reader.fps, reader.width, reader.height)
+        for frame_idx, frame_rgb in reader:
+            outputs = estimator.process_one_image(frame_rgb)
+    print(reader.missing)  # 无法读取的帧
+"""
+
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Union
+
+import cv2
+import numpy as np
+
+_END = object()
+
+
+def probe_video(video_path: Union[str, Path]):
+    """视频的 (fps, 总帧数, 宽, 高)"""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频: {video_path}")
+    try:
+        return (
+            cap.get(cv2.CAP_PROP_FPS),
+            int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+    finally:
+        cap.release()
+
+
+class PrefetchVideoReader:
+    """顺序解码指定帧的后台读取器 (可迭代，产生 (帧号, RGB图像))"""
+
+    def __init__(
+        self,
+        video_path: Union[str, Path],
+        frame_indices: Optional[Iterable[int]] = None,
+        queue_size: int = 8,
+        seek_threshold: int = 300,
+        rgb: bool = True,
+        sampler: Optional[Callable[[int, np.ndarray], bool]] = None,
+        timer=None,
+    ):
+        """
+        Args:
+            video_path: 视频文件路径
+            frame_indices: 要读取的帧号 (默认: 全部帧)，按升序读取
+            queue_size: 预读队列长度
+            seek_threshold: 与下一帧相距超过该帧数时定位而不是逐帧grab
+            rgb: 转换为RGB (False时为OpenCV的BGR)
+            sampler: 可选的选帧函数 sampler(帧号, BGR图像) -> 是否输出该帧
+            timer: 可选的 sam_3d_body.utils.timing.StageTimer，记录每帧的解码时间 ("decode")
+        """
+        self.video_path = str(video_path)
+        self.cap = cv2.VideoCapture(self.video_path)
+        if not self.cap.isOpened():
+            raise ValueError(f"无法打开视频: {video_path}")
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        if frame_indices is None:
+            frame_indices = range(self.total_frames)
+        self.frame_indices = sorted(set(int(i) for i in frame_indices))
+        self.seek_threshold = seek_threshold
+        self.rgb = rgb
+        self.sampler = sampler
+        self.timer = timer
+        self.missing: List[int] = []
+
+        self._queue = queue.Queue(maxsize=max(queue_size, 1))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _put(self, item) -> bool:
+        """放入队列，队列满时等待 (关闭时返回False)"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self):
+        cap = self.cap
+        position = 0  # 下一次grab()得到的帧号
+        try:
+            for i, frame_idx in enumerate(self.frame_indices):
+                if self._stop.is_set():
+                    return
+                if frame_idx < position or frame_idx - position > self.seek_threshold:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+                    position = frame_idx
+                # 跳过的帧只grab，不解码为图像
+                ok = True
+                while position < frame_idx and ok:
+                    ok = cap.grab()
+                    position += 1
+                if not (ok and cap.grab()):
+                    # 到达视频末尾 (帧数常被高估)，其余帧都无法读取
+                    self.missing.extend(self.frame_indices[i:])
+                    break
+                position += 1
+                start = time.perf_counter()
+                ok, frame = cap.retrieve()
+                if self.timer is not None:
+                    self.timer.add("decode", time.perf_counter() - start)
+                if not ok or frame is None:
+                    self.missing.append(frame_idx)
+                    continue
+                if self.sampler is not None and not self.sampler(frame_idx, frame):
+                    continue
+                if self.rgb:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                if not self._put((frame_idx, frame)):
+                    return
+        except BaseException as e:
+            self._put(e)
+            return
+        self._put(_END)
+
+    def start(self) -> "PrefetchVideoReader":
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._decode, name="video_reader", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def __iter__(self):
+        self.start()
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def __len__(self) -> int:
+        """候选帧数 (使用sampler时实际输出的帧更少)"""
+        return len(self.frame_indices)
+
+    @property
+    def buffered(self) -> int:
+        """已解码、等待处理的帧数"""
+        return self._queue.qsize()
+
+    def close(self):
+        """停止解码线程并释放视频"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
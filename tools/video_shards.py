@@ -0,0 +1,138 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+"""
+分片并行处理 - 将一个长视频的帧范围切成N段，由N个进程分别处理后合并
+
+每个分片进程加载自己的估计器、打开自己的视频解码器 (只定位一次到分片开始处)，
+帧文件直接写入输出目录，分片自己的处理清单和序列文件写在旁边:
+    <输出目录>/manifest.shard000.jsonl
+    <输出目录>/<视频名>.mhrseq.shard000        (--output_format seq)
+全部分片结束后 merge_shards() 按帧顺序把它们合并进 manifest.jsonl 和 <视频名>.mhrseq，
+并删除分片文件。分片运行中断时，下一次 --resume 先合并留下的分片文件再继续。
+
+使用方法:
+    shards = split_frames(frames_to_process, num_shards=8)
+    results = run_shards(process_shard, shards, args)   # process_shard(分片号, 帧号列表, args)
+    records = merge_shards(output_folder, manifest, sequence_writer)
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from .manifest import MANIFEST_NAME, FrameManifest
+from .mhr_sequence import MHRSequence, MHRSequenceWriter
+
+_SHARD_SUFFIX = ".shard"
+_MANIFEST_STEM, _, _MANIFEST_EXT = MANIFEST_NAME.rpartition(".")
+
+
+def split_frames(frame_indices: Sequence[int], num_shards: int) -> List[List[int]]:
+    """把帧号切成最多 num_shards 段连续的分片 (每段帧数相差不超过1，不产生空分片)"""
+    frame_indices = list(frame_indices)
+    num_shards = max(1, min(num_shards, len(frame_indices)))
+    size, extra = divmod(len(frame_indices), num_shards)
+    shards, start = [], 0
+    for shard in range(num_shards):
+        end = start + size + (1 if shard < extra else 0)
+        if end > start:
+            shards.append(frame_indices[start:end])
+        start = end
+    return shards
+
+
+def shard_manifest_path(output_folder: Union[str, Path], shard: int) -> Path:
+    """分片的处理清单路径"""
+    return Path(output_folder) / f"{_MANIFEST_STEM}{_SHARD_SUFFIX}{shard:03d}.{_MANIFEST_EXT}"
+
+
+def shard_sequence_path(sequence_path: Union[str, Path], shard: int) -> Path:
+    """
+    分片的序列文件路径: <视频名>.mhrseq.shardXXX
+
+    后缀不是.mhrseq，查看器扫描目录时不会把分片当成完整的序列
+    """
+    return Path(f"{sequence_path}{_SHARD_SUFFIX}{shard:03d}")
+
+
+def _shard_files(output_folder: Path, sequence_path: Optional[Path]):
+    manifests = sorted(output_folder.glob(f"{_MANIFEST_STEM}{_SHARD_SUFFIX}*.{_MANIFEST_EXT}"))
+    sequences = []
+    if sequence_path is not None:
+        sequences = sorted(
+            path for path in output_folder.glob(f"{sequence_path.name}{_SHARD_SUFFIX}*")
+            if path.name[len(sequence_path.name) + len(_SHARD_SUFFIX):].split(".")[0].isdigit()
+        )
+    return manifests, sequences
+
+
+def remove_shard_files(output_folder: Union[str, Path], sequence_path: Optional[Path] = None):
+    """删除之前运行留下的分片文件 (不恢复时重新开始)"""
+    manifests, sequences = _shard_files(Path(output_folder), sequence_path)
+    for path in manifests + sequences:
+        path.unlink()
+
+
+def merge_shards(
+    output_folder: Union[str, Path],
+    manifest: FrameManifest,
+    sequence_writer: Optional[MHRSequenceWriter] = None,
+) -> List[Dict]:
+    """
+    按分片顺序 (即帧顺序) 把分片清单追加到 manifest，把分片序列追加到 sequence_writer，然后删除分片文件
+
+    已在 sequence_writer 中的帧不重复追加；中断后留下的.partial分片只合并其中完整的记录。
+
+    Returns:
+        合并的清单记录 (按帧顺序)
+    """
+    output_folder = Path(output_folder)
+    sequence_path = sequence_writer.path if sequence_writer is not None else None
+    manifests, sequences = _shard_files(output_folder, sequence_path)
+
+    for path in sequences:
+        sequence = MHRSequence(path)
+        # 没有检测到人体的分片没有记录 (记录结构只是占位)，跳过
+        if sequence.num_records:
+            existing = sequence_writer.frames
+            sequence_writer.extend(
+                sequence, [i for i in sequence.frame_indices if i not in existing]
+            )
+        del sequence
+
+    records = []
+    for path in manifests:
+        shard_records = FrameManifest(path).load()
+        for record in shard_records:
+            manifest.append(record)
+        records.extend(shard_records)
+
+    for path in manifests + sequences:
+        path.unlink()
+    return sorted(records, key=lambda r: r["frame_idx"])
+
+
+def run_shards(worker: Callable, shards: List[List[int]], *args) -> List[Dict]:
+    """
+    每个分片一个进程运行 worker(分片号, 帧号列表, *args)
+
+    使用spawn启动进程 (CUDA不能在fork出的子进程中使用)，worker必须是可以pickle的模块级函数，
+    返回值需可pickle。某个分片失败不影响其他分片，失败的分片在结果中为
+    {"shard": 分片号, "frames": 帧数, "error": 异常}，已完成的帧仍会被合并，可用 --resume 重试。
+
+    Returns:
+        按分片顺序的结果: worker的返回值 (dict) 或上述错误记录
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as executor:
+        futures = [
+            executor.submit(worker, shard, frames, *args)
+            for shard, frames in enumerate(shards)
+        ]
+        results = []
+        for shard, future in enumerate(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"shard": shard, "frames": len(shards[shard]), "error": e})
+    return results
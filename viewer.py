@@ -4,8 +4,10 @@ MHR网页查看器 - 在浏览器中查看3D人体模型
 
 使用方法:
     python viewer.py --mhr output/image.mhr.json
+    python viewer.py --mhr output/image.mhr.bin       # 二进制格式
     python viewer.py --mhr_folder output/
     python viewer.py --mhr_folder output/video_name/  # 视频帧播放
+    python viewer.py --mhr_folder output/video_name/ --checkpoint_path model.ckpt  # 仅参数模式，按需重建网格
 
 功能:
     - 支持鼠标旋转、缩放、平移
@@ -29,6 +31,20 @@ import subprocess
 from pathlib import Path
 from urllib.parse import parse_qs, urlparse
 
+import numpy as np
+
+from tools.manifest import MANIFEST_NAME, FrameManifest
+from tools.mhr_io import (
+    FRAME_FILE_PATTERN,
+    MHRFile,
+    is_binary_mhr,
+    is_params_only,
+    load_mhr,
+    numpy_to_list,
+    scan_mhr_files,
+)
+from tools.mhr_sequence import MHRSequence, find_sequence_files, parse_sequence_frame_file
+
 # HTML模板
 HTML_TEMPLATE = '''<!DOCTYPE html>
 <html lang="zh">
@@ -1909,6 +1925,11 @@ class MHRViewerHandler(http.server.SimpleHTTPRequestHandler):
     mhr_data = None
     video_info = None
     base_folder = None
+    sequences = {}
+    # 仅参数模式的网格重建器 (指定 --checkpoint_path 时创建)
+    reconstructor = None
+    # 请求某一帧时连同之后的帧一起批量重建
+    reconstruct_window = 16
 
     def do_GET(self):
         parsed = urlparse(self.path)
@@ -1953,12 +1974,26 @@ class MHRViewerHandler(http.server.SimpleHTTPRequestHandler):
         elif parsed.path == '/api/faces':
             # 返回共享的faces文件
             faces_path = Path(self.base_folder) / 'faces.json' if self.base_folder else None
+            sequence_name = (self.video_info or {}).get('sequence')
+            sequence = self._get_sequence(sequence_name) if sequence_name else None
             if faces_path and faces_path.exists():
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
                 self.end_headers()
                 with open(faces_path, 'r') as f:
                     self.wfile.write(f.read().encode('utf-8'))
+            elif sequence is not None and sequence.faces is not None:
+                # 序列文件头部保存的faces
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps(sequence.faces.tolist()).encode('utf-8'))
+            elif self.reconstructor is not None:
+                # 仅参数模式: 使用MHR模型的faces
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps(self.reconstructor.faces.tolist()).encode('utf-8'))
             else:
                 self.send_response(404)
                 self.end_headers()
@@ -1967,12 +2002,30 @@ class MHRViewerHandler(http.server.SimpleHTTPRequestHandler):
             # 返回指定帧的MHR数据
             frame_file = parsed.path.replace('/api/frame/', '')
             frame_path = Path(self.base_folder) / frame_file if self.base_folder else None
-            if frame_path and frame_path.exists():
+            sequence_frame = parse_sequence_frame_file(frame_file)
+            if sequence_frame is not None:
+                # 序列文件中的帧: <序列文件名>/<帧号>
+                sequence_name, frame_idx = sequence_frame
+                sequence = self._get_sequence(sequence_name)
+                if sequence is not None and frame_idx in sequence:
+                    self.send_response(200)
+                    self.send_header('Content-type', 'application/json')
+                    self.end_headers()
+                    data = numpy_to_list(self._sequence_frame(sequence, frame_idx))
+                    self.wfile.write(json.dumps(data).encode('utf-8'))
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+            elif frame_path and frame_path.exists():
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
                 self.end_headers()
-                with open(frame_path, 'r') as f:
-                    self.wfile.write(f.read().encode('utf-8'))
+                if is_binary_mhr(frame_path) or self.reconstructor is not None:
+                    data = numpy_to_list(self._file_frame(frame_path))
+                    self.wfile.write(json.dumps(data).encode('utf-8'))
+                else:
+                    with open(frame_path, 'r') as f:
+                        self.wfile.write(f.read().encode('utf-8'))
             else:
                 self.send_response(404)
                 self.end_headers()
@@ -2024,11 +2077,57 @@ class MHRViewerHandler(http.server.SimpleHTTPRequestHandler):
     def log_message(self, format, *args):
         print(f"[HTTP] {args[0]}")
 
-    @staticmethod
-    def _load_mhr_file(filepath):
+    @classmethod
+    def _get_sequence(cls, sequence_name):
+        """打开 (并缓存) 基础目录中的序列文件，未finalize时使用.partial文件"""
+        if sequence_name not in cls.sequences:
+            if not cls.base_folder:
+                return None
+            sequence_path = Path(cls.base_folder) / sequence_name
+            if not sequence_path.exists():
+                sequence_path = Path(str(sequence_path) + '.partial')
+                if not sequence_path.exists():
+                    return None
+            cls.sequences[sequence_name] = MHRSequence(sequence_path)
+        return cls.sequences[sequence_name]
+
+    @classmethod
+    def _sequence_frame(cls, sequence, frame_idx):
+        """序列中某一帧的MHR数据，仅参数模式时重建网格"""
+        if cls.reconstructor is None or not sequence.params_only:
+            return sequence.frame_mhr(frame_idx)
+        frame_indices = sequence.index["frame_idx"]
+        pos = int(np.searchsorted(frame_indices, frame_idx))
+        window = [int(i) for i in frame_indices[pos : pos + cls.reconstruct_window]]
+        return cls.reconstructor.reconstruct_sequence(sequence, window)[frame_idx]
+
+    @classmethod
+    def _file_frame(cls, frame_path):
+        """帧文件的MHR数据，仅参数模式时连同之后的帧文件一起重建网格"""
+        data = load_mhr(frame_path, mmap=True)
+        if cls.reconstructor is None or not is_params_only(data):
+            return data
+        frame_files = [
+            frame["file"] for frame in (cls.video_info or {}).get("processed_frames", [])
+        ]
+        window = [frame_path]
+        if frame_path.name in frame_files:
+            pos = frame_files.index(frame_path.name)
+            window += [
+                frame_path.with_name(name)
+                for name in frame_files[pos + 1 : pos + cls.reconstruct_window]
+                if frame_path.with_name(name).exists()
+            ]
+        return cls.reconstructor.reconstruct_files(window)[0]
+
+    @classmethod
+    def _load_mhr_file(cls, filepath):
         print(f"正在加载: {filepath}")
-        with open(filepath, 'r') as f:
-            data = json.load(f)
+        if cls.reconstructor is not None:
+            data = numpy_to_list(cls.reconstructor.reconstruct_file(filepath, include_faces=True))
+        else:
+            # 先只解析头部，网格数组按字段解码 (.mhr.json跳过逐个数字的json解析)
+            data = numpy_to_list(MHRFile(filepath).load())
         print(f"加载完成: {len(data.get('people', []))} 人")
         return data
 
@@ -2039,7 +2138,7 @@ def find_mhr_files(path):
     if path.is_file():
         return [str(path)]
     elif path.is_dir():
-        files = list(path.glob('*.mhr.json'))
+        files = list(path.glob('*.mhr.json')) + list(path.glob('*.mhr.bin'))
         return sorted([str(f) for f in files])
     return []
 
@@ -2052,9 +2151,68 @@ def load_video_info(path):
         if info_file.exists():
             with open(info_file, 'r') as f:
                 return json.load(f)
+        # 没有video_info.json (例如处理中断) 时从序列文件生成
+        sequence_files = find_sequence_files(path)
+        if sequence_files:
+            return MHRSequence(sequence_files[0]).video_info()
+        # 处理中断时由逐帧处理清单生成
+        video_info = video_info_from_manifest(path)
+        if video_info is not None:
+            return video_info
+        # 也没有清单时由帧文件生成 (只读取文件头部，不解码网格)
+        return video_info_from_frames(path)
     return None
 
 
+def video_info_from_manifest(path):
+    """由process_video.py逐帧追加的 manifest.jsonl 生成视频信息 (只读取第一个帧文件的头部)"""
+    records = [
+        record for record in FrameManifest(Path(path) / MANIFEST_NAME).load()
+        if record.get("file") and (Path(path) / record["file"]).exists()
+    ]
+    if not records:
+        return None
+    video_info = {"video_name": None, "fps": None, "processed_frames": records}
+    summary = scan_mhr_files([Path(path) / records[0]["file"]])[0]
+    if summary["image_size"]:
+        video_info["width"], video_info["height"] = summary["image_size"]
+    if summary["params_only"]:
+        video_info["params_only"] = True
+    return video_info
+
+
+def video_info_from_frames(path):
+    """由目录中的 frame_XXXXXX.mhr.json / .mhr.bin 帧文件生成视频信息"""
+    frame_files = {}
+    for f in find_mhr_files(path):
+        match = FRAME_FILE_PATTERN.match(Path(f).name)
+        if match:
+            frame_files.setdefault(int(match.group(1)), f)
+    if not frame_files:
+        return None
+
+    frame_indices = sorted(frame_files)
+    summaries = scan_mhr_files([frame_files[i] for i in frame_indices])
+    video_info = {
+        "video_name": None,
+        "fps": None,
+        "processed_frames": [
+            {
+                "frame_idx": frame_idx,
+                "file": summary["file"],
+                "num_people": summary["num_people"],
+            }
+            for frame_idx, summary in zip(frame_indices, summaries)
+        ],
+    }
+    image_size = next((s["image_size"] for s in summaries if s["image_size"]), None)
+    if image_size:
+        video_info["width"], video_info["height"] = image_size
+    if all(s["params_only"] for s in summaries):
+        video_info["params_only"] = True
+    return video_info
+
+
 def find_free_port(start_port=8080):
     """查找可用端口"""
     for port in range(start_port, start_port + 100):
@@ -2152,7 +2310,15 @@ def generate_self_signed_cert(cert_path, key_path):
         return False
 
 
-def start_server(mhr_path, port=8080, use_ssl=False, cert_path=None, key_path=None):
+def start_server(
+    mhr_path,
+    port=8080,
+    use_ssl=False,
+    cert_path=None,
+    key_path=None,
+    checkpoint_path=None,
+    model_mhr_path="",
+):
     """启动HTTP/HTTPS服务器"""
     mhr_path = Path(mhr_path)
     mhr_files = find_mhr_files(mhr_path)
@@ -2168,10 +2334,27 @@ def start_server(mhr_path, port=8080, use_ssl=False, cert_path=None, key_path=No
     else:
         print(f"找到 {len(mhr_files)} 个MHR文件")
 
+    # 仅参数模式的网格重建 (只加载检查点中的MHR头)
+    if checkpoint_path:
+        from tools.mhr_reconstruct import MeshReconstructor
+
+        print(f"加载MHR模型用于网格重建: {checkpoint_path}")
+        MHRViewerHandler.reconstructor = MeshReconstructor.from_checkpoint(
+            checkpoint_path, mhr_path=model_mhr_path
+        )
+    elif (video_info or {}).get("params_only"):
+        print("警告: 仅参数模式的输出没有网格，请指定 --checkpoint_path 以重建网格")
+
     # 设置处理器
     MHRViewerHandler.mhr_files = mhr_files
     MHRViewerHandler.current_file = mhr_files[0] if mhr_files else None
     MHRViewerHandler.mhr_data = MHRViewerHandler._load_mhr_file(mhr_files[0]) if mhr_files else None
+    if (
+        MHRViewerHandler.reconstructor is None
+        and MHRViewerHandler.mhr_data
+        and is_params_only(MHRViewerHandler.mhr_data)
+    ):
+        print("警告: 仅参数模式的MHR文件没有网格，请指定 --checkpoint_path 以重建网格")
     MHRViewerHandler.video_info = video_info
     MHRViewerHandler.base_folder = str(mhr_path) if mhr_path.is_dir() else str(mhr_path.parent)
 
@@ -2268,6 +2451,18 @@ def main():
         action="store_true",
         help="自动生成自签名证书 (需要cryptography库)",
     )
+    parser.add_argument(
+        "--checkpoint_path",
+        default="",
+        type=str,
+        help="SAM 3D Body检查点或推理包路径，用于重建仅参数模式 (--params_only) 输出的网格",
+    )
+    parser.add_argument(
+        "--mhr_path",
+        default="",
+        type=str,
+        help="MHR资源路径 (与--checkpoint_path一起使用，推理包内嵌MHR时可省略)",
+    )
 
     args = parser.parse_args()
 
@@ -2302,7 +2497,15 @@ def main():
             print(f"错误: 私钥文件不存在: {key_path}")
             return
 
-    start_server(mhr_path, args.port, use_ssl, str(cert_path) if cert_path else None, str(key_path) if key_path else None)
+    start_server(
+        mhr_path,
+        args.port,
+        use_ssl,
+        str(cert_path) if cert_path else None,
+        str(key_path) if key_path else None,
+        checkpoint_path=args.checkpoint_path,
+        model_mhr_path=args.mhr_path,
+    )
 
 
 if __name__ == "__main__":